@@ -0,0 +1,55 @@
+"""add composite filter indexes and full-text index to system_events
+
+Revision ID: a4d8e2f6b9c3
+Revises: f2b6d9c4a8e1
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a4d8e2f6b9c3"
+down_revision: Union[str, Sequence[str], None] = "f2b6d9c4a8e1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Одиночные индексы заменяются составными с тем же первым столбцом
+SINGLE_INDEXES = (
+    ("ix_system_events_event_type", ["event_type"]),
+    ("ix_system_events_actor_bitrix_id", ["actor_bitrix_id"]),
+    ("ix_system_events_target_type", ["target_type"]),
+    ("ix_system_events_target_id", ["target_id"]),
+)
+
+COMPOSITE_INDEXES = (
+    ("ix_system_events_type_created_id", ["event_type", "created_at", "id"]),
+    ("ix_system_events_actor_created_id", ["actor_bitrix_id", "created_at", "id"]),
+    ("ix_system_events_target_created_id", ["target_type", "target_id", "created_at", "id"]),
+)
+
+# Выражение должно совпадать с system_event_search_vector в backend/models.py
+SEARCH_VECTOR = (
+    "to_tsvector('russian'::regconfig, "
+    "(coalesce(message, '') || ' ') || coalesce(target_name_snapshot, ''))"
+)
+
+
+def upgrade() -> None:
+    for name, columns in COMPOSITE_INDEXES:
+        op.create_index(name, "system_events", columns, unique=False)
+    op.execute(f"CREATE INDEX ix_system_events_search ON system_events USING gin ({SEARCH_VECTOR})")
+
+    for name, _ in SINGLE_INDEXES:
+        op.drop_index(name, table_name="system_events")
+
+
+def downgrade() -> None:
+    for name, columns in SINGLE_INDEXES:
+        op.create_index(name, "system_events", columns, unique=False)
+
+    op.drop_index("ix_system_events_search", table_name="system_events")
+    for name, _ in COMPOSITE_INDEXES:
+        op.drop_index(name, table_name="system_events")
@@ -0,0 +1,38 @@
+"""add keyset indexes for purchases and system events lists
+
+Revision ID: a7c2e9d4b1f6
+Revises: f1d3b8c2a7e5
+Create Date: 2026-10-18 03:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a7c2e9d4b1f6"
+down_revision: Union[str, Sequence[str], None] = "f1d3b8c2a7e5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_buy_transactions_buyer_created_id",
+        "buy_transactions",
+        ["buyer_id", "created_at", "id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_system_events_created_id",
+        "system_events",
+        ["created_at", "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_system_events_created_id", table_name="system_events")
+    op.drop_index("ix_buy_transactions_buyer_created_id", table_name="buy_transactions")
@@ -0,0 +1,68 @@
+"""add rating_counters
+
+Revision ID: b3e8f1a6c9d2
+Revises: a7c2e9d4b1f6
+Create Date: 2026-10-18 04:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b3e8f1a6c9d2"
+down_revision: Union[str, Sequence[str], None] = "a7c2e9d4b1f6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "rating_counters",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("game_id", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("bitrix_id", sa.Integer(), nullable=False),
+        sa.Column("received", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("sent", sa.Integer(), nullable=False, server_default="0"),
+        sa.ForeignKeyConstraint(["bitrix_id"], ["employees.bitrix_id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("game_id", "bitrix_id", name="uq_rating_counters_game_employee"),
+    )
+    op.create_index(op.f("ix_rating_counters_id"), "rating_counters", ["id"], unique=False)
+    op.create_index(
+        "ix_rating_counters_game_rating",
+        "rating_counters",
+        ["game_id", sa.text("received DESC"), sa.text("sent DESC"), "bitrix_id"],
+        unique=False,
+    )
+
+    # Заполняем счётчики по уже накопленной истории лайков:
+    # game_id = 0 — общий рейтинг, иначе рейтинг игры
+    op.execute(
+        """
+        INSERT INTO rating_counters (game_id, bitrix_id, received, sent)
+        SELECT scope.game_id, e.bitrix_id, SUM(e.received), SUM(e.sent)
+        FROM (
+            SELECT game_id, to_user_bitrix_id AS bitrix_id, 1 AS received, 0 AS sent
+            FROM like_transactions WHERE to_user_bitrix_id IS NOT NULL
+            UNION ALL
+            SELECT game_id, from_user_bitrix_id, 0, 1
+            FROM like_transactions WHERE from_user_bitrix_id IS NOT NULL
+        ) AS e
+        CROSS JOIN LATERAL (
+            SELECT 0 AS game_id
+            UNION ALL
+            SELECT e.game_id WHERE e.game_id IS NOT NULL
+        ) AS scope
+        JOIN employees ON employees.bitrix_id = e.bitrix_id
+        GROUP BY scope.game_id, e.bitrix_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_rating_counters_game_rating", table_name="rating_counters")
+    op.drop_index(op.f("ix_rating_counters_id"), table_name="rating_counters")
+    op.drop_table("rating_counters")
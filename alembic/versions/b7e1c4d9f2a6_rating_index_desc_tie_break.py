@@ -0,0 +1,40 @@
+"""order rating index tie-break by bitrix_id desc
+
+Revision ID: b7e1c4d9f2a6
+Revises: a4d8e2f6b9c3
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b7e1c4d9f2a6"
+down_revision: Union[str, Sequence[str], None] = "a4d8e2f6b9c3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Все колонки после game_id — в одном направлении: тогда условие
+# (received, sent, bitrix_id) > (...) служит границей диапазона индекса
+INDEX_NAME = "ix_rating_counters_game_rating"
+
+
+def _replace_index(bitrix_id_order: str) -> None:
+    op.drop_index(INDEX_NAME, table_name="rating_counters")
+    op.create_index(
+        INDEX_NAME,
+        "rating_counters",
+        ["game_id", sa.text("received DESC"), sa.text("sent DESC"), sa.text(f"bitrix_id {bitrix_id_order}")],
+        unique=False,
+    )
+
+
+def upgrade() -> None:
+    _replace_index("DESC")
+
+
+def downgrade() -> None:
+    _replace_index("ASC")
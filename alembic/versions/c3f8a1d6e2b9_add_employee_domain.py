@@ -0,0 +1,32 @@
+"""add employee portal domain
+
+Revision ID: c3f8a1d6e2b9
+Revises: b7e1c4d9f2a6
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c3f8a1d6e2b9"
+down_revision: Union[str, Sequence[str], None] = "b7e1c4d9f2a6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("employees", sa.Column("domain", sa.String(), nullable=True))
+    # Установка с одним порталом: все уже сохранённые сотрудники — с него.
+    # При нескольких порталах домен проставит первая синхронизация каждого
+    op.execute(
+        "UPDATE employees SET domain = (SELECT min(domain) FROM bitrix_auth) "
+        "WHERE (SELECT count(DISTINCT domain) FROM bitrix_auth) = 1"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("employees", "domain")
@@ -0,0 +1,59 @@
+"""add like_daily_rollups
+
+Revision ID: c5d9a2f7e3b8
+Revises: b3e8f1a6c9d2
+Create Date: 2026-10-18 05:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c5d9a2f7e3b8"
+down_revision: Union[str, Sequence[str], None] = "b3e8f1a6c9d2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "like_daily_rollups",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("bitrix_id", sa.Integer(), nullable=False),
+        sa.Column("received", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("sent", sa.Integer(), nullable=False, server_default="0"),
+        sa.ForeignKeyConstraint(["bitrix_id"], ["employees.bitrix_id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("day", "bitrix_id", name="uq_like_daily_rollups_day_employee"),
+    )
+    op.create_index(op.f("ix_like_daily_rollups_id"), "like_daily_rollups", ["id"], unique=False)
+
+    # Заполняем по истории лайков; день считается в LOCAL_TZ (UTC+5,
+    # см. backend/scripts/time_utils.py). Повторный пересчёт —
+    # python -m backend.scripts.backfill_like_daily_rollups
+    op.execute(
+        """
+        INSERT INTO like_daily_rollups (day, bitrix_id, received, sent)
+        SELECT e.day, e.bitrix_id, SUM(e.received), SUM(e.sent)
+        FROM (
+            SELECT CAST(created_at + INTERVAL '5 hours' AS DATE) AS day,
+                   to_user_bitrix_id AS bitrix_id, 1 AS received, 0 AS sent
+            FROM like_transactions WHERE to_user_bitrix_id IS NOT NULL
+            UNION ALL
+            SELECT CAST(created_at + INTERVAL '5 hours' AS DATE),
+                   from_user_bitrix_id, 0, 1
+            FROM like_transactions WHERE from_user_bitrix_id IS NOT NULL
+        ) AS e
+        JOIN employees ON employees.bitrix_id = e.bitrix_id
+        GROUP BY e.day, e.bitrix_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_like_daily_rollups_id"), table_name="like_daily_rollups")
+    op.drop_table("like_daily_rollups")
@@ -0,0 +1,69 @@
+"""add employee_sync_jobs
+
+Revision ID: d8f4b6a1e2c7
+Revises: c5d9a2f7e3b8
+Create Date: 2026-10-18 06:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d8f4b6a1e2c7"
+down_revision: Union[str, Sequence[str], None] = "c5d9a2f7e3b8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "employee_sync_jobs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("domain", sa.String(), nullable=False),
+        sa.Column("requested_by", sa.Integer(), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum("PENDING", "RUNNING", "DONE", "FAILED", name="employeesyncstatus"),
+            nullable=False,
+        ),
+        sa.Column("next_start", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("total", sa.Integer(), nullable=True),
+        sa.Column("pages_fetched", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("rows_written", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("inserted", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("updated", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("unchanged", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("errors", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("next_attempt_at", sa.DateTime(), nullable=False, server_default=sa.text("CURRENT_TIMESTAMP")),
+        sa.Column("heartbeat_at", sa.DateTime(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.text("CURRENT_TIMESTAMP")),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_employee_sync_jobs_id"), "employee_sync_jobs", ["id"], unique=False)
+    op.create_index(
+        "uq_employee_sync_jobs_active_domain",
+        "employee_sync_jobs",
+        ["domain"],
+        unique=True,
+        postgresql_where=sa.text("status IN ('PENDING', 'RUNNING')"),
+    )
+    op.create_index(
+        "ix_employee_sync_jobs_status_next_attempt",
+        "employee_sync_jobs",
+        ["status", "next_attempt_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_employee_sync_jobs_status_next_attempt", table_name="employee_sync_jobs")
+    op.drop_index("uq_employee_sync_jobs_active_domain", table_name="employee_sync_jobs")
+    op.drop_index(op.f("ix_employee_sync_jobs_id"), table_name="employee_sync_jobs")
+    op.drop_table("employee_sync_jobs")
+    sa.Enum(name="employeesyncstatus").drop(op.get_bind(), checkfirst=True)
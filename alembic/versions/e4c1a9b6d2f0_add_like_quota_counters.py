@@ -0,0 +1,93 @@
+"""add like quota counters
+
+Revision ID: e4c1a9b6d2f0
+Revises: d2b7e5a1c3f4
+Create Date: 2026-10-18 01:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e4c1a9b6d2f0"
+down_revision: Union[str, Sequence[str], None] = "d2b7e5a1c3f4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "like_period_quotas",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("game_id", sa.Integer(), nullable=False),
+        sa.Column("sender_bitrix_id", sa.Integer(), nullable=False),
+        sa.Column("period_start", sa.DateTime(), nullable=False),
+        sa.Column("sent", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.ForeignKeyConstraint(["game_id"], ["games.id"]),
+        sa.ForeignKeyConstraint(["sender_bitrix_id"], ["employees.bitrix_id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "game_id", "sender_bitrix_id", "period_start",
+            name="uq_like_period_quotas_game_sender_period",
+        ),
+    )
+    op.create_index(op.f("ix_like_period_quotas_id"), "like_period_quotas", ["id"], unique=False)
+
+    op.create_table(
+        "like_pair_quotas",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("game_id", sa.Integer(), nullable=False),
+        sa.Column("sender_bitrix_id", sa.Integer(), nullable=False),
+        sa.Column("recipient_bitrix_id", sa.Integer(), nullable=False),
+        sa.Column("sent", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.ForeignKeyConstraint(["game_id"], ["games.id"]),
+        sa.ForeignKeyConstraint(["sender_bitrix_id"], ["employees.bitrix_id"]),
+        sa.ForeignKeyConstraint(["recipient_bitrix_id"], ["employees.bitrix_id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "game_id", "sender_bitrix_id", "recipient_bitrix_id",
+            name="uq_like_pair_quotas_game_sender_recipient",
+        ),
+    )
+    op.create_index(op.f("ix_like_pair_quotas_id"), "like_pair_quotas", ["id"], unique=False)
+
+    # Заполняем счётчики по уже существующим лайкам
+    op.execute(
+        """
+        INSERT INTO like_pair_quotas (game_id, sender_bitrix_id, recipient_bitrix_id, sent)
+        SELECT game_id, from_user_bitrix_id, to_user_bitrix_id, COUNT(*)
+        FROM like_transactions
+        WHERE game_id IS NOT NULL
+          AND from_user_bitrix_id IS NOT NULL
+          AND to_user_bitrix_id IS NOT NULL
+        GROUP BY game_id, from_user_bitrix_id, to_user_bitrix_id
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO like_period_quotas (game_id, sender_bitrix_id, period_start, sent)
+        SELECT lt.game_id,
+               lt.from_user_bitrix_id,
+               CASE g."setting_limitParameter"
+                   WHEN 'DAY' THEN date_trunc('day', lt.created_at)
+                   WHEN 'WEEK' THEN date_trunc('week', lt.created_at)
+                   WHEN 'MONTH' THEN date_trunc('month', lt.created_at)
+                   ELSE TIMESTAMP '1970-01-01 00:00:00'
+               END AS period_start,
+               COUNT(*)
+        FROM like_transactions lt
+        JOIN games g ON g.id = lt.game_id
+        WHERE lt.from_user_bitrix_id IS NOT NULL
+        GROUP BY lt.game_id, lt.from_user_bitrix_id, period_start
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_like_pair_quotas_id"), table_name="like_pair_quotas")
+    op.drop_table("like_pair_quotas")
+    op.drop_index(op.f("ix_like_period_quotas_id"), table_name="like_period_quotas")
+    op.drop_table("like_period_quotas")
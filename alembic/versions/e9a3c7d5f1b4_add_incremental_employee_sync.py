@@ -0,0 +1,53 @@
+"""add employee content hash, is_active and delta sync fields
+
+Revision ID: e9a3c7d5f1b4
+Revises: d8f4b6a1e2c7
+Create Date: 2026-10-18 07:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e9a3c7d5f1b4"
+down_revision: Union[str, Sequence[str], None] = "d8f4b6a1e2c7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("employees", sa.Column("is_active", sa.Boolean(), nullable=False, server_default=sa.true()))
+    op.add_column("employees", sa.Column("bitrix_hash", sa.String(length=64), nullable=True))
+
+    sync_mode = sa.Enum("FULL", "DELTA", name="employeesyncmode")
+    sync_mode.create(op.get_bind(), checkfirst=True)
+    op.add_column(
+        "employee_sync_jobs",
+        sa.Column("mode", sync_mode, nullable=False, server_default="FULL"),
+    )
+    op.add_column("employee_sync_jobs", sa.Column("since", sa.DateTime(), nullable=True))
+    op.add_column(
+        "employee_sync_jobs",
+        sa.Column("deactivated", sa.Integer(), nullable=False, server_default=sa.text("0")),
+    )
+
+    op.create_table(
+        "employee_sync_seen",
+        sa.Column("job_id", sa.Integer(), nullable=False),
+        sa.Column("bitrix_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["job_id"], ["employee_sync_jobs.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("job_id", "bitrix_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("employee_sync_seen")
+    op.drop_column("employee_sync_jobs", "deactivated")
+    op.drop_column("employee_sync_jobs", "since")
+    op.drop_column("employee_sync_jobs", "mode")
+    sa.Enum(name="employeesyncmode").drop(op.get_bind(), checkfirst=True)
+    op.drop_column("employees", "bitrix_hash")
+    op.drop_column("employees", "is_active")
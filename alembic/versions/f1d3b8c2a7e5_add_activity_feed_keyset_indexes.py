@@ -0,0 +1,38 @@
+"""add (created_at, id) indexes for activity feed keyset pagination
+
+Revision ID: f1d3b8c2a7e5
+Revises: e4c1a9b6d2f0
+Create Date: 2026-10-18 02:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f1d3b8c2a7e5"
+down_revision: Union[str, Sequence[str], None] = "e4c1a9b6d2f0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_like_transactions_created_id",
+        "like_transactions",
+        ["created_at", "id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_buy_transactions_created_id",
+        "buy_transactions",
+        ["created_at", "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_buy_transactions_created_id", table_name="buy_transactions")
+    op.drop_index("ix_like_transactions_created_id", table_name="like_transactions")
@@ -0,0 +1,110 @@
+"""partition system_events by month of created_at
+
+Revision ID: f2b6d9c4a8e1
+Revises: e9a3c7d5f1b4
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f2b6d9c4a8e1"
+down_revision: Union[str, Sequence[str], None] = "e9a3c7d5f1b4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Сколько месяцев вперёд создаются секции; дальше их создаёт backend.scripts.maintain_system_events
+PARTITIONS_AHEAD = 2
+
+COLUMNS = (
+    "id, event_type, actor_bitrix_id, actor_name_snapshot, target_type, target_id, "
+    "target_name_snapshot, message, payload, created_at"
+)
+
+INDEXES = (
+    ("ix_system_events_event_type", ["event_type"]),
+    ("ix_system_events_actor_bitrix_id", ["actor_bitrix_id"]),
+    ("ix_system_events_target_type", ["target_type"]),
+    ("ix_system_events_target_id", ["target_id"]),
+    ("ix_system_events_created_at", ["created_at"]),
+    ("ix_system_events_created_id", ["created_at", "id"]),
+)
+
+
+def _add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def _event_columns(partitioned: bool) -> list[sa.Column]:
+    return [
+        sa.Column("id", sa.Integer(), nullable=False, server_default=sa.text("nextval('system_events_id_seq')")),
+        sa.Column("event_type", sa.String(length=64), nullable=False),
+        sa.Column("actor_bitrix_id", sa.Integer(), nullable=True),
+        sa.Column("actor_name_snapshot", sa.String(length=255), nullable=False),
+        sa.Column("target_type", sa.String(length=32), nullable=False),
+        sa.Column("target_id", sa.Integer(), nullable=True),
+        sa.Column("target_name_snapshot", sa.String(length=255), nullable=True),
+        sa.Column("message", sa.Text(), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.text("CURRENT_TIMESTAMP")),
+        sa.PrimaryKeyConstraint("id", "created_at") if partitioned else sa.PrimaryKeyConstraint("id"),
+    ]
+
+
+def _move_table_aside(old_indexes: list[str]) -> None:
+    """Переименовывает system_events в system_events_old, освобождая имена индексов и PK."""
+    for name in old_indexes:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    op.execute("ALTER TABLE system_events RENAME TO system_events_old")
+    op.execute("ALTER TABLE system_events_old RENAME CONSTRAINT system_events_pkey TO system_events_old_pkey")
+    # Последовательность id переходит к новой таблице, чтобы id продолжались без setval
+    op.execute("ALTER TABLE system_events_old ALTER COLUMN id DROP DEFAULT")
+
+
+def _drop_old_table() -> None:
+    op.execute("ALTER SEQUENCE system_events_id_seq OWNED BY system_events.id")
+    op.execute("DROP TABLE system_events_old")
+
+
+def upgrade() -> None:
+    _move_table_aside(["ix_system_events_id"] + [name for name, _ in INDEXES])
+
+    op.create_table("system_events", *_event_columns(partitioned=True), postgresql_partition_by="RANGE (created_at)")
+    for name, columns in INDEXES:
+        op.create_index(name, "system_events", columns, unique=False)
+
+    op.execute("CREATE TABLE system_events_default PARTITION OF system_events DEFAULT")
+
+    now = datetime.utcnow()
+    first_event_at = op.get_bind().scalar(sa.text("SELECT min(created_at) FROM system_events_old")) or now
+    month = first_event_at.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    last_month = _add_months(now.replace(day=1, hour=0, minute=0, second=0, microsecond=0), PARTITIONS_AHEAD)
+    while month <= last_month:
+        next_month = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE system_events_{month:%Y_%m} PARTITION OF system_events "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month:%Y-%m-%d}')"
+        )
+        month = next_month
+
+    op.execute(f"INSERT INTO system_events ({COLUMNS}) SELECT {COLUMNS} FROM system_events_old")
+    _drop_old_table()
+
+
+def downgrade() -> None:
+    _move_table_aside([name for name, _ in INDEXES])
+
+    op.create_table("system_events", *_event_columns(partitioned=False))
+    op.create_index("ix_system_events_id", "system_events", ["id"], unique=False)
+    for name, columns in INDEXES:
+        op.create_index(name, "system_events", columns, unique=False)
+
+    op.execute(f"INSERT INTO system_events ({COLUMNS}) SELECT {COLUMNS} FROM system_events_old")
+    # Секции удаляются вместе с секционированной таблицей
+    _drop_old_table()
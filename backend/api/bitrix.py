@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from backend.api.events import require_superadmin
+from backend.bitrix_sdk.python_current_SDK import bitrix_rate_limiters
+from backend.models import BitrixPortalMetrics
+from backend.scripts.database import get_db
+
+router = APIRouter()
+
+
+@router.get("/api/bitrix/metrics", response_model=list[BitrixPortalMetrics])
+def get_bitrix_metrics(user_id: int, db: Session = Depends(get_db)):
+    """
+    Счётчики лимитера запросов к Bitrix24 этого процесса по порталам:
+    глубина очереди, время ожидания, ответы о превышении лимита.
+    """
+    require_superadmin(user_id, db)
+    return [
+        BitrixPortalMetrics(domain=domain, **metrics)
+        for domain, metrics in bitrix_rate_limiters.metrics().items()
+    ]
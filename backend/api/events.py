@@ -1,8 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import date, datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
-from backend.models import Employee, SystemEvent, SystemEventsPage
+from backend.models import (
+    SYSTEM_EVENT_SEARCH_CONFIG,
+    Employee,
+    SystemEvent,
+    SystemEventsPage,
+    system_event_search_vector,
+)
 from backend.scripts.database import get_db
+from backend.services.event_partitions import count_system_events
+from backend.services.pagination import (
+    count_total_pages,
+    created_between,
+    created_id_after,
+    decode_created_id_cursor,
+    next_created_id_cursor,
+)
 
 router = APIRouter()
 
@@ -16,13 +33,65 @@ def require_superadmin(user_id: int, db: Session) -> Employee:
     return user
 
 
+def system_event_filters(
+        event_type: str | None,
+        actor_bitrix_id: int | None,
+        target_type: str | None,
+        target_id: int | None,
+        date_from: date | None,
+        date_to: date | None,
+        q: str | None,
+) -> list:
+    """
+    Условия фильтра журнала. Равенства совпадают с первыми колонками составных
+    индексов (… , created_at, id), диапазон дат — локальные дни включительно,
+    отсекает лишние секции. q ищется по message и target_name_snapshot
+    через GIN-индекс ix_system_events_search (синтаксис websearch: слова, "фраза", -исключить).
+    """
+    filters = []
+    if event_type:
+        filters.append(SystemEvent.event_type == event_type)
+    if actor_bitrix_id is not None:
+        filters.append(SystemEvent.actor_bitrix_id == actor_bitrix_id)
+    if target_type:
+        filters.append(SystemEvent.target_type == target_type)
+    if target_id is not None:
+        if not target_type:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Фильтр target_id задаётся вместе с target_type",
+            )
+        filters.append(SystemEvent.target_id == target_id)
+    filters.extend(created_between(SystemEvent.created_at, date_from, date_to))
+    if q and q.strip():
+        filters.append(
+            system_event_search_vector.op("@@")(func.websearch_to_tsquery(SYSTEM_EVENT_SEARCH_CONFIG, q.strip()))
+        )
+    return filters
+
+
 @router.get("/api/events", response_model=SystemEventsPage)
 def get_system_events(
     user_id: int,
-    page: int = 1,
-    limit: int = 15,
+    page: int = Query(1, ge=1),
+    limit: int = Query(15, ge=1, le=100),
+    after: str | None = None,
+    include_total: bool = True,
+    event_type: str | None = None,
+    actor_bitrix_id: int | None = None,
+    target_type: str | None = None,
+    target_id: int | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    q: str | None = Query(None, max_length=200),
     db: Session = Depends(get_db),
 ):
+    """
+    Журнал событий для суперадминистратора, новые сверху.
+    Фильтры по типу события, автору, объекту (target_type + target_id),
+    локальным датам и полнотекстовый поиск q; курсор after передаётся
+    вместе с теми же фильтрами.
+    """
     if page < 1:
         page = 1
     if limit < 1:
@@ -31,26 +100,37 @@ def get_system_events(
         limit = 100
 
     require_superadmin(user_id, db)
+    cursor = decode_created_id_cursor(after)
+    filters = system_event_filters(event_type, actor_bitrix_id, target_type, target_id, date_from, date_to, q)
 
-    total = db.query(SystemEvent).count()
-    total_pages = (total + limit - 1) // limit if total > 0 else 1
-    if page > total_pages:
-        page = total_pages
-    offset = (page - 1) * limit
-
-    rows = (
+    query = (
         db.query(SystemEvent)
+        .filter(*filters)
         .order_by(SystemEvent.created_at.desc(), SystemEvent.id.desc())
-        .offset(offset)
-        .limit(limit)
-        .all()
     )
+    total = None
+    total_pages = None
+
+    if cursor is not None:
+        query = query.filter(created_id_after(SystemEvent.created_at, SystemEvent.id, cursor))
+    else:
+        if include_total:
+            if filters:
+                total = db.query(func.count(SystemEvent.id)).filter(*filters).scalar()
+            else:
+                total = count_system_events(db, datetime.utcnow())
+            total_pages = count_total_pages(total, limit)
+            if page > total_pages:
+                page = total_pages
+        query = query.offset((page - 1) * limit)
+
+    rows = query.limit(limit).all()
 
     return SystemEventsPage(
         events=rows,
         total=total,
-        page=page,
+        page=page if cursor is None else None,
         size=limit,
         total_pages=total_pages,
+        next_cursor=next_created_id_cursor(rows, limit),
     )
-
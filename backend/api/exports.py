@@ -0,0 +1,89 @@
+from datetime import date, datetime
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from backend.api.events import require_superadmin, system_event_filters
+from backend.models import Employee
+from backend.scripts.database import get_db
+from backend.services.exports import (
+    EXPORT_MEDIA_TYPES,
+    events_export,
+    likes_export,
+    purchases_export,
+    stream_export,
+)
+
+router = APIRouter()
+
+
+def require_admin(user_id: int, db: Session) -> Employee:
+    user = db.query(Employee).filter(Employee.bitrix_id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Пользователь не найден")
+    if not (user.is_admin or getattr(user, "is_superadmin", False)):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Доступ только для администратора")
+    return user
+
+
+def export_response(export, name: str, fmt: str, gzip: bool) -> StreamingResponse:
+    filename = f"{name}_{datetime.utcnow():%Y%m%d_%H%M%S}.{fmt}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        stream_export(export, fmt, gzip),
+        media_type="application/gzip" if gzip else EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/api/export/likes")
+def export_likes(
+    user_id: int,
+    format: Literal["csv", "ndjson"] = "csv",
+    gzip: bool = False,
+    game_id: int | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Выгрузка Спасибок по возрастанию времени (CSV или NDJSON, gzip=true — сжатый файл).
+    Фильтры: игра и локальные дни date_from..date_to включительно.
+    """
+    require_admin(user_id, db)
+    return export_response(likes_export(game_id, date_from, date_to), "likes", format, gzip)
+
+
+@router.get("/api/export/purchases")
+def export_purchases(
+    user_id: int,
+    format: Literal["csv", "ndjson"] = "csv",
+    gzip: bool = False,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    db: Session = Depends(get_db),
+):
+    """Выгрузка покупок по возрастанию времени; фильтр — локальные дни date_from..date_to."""
+    require_admin(user_id, db)
+    return export_response(purchases_export(date_from, date_to), "purchases", format, gzip)
+
+
+@router.get("/api/export/events")
+def export_events(
+    user_id: int,
+    format: Literal["csv", "ndjson"] = "csv",
+    gzip: bool = False,
+    event_type: str | None = None,
+    actor_bitrix_id: int | None = None,
+    target_type: str | None = None,
+    target_id: int | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    q: str | None = Query(None, max_length=200),
+    db: Session = Depends(get_db),
+):
+    """Выгрузка журнала событий с теми же фильтрами, что у /api/events. Только суперадминистратор."""
+    require_superadmin(user_id, db)
+    filters = system_event_filters(event_type, actor_bitrix_id, target_type, target_id, date_from, date_to, q)
+    return export_response(events_export(filters), "events", format, gzip)
@@ -1,9 +1,9 @@
 import logging
-from datetime import datetime, timezone, timedelta
-from typing import List
+from datetime import date, datetime, time, timedelta
+from typing import List, Literal
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import func, or_, desc
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import func
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
@@ -12,7 +12,8 @@ from backend.models import (
     GameParticipant,
     Employee,
     LikeTransaction,
-    LimitParameter,
+    LikePeriodQuota,
+    RatingCounter,
     GameResponse,
     GameUpdate,
     GameCreate,
@@ -20,11 +21,19 @@ from backend.models import (
     OverallRatingResponse,
     MonthlyTopResponse,
     MonthlyTopRow,
+    MyRankResponse,
+    RatingPlaceRow,
     GameParticipantStatsRow,
     GameStatsResponse,
 )
 from backend.scripts.database import get_db
 from backend.scripts.time_utils import LOCAL_TZ
+from backend.services.game_cache import game_cache, mark_games_changed
+from backend.services.game_service import get_quota_period_start
+from backend.services.like_quota_service import rebuild_like_period_quotas
+from backend.services.like_rollup_service import top_received_rows
+from backend.services.pagination import decode_id_cursor, encode_cursor
+from backend.services.rating_service import RATING_SCOPE_OVERALL, get_rating_place, rating_rows_query
 from backend.services.event_log import (
     EVENT_GAME_CREATED,
     EVENT_GAME_DELETED,
@@ -98,6 +107,7 @@ def normalize_and_validate_participant_ids(db: Session, participant_ids: list[in
 
 
 def replace_game_participants(db: Session, game_id: int, participant_ids: list[int]) -> None:
+    mark_games_changed(db)
     db.query(GameParticipant).filter(GameParticipant.game_id == game_id).delete(synchronize_session=False)
     if participant_ids:
         db.add_all([
@@ -106,67 +116,9 @@ def replace_game_participants(db: Session, game_id: int, participant_ids: list[i
         ])
 
 
-def get_game_period_start(game: Game, now: datetime) -> datetime | None:
-    param = game.setting_limitParameter
-
-    if param == LimitParameter.DAY:
-        return now.replace(hour=0, minute=0, second=0, microsecond=0)
-
-    if param == LimitParameter.WEEK:
-        monday = now - timedelta(days=now.weekday())
-        return monday.replace(hour=0, minute=0, second=0, microsecond=0)
-
-    if param == LimitParameter.MONTH:
-        return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-    return None
-
-
 # ---------- Вспомогательная функция рейтинга ----------
 def calc_game_rating(game_id: int, db: Session) -> List[GameRatingRow]:
-    received_sub = (
-        db.query(
-            LikeTransaction.to_user_bitrix_id.label("bitrix_id"),
-            func.count(LikeTransaction.id).label("received"),
-        )
-        .filter(LikeTransaction.game_id == game_id)
-        .group_by(LikeTransaction.to_user_bitrix_id)
-        .subquery()
-    )
-
-    sent_sub = (
-        db.query(
-            LikeTransaction.from_user_bitrix_id.label("bitrix_id"),
-            func.count(LikeTransaction.id).label("sent"),
-        )
-        .filter(LikeTransaction.game_id == game_id)
-        .group_by(LikeTransaction.from_user_bitrix_id)
-        .subquery()
-    )
-
-    rows = (
-        db.query(
-            Employee.bitrix_id,
-            Employee.name,
-            Employee.lastname,
-            Employee.photo_url,
-            func.coalesce(received_sub.c.received, 0).label("received"),
-            func.coalesce(sent_sub.c.sent, 0).label("sent"),
-        )
-        .outerjoin(received_sub, received_sub.c.bitrix_id == Employee.bitrix_id)
-        .outerjoin(sent_sub, sent_sub.c.bitrix_id == Employee.bitrix_id)
-        .filter(
-            or_(
-                received_sub.c.received.isnot(None),
-                sent_sub.c.sent.isnot(None),
-            )
-        )
-        .order_by(
-            desc(func.coalesce(received_sub.c.received, 0)),
-            desc(func.coalesce(sent_sub.c.sent, 0)),
-        )
-        .all()
-    )
+    rows = rating_rows_query(db, game_id).all()
 
     return [
         GameRatingRow(
@@ -184,58 +136,15 @@ def calc_game_rating(game_id: int, db: Session) -> List[GameRatingRow]:
 def calc_overall_rating(db: Session, page: int, limit: int):
     offset = (page - 1) * limit
 
-    received_sub = (
-        db.query(
-            LikeTransaction.to_user_bitrix_id.label("employee_id"),
-            func.count(LikeTransaction.id).label("received")
-        )
-        .group_by(LikeTransaction.to_user_bitrix_id)
-        .subquery()
-    )
-
-    sent_sub = (
-        db.query(
-            LikeTransaction.from_user_bitrix_id.label("employee_id"),
-            func.count(LikeTransaction.id).label("sent")
-        )
-        .group_by(LikeTransaction.from_user_bitrix_id)
-        .subquery()
-    )
-
     total_count = (
-        db.query(Employee.bitrix_id)
-        .outerjoin(received_sub, Employee.bitrix_id == received_sub.c.employee_id)
-        .outerjoin(sent_sub, Employee.bitrix_id == sent_sub.c.employee_id)
-        .filter(
-            or_(
-                received_sub.c.received.isnot(None),
-                sent_sub.c.sent.isnot(None),
-            )
-        )
-        .count()
+        db.query(func.count(RatingCounter.id))
+        .join(Employee, Employee.bitrix_id == RatingCounter.bitrix_id)
+        .filter(RatingCounter.game_id == RATING_SCOPE_OVERALL, Employee.is_active.is_(True))
+        .scalar()
     )
 
     rows = (
-        db.query(
-            Employee.bitrix_id,
-            Employee.photo_url,
-            Employee.name,
-            Employee.lastname,
-            func.coalesce(received_sub.c.received, 0).label("received"),
-            func.coalesce(sent_sub.c.sent, 0).label("sent"),
-        )
-        .outerjoin(received_sub, Employee.bitrix_id == received_sub.c.employee_id)
-        .outerjoin(sent_sub, Employee.bitrix_id == sent_sub.c.employee_id)
-        .filter(
-            or_(
-                received_sub.c.received.isnot(None),
-                sent_sub.c.sent.isnot(None),
-            )
-        )
-        .order_by(
-            desc(func.coalesce(received_sub.c.received, 0)),
-            desc(func.coalesce(sent_sub.c.sent, 0)),
-        )
+        rating_rows_query(db, RATING_SCOPE_OVERALL)
         .offset(offset)
         .limit(limit)
         .all()
@@ -261,54 +170,49 @@ def calc_overall_rating(db: Session, page: int, limit: int):
     }
 
 
-def calc_monthly_top_active_game(db: Session, limit: int = 3) -> MonthlyTopResponse:
-    active_game = (
-        db.query(Game)
-        .filter(Game.game_is_active.is_(True))
-        .first()
-    )
+def get_top_period(
+        now_local: datetime,
+        period: str,
+        date_from: date | None,
+        date_to: date | None,
+) -> tuple[date, date]:
+    """
+    Локальные дни [начало, конец] для топа: явный диапазон date_from/date_to
+    или текущий месяц/неделя (period), если диапазон не задан.
+    """
+    today = now_local.date()
+    if period == "week":
+        default_from = today - timedelta(days=today.weekday())
+        default_to = default_from + timedelta(days=6)
+    else:
+        default_from = today.replace(day=1)
+        next_month = (default_from + timedelta(days=32)).replace(day=1)
+        default_to = next_month - timedelta(days=1)
 
-    now_local = datetime.now(LOCAL_TZ)
-    period_start_local = now_local.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    if period_start_local.month == 12:
-        next_month_local = period_start_local.replace(
-            year=period_start_local.year + 1,
-            month=1,
+    day_from = date_from or default_from
+    day_to = date_to or (default_to if date_from is None else today)
+    if day_from > day_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Начало периода позже его окончания",
         )
-    else:
-        next_month_local = period_start_local.replace(month=period_start_local.month + 1)
+    return day_from, day_to
 
-    # Timestamps in DB are stored as naive datetimes and treated as UTC in the app.
-    period_start_utc = period_start_local.astimezone(timezone.utc).replace(tzinfo=None)
-    next_month_utc = next_month_local.astimezone(timezone.utc).replace(tzinfo=None)
 
-    rows = (
-        db.query(
-            Employee.bitrix_id,
-            Employee.photo_url,
-            Employee.name,
-            Employee.lastname,
-            func.count(LikeTransaction.id).label("received"),
-        )
-        .join(LikeTransaction, LikeTransaction.to_user_bitrix_id == Employee.bitrix_id)
-        .filter(
-            LikeTransaction.created_at >= period_start_utc,
-            LikeTransaction.created_at < next_month_utc,
-        )
-        .group_by(
-            Employee.bitrix_id,
-            Employee.photo_url,
-            Employee.name,
-            Employee.lastname,
-        )
-        .order_by(
-            desc(func.count(LikeTransaction.id)),
-            Employee.lastname.asc(),
-            Employee.name.asc(),
-        )
-        .limit(limit)
-        .all()
-    )
+def calc_monthly_top_active_game(
+        db: Session,
+        limit: int = 3,
+        period: str = "month",
+        date_from: date | None = None,
+        date_to: date | None = None,
+) -> MonthlyTopResponse:
+    active_game = game_cache.get_flagged_active_game(db)
+
+    now_local = datetime.now(LOCAL_TZ)
+    day_from, day_to = get_top_period(now_local, period, date_from, date_to)
+
+    # Считается по дневным итогам like_daily_rollups, а не по like_transactions
+    rows = top_received_rows(db, day_from, day_to, limit)
 
     leaders = [
         MonthlyTopRow(
@@ -325,8 +229,12 @@ def calc_monthly_top_active_game(db: Session, limit: int = 3) -> MonthlyTopRespo
         has_active_game=active_game is not None,
         game_id=active_game.id if active_game else None,
         game_name=active_game.name if active_game else "",
-        period_start=period_start_local.replace(tzinfo=None),
-        period_end=now_local.replace(tzinfo=None),
+        period_start=datetime.combine(day_from, time()),
+        period_end=(
+            now_local.replace(tzinfo=None)
+            if date_to is None and day_from <= now_local.date() <= day_to
+            else datetime.combine(day_to, time.max)
+        ),
         leaders=leaders,
     )
 
@@ -340,32 +248,106 @@ def get_overall_rating_route(
     return calc_overall_rating(db, page=page, limit=limit)
 
 
+@router.get("/api/rating/rank/{bitrix_id}", response_model=MyRankResponse)
+def get_my_rank(
+        bitrix_id: int,
+        game_id: int | None = None,
+        neighbours: int = Query(2, ge=0, le=20),
+        db: Session = Depends(get_db),
+):
+    """
+    Место сотрудника в рейтинге игры (game_id) или в общем рейтинге
+    и до neighbours соседей сверху и снизу.
+    """
+    if game_id is not None and game_cache.get_game(db, game_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Игра не найдена",
+        )
+
+    scope = game_id if game_id is not None else RATING_SCOPE_OVERALL
+    counter, place, above, below = get_rating_place(db, scope, bitrix_id, neighbours)
+
+    def to_row(r, row_place: int) -> RatingPlaceRow:
+        return RatingPlaceRow(
+            bitrix_id=r.bitrix_id,
+            photo_url=r.photo_url,
+            fio=f"{(r.lastname or '').strip()} {(r.name or '').strip()}".strip() or "Без имени",
+            received=r.received,
+            sent=r.sent,
+            place=row_place,
+        )
+
+    return MyRankResponse(
+        game_id=game_id,
+        bitrix_id=bitrix_id,
+        place=place,
+        received=counter.received if counter else 0,
+        sent=counter.sent if counter else 0,
+        above=[to_row(r, place - len(above) + index) for index, r in enumerate(above)] if counter else [],
+        below=[to_row(r, place + 1 + index) for index, r in enumerate(below)] if counter else [],
+    )
+
+
 @router.get("/api/rating/monthly-top-active-game", response_model=MonthlyTopResponse)
-def get_monthly_top_active_game(db: Session = Depends(get_db)):
-    return calc_monthly_top_active_game(db, limit=3)
+def get_monthly_top_active_game(
+        period: Literal["month", "week"] = "month",
+        date_from: date | None = None,
+        date_to: date | None = None,
+        limit: int = Query(3, ge=1, le=50),
+        db: Session = Depends(get_db),
+):
+    """
+    Топ по полученным Спасибкам за период (локальные дни, границы включительно).
+    - без параметров → текущий месяц, как раньше
+    - period=week → текущая неделя
+    - date_from/date_to → произвольный диапазон; без date_to — по сегодняшний день
+    """
+    return calc_monthly_top_active_game(
+        db,
+        limit=limit,
+        period=period,
+        date_from=date_from,
+        date_to=date_to,
+    )
 
 
 @router.get("/api/games", response_model=dict)
-def get_all_games(is_active: bool = False, page: int = 1, limit: int = 5, db: Session = Depends(get_db)):
-    offset = (page - 1) * limit
-
-    if is_active:
-        games = db.query(Game).filter(Game.game_is_active.is_(True)).offset(offset).limit(limit).all()
+def get_all_games(
+        is_active: bool = False,
+        page: int = Query(1, ge=1),
+        limit: int = Query(5, ge=1, le=100),
+        after: str | None = None,
+        include_total: bool = True,
+        db: Session = Depends(get_db),
+):
+    """
+    Игры по возрастанию id. after=<курсор> включает keyset-пагинацию по id
+    без подсчёта total_pages.
+    """
+    after_id = decode_id_cursor(after)
+    query = db.query(Game).filter(Game.game_is_active.is_(is_active)).order_by(Game.id)
+
+    total_pages = None
+    if after_id is not None:
+        query = query.filter(Game.id > after_id)
     else:
-        games = db.query(Game).filter(Game.game_is_active.is_(False)).offset(offset).limit(limit).all()
+        if include_total:
+            total_games = db.query(Game).filter(Game.game_is_active.is_(is_active)).count()
+            total_pages = (total_games + limit - 1) // limit
+        query = query.offset((page - 1) * limit)
 
-    total_games = db.query(Game).filter(Game.game_is_active.is_(is_active)).count()
-    total_pages = (total_games + limit - 1) // limit
+    games = query.limit(limit).all()
 
     games_data = [GameResponse.validate(game) for game in games]
 
     return {
         "games": games_data,
-        "total_pages": total_pages
+        "total_pages": total_pages,
+        "next_cursor": encode_cursor({"id": games[-1].id}) if len(games) == limit else None,
     }
 
 
-
 @router.get("/api/games/all", response_model=List[GameResponse])
 def get_all_games_no_filter(db: Session = Depends(get_db)):
     try:
@@ -406,7 +388,7 @@ def get_game_stats(game_id: int, db: Session = Depends(get_db)):
             Employee.photo_url,
         )
         .join(GameParticipant, GameParticipant.employee_bitrix_id == Employee.bitrix_id)
-        .filter(GameParticipant.game_id == game.id)
+        .filter(GameParticipant.game_id == game.id, Employee.is_active.is_(True))
         .order_by(Employee.lastname.asc(), Employee.name.asc())
         .all()
     )
@@ -417,24 +399,23 @@ def get_game_stats(game_id: int, db: Session = Depends(get_db)):
     if participant_ids:
         sent_query = (
             db.query(
-                LikeTransaction.from_user_bitrix_id.label("bitrix_id"),
-                func.count(LikeTransaction.id).label("sent"),
+                LikePeriodQuota.sender_bitrix_id.label("bitrix_id"),
+                func.sum(LikePeriodQuota.sent).label("sent"),
             )
             .filter(
-                LikeTransaction.game_id == game.id,
-                LikeTransaction.from_user_bitrix_id.in_(participant_ids),
+                LikePeriodQuota.game_id == game.id,
+                LikePeriodQuota.sender_bitrix_id.in_(participant_ids),
             )
         )
 
-        if game.game_is_active and game.setting_limitParameter != LimitParameter.GAME:
-            now = datetime.utcnow()
-            period_start = get_game_period_start(game, now)
-            if period_start is not None:
-                sent_query = sent_query.filter(LikeTransaction.created_at >= period_start)
+        if game.game_is_active:
+            sent_query = sent_query.filter(
+                LikePeriodQuota.period_start == get_quota_period_start(game, datetime.utcnow())
+            )
 
         sent_counts = (
             sent_query
-            .group_by(LikeTransaction.from_user_bitrix_id)
+            .group_by(LikePeriodQuota.sender_bitrix_id)
             .all()
         )
         sent_counts_map = {int(row.bitrix_id): int(row.sent) for row in sent_counts}
@@ -474,11 +455,7 @@ def get_game_stats(game_id: int, db: Session = Depends(get_db)):
 
 @router.get("/api/games/active/rating", response_model=List[GameRatingRow])
 def get_active_game_rating(db: Session = Depends(get_db)):
-    active_game = (
-        db.query(Game)
-        .filter(Game.game_is_active == True)
-        .first()
-    )
+    active_game = game_cache.get_flagged_active_game(db)
     if not active_game:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -521,6 +498,7 @@ def update_game(
 
     for field, value in data.items():
         setattr(game, field, value)
+    mark_games_changed(db)
 
     if participant_ids is not None:
         replace_game_participants(db, game.id, participant_ids)
@@ -531,6 +509,9 @@ def update_game(
     if participant_ids is not None and before.get("participant_ids") != after.get("participant_ids"):
         changed_fields.append("participant_ids")
 
+    if "setting_limitParameter" in changed_fields:
+        rebuild_like_period_quotas(db, game)
+
     if changed_fields:
         log_event(
             db,
@@ -589,6 +570,7 @@ def delete_game(game_id: int, admin_id: int | None = None, db: Session = Depends
             payload={"snapshot": snapshot},
         )
         db.delete(game)
+        mark_games_changed(db)
         db.commit()
     except IntegrityError:
         logger.exception(f"Ошибка БД при удалении игры ID {game_id}.")
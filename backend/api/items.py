@@ -4,13 +4,15 @@ from pathlib import Path
 from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException, Response, status, UploadFile, File
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from backend.models import Item, ItemCreate, ItemUpdate, ItemResponse, BuyTransactionResponse, \
     BuyTransactionCreate, BuyTransaction
-from backend.scripts.database import get_db
+from backend.scripts.database import get_db, get_async_db
 from backend.services.item_service import execute_buy_transaction, create_item_service, save_file
-from backend.services.bitrix_notify import send_bitrix_purchase_notification
+from backend.services.notification_outbox import notification_worker
 from backend.services.event_log import (
     EVENT_ITEM_DELETED,
     EVENT_ITEM_UPDATED,
@@ -39,31 +41,29 @@ def item_snapshot(item: Item) -> dict:
 
 
 @router.get("/api/show-items", response_model=list[ItemResponse])
-async def get_show_items(db: Session = Depends(get_db)):
+async def get_show_items(db: AsyncSession = Depends(get_async_db)):
 
-    available_items = db.query(Item).filter(
-        Item.is_active == True,
-        Item.stock > 0
-    ).all()
+    available_items = (await db.scalars(
+        select(Item).where(
+            Item.is_active == True,
+            Item.stock > 0
+        )
+    )).all()
 
     return available_items
 
 @router.post("/api/buy-item", response_model=BuyTransactionResponse)
-async def buy_item(item: BuyTransactionCreate, db: Session = Depends(get_db)):
+async def buy_item(item: BuyTransactionCreate, db: AsyncSession = Depends(get_async_db)):
 
     try:
-        new_transaction = await asyncio.to_thread(
+        new_transaction = await db.run_sync(
             execute_buy_transaction,
-            db,
             item.item_id,
             item.buyer_id,
             item.amount_spent
         )
 
-        purchased_item = db.query(Item).filter(Item.id == new_transaction.item_id).first()
-        item_name = purchased_item.name if purchased_item else f"товар #{new_transaction.item_id}"
-
-        await send_bitrix_purchase_notification(item.buyer_id, item_name, db)
+        notification_worker.wake()
 
         return new_transaction
 
@@ -75,11 +75,11 @@ async def buy_item(item: BuyTransactionCreate, db: Session = Depends(get_db)):
 
 
 @router.post("/api/items", response_model=ItemResponse, status_code=status.HTTP_201_CREATED)
-async def create_item(item: ItemCreate, admin_id: int | None = None, db: Session = Depends(get_db)):
+async def create_item(item: ItemCreate, admin_id: int | None = None, db: AsyncSession = Depends(get_async_db)):
     item_data = item.model_dump()
 
     try:
-        new_item = await asyncio.to_thread(create_item_service, db, item_data, admin_id)
+        new_item = await db.run_sync(create_item_service, item_data, admin_id)
 
         return new_item
 
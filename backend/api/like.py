@@ -1,45 +1,25 @@
-import asyncio
-import asyncio
-import logging
-
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.models import LikeRequest
-from backend.scripts.database import get_db
-from backend.services.bitrix_notify import send_bitrix_notification
+from backend.scripts.database import get_async_db
 from backend.services.like_service import process_like_transaction
+from backend.services.notification_outbox import notification_worker
 
 router = APIRouter()
 
-logger = logging.getLogger(__name__)
-
 @router.post("/api/like", status_code=status.HTTP_201_CREATED)
-async def send_like(payload: LikeRequest, db: Session = Depends(get_db)):
+async def send_like(payload: LikeRequest, db: AsyncSession = Depends(get_async_db)):
     try:
-        from_user_id, to_user_id = await asyncio.to_thread(
+        await db.run_sync(
             process_like_transaction,
-            db,
             payload
         )
 
     except HTTPException:
         raise
 
-    try:
-        notify_result = await send_bitrix_notification(from_user_id=from_user_id, to_user_id=to_user_id, db=db)
-        if isinstance(notify_result, dict) and notify_result.get("status", 200) >= 400:
-            logger.warning(
-                "Like sent, but Bitrix notification failed (from_user_id=%s, to_user_id=%s): %s",
-                from_user_id,
-                to_user_id,
-                notify_result,
-            )
-    except Exception:
-        logger.exception(
-            "Like sent, but unexpected error while sending Bitrix notification (from_user_id=%s, to_user_id=%s)",
-            from_user_id,
-            to_user_id,
-        )
+    # Уведомление уже лежит в outbox, отправит его фоновый воркер
+    notification_worker.wake()
 
     return {"message": "Спасибка отправлена!"}
@@ -1,6 +1,8 @@
 from datetime import timedelta
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import Integer, String, Text, cast, func, literal, null, or_, select, tuple_, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from backend.models import (
@@ -16,114 +18,133 @@ from backend.models import (
     ActivityFeedResponse,
     LOCAL_OFFSET,
 )
-from backend.scripts.database import get_db
+from backend.scripts.database import get_db, get_async_db
+from backend.services.like_rows import like_rows_select, like_user_name
+from backend.services.pagination import (
+    count_total_pages,
+    created_id_after,
+    decode_created_id_cursor,
+    encode_cursor,
+    next_created_id_cursor,
+)
 
 router = APIRouter()
 
 
 @router.get("/api/user/{user_id}/likes", response_model=UserLikesHistory)
-async def get_likes_history(user_id: int, limit: int = 50, offset: int = 0, db: Session = Depends(get_db)):
-    likes = db.query(LikeTransaction).filter(
-        (LikeTransaction.from_user_bitrix_id == user_id) |
-        (LikeTransaction.to_user_bitrix_id == user_id)
-    ).order_by(LikeTransaction.created_at.desc()).offset(offset).limit(limit).all()
-
-    if not likes:
-        return {"likes": [], "total_pages": 1}
-
-    total_likes = db.query(LikeTransaction).filter(
-        (LikeTransaction.from_user_bitrix_id == user_id) |
-        (LikeTransaction.to_user_bitrix_id == user_id)
-    ).count()
-
-    total_pages = (total_likes + limit - 1) // limit
+async def get_likes_history(
+        user_id: int,
+        limit: int = Query(50, ge=1, le=100),
+        offset: int = Query(0, ge=0),
+        after: str | None = None,
+        include_total: bool = True,
+        db: AsyncSession = Depends(get_async_db),
+):
+    """
+    История Спасибок пользователя, порядок (created_at, id) desc.
+    - after=<курсор> → keyset-пагинация без подсчёта total_pages
+    - без курсора → offset/limit; include_total=false отключает COUNT
+    """
+    cursor = decode_created_id_cursor(after)
+    user_filter = or_(
+        LikeTransaction.from_user_bitrix_id == user_id,
+        LikeTransaction.to_user_bitrix_id == user_id,
+    )
+
+    query = like_rows_select().where(user_filter)
+    if cursor is not None:
+        query = query.where(created_id_after(LikeTransaction.created_at, LikeTransaction.id, cursor))
+    else:
+        query = query.offset(offset)
+
+    likes = (
+        await db.execute(
+            query
+            .order_by(LikeTransaction.created_at.desc(), LikeTransaction.id.desc())
+            .limit(limit)
+        )
+    ).all()
 
-    result = []
-    for like in likes:
-        type_ = "sent" if like.from_user_bitrix_id == user_id else "received"
-        from_user = db.query(Employee).filter_by(bitrix_id=like.from_user_bitrix_id).first()
-        to_user = db.query(Employee).filter_by(bitrix_id=like.to_user_bitrix_id).first()
+    total_pages = None
+    if cursor is None and include_total:
+        if likes:
+            total_likes = await db.scalar(
+                select(func.count(LikeTransaction.id)).where(user_filter)
+            )
+            total_pages = count_total_pages(total_likes, limit)
+        else:
+            total_pages = 1
 
-        result.append(LikeHistoryResponse(
+    result = [
+        LikeHistoryResponse(
             id=like.id,
             date=like.created_at,
-            type=type_,
+            type="sent" if like.from_user_bitrix_id == user_id else "received",
             from_user_bitrix_id=like.from_user_bitrix_id,
             to_user_bitrix_id=like.to_user_bitrix_id,
-            msg=like.message,
+            msg=like.msg,
             sticker_id=like.sticker_id,
-            from_user_name=f"{from_user.name} {from_user.lastname}" if from_user else "Неизвестно",
-            to_user_name=f"{to_user.name} {to_user.lastname}" if to_user else "Неизвестно",
-        ))
+            from_user_name=like_user_name(like.from_user_name, like.from_user_lastname),
+            to_user_name=like_user_name(like.to_user_name, like.to_user_lastname),
+        )
+        for like in likes
+    ]
 
-    return {"likes": result, "total_pages": total_pages}
+    return {
+        "likes": result,
+        "total_pages": total_pages,
+        "next_cursor": next_created_id_cursor(likes, limit),
+    }
 
 
 @router.get("/api/likes/feed", response_model=AllLikesHistory)
 def get_all_likes_feed(
         db: Session = Depends(get_db),
-        limit: int = 10,
-        offset: int = 0,
+        limit: int = Query(10, ge=1, le=100),
+        offset: int = Query(0, ge=0),
+        after: str | None = None,
+        include_total: bool = True,
 ):
+    cursor = decode_created_id_cursor(after)
+
     try:
-        total_count = db.query(LikeTransaction).count()
-        total_pages = (total_count + limit - 1) // limit
-
-        likes_data = (
-            db.query(
-                LikeTransaction.id,
-                LikeTransaction.created_at,
-                Employee.name.label('from_user_name'),
-                Employee.lastname.label('from_user_lastname'),
-                Employee.photo_url.label('from_user_photo_url'),
-                LikeTransaction.to_user_bitrix_id,
-                LikeTransaction.from_user_bitrix_id,
-                LikeTransaction.message.label('msg'),
-                LikeTransaction.sticker_id,
-            )
-            .join(Employee, LikeTransaction.from_user_bitrix_id == Employee.bitrix_id, isouter=True)
-            .order_by(LikeTransaction.created_at.desc())
-            .offset(offset)
+        total_pages = None
+        if cursor is None and include_total:
+            total_count = db.scalar(select(func.count(LikeTransaction.id)))
+            total_pages = count_total_pages(total_count, limit)
+
+        query = like_rows_select()
+        if cursor is not None:
+            query = query.where(created_id_after(LikeTransaction.created_at, LikeTransaction.id, cursor))
+        else:
+            query = query.offset(offset)
+
+        likes_data = db.execute(
+            query
+            .order_by(LikeTransaction.created_at.desc(), LikeTransaction.id.desc())
             .limit(limit)
-            .all()
-        )
+        ).all()
 
-        likes_list = []
-
-        for like in likes_data:
-            to_user = db.query(Employee).filter_by(bitrix_id=like.to_user_bitrix_id).first()
-            local_time = like.created_at + timedelta(hours=LOCAL_OFFSET)
-
-            from_name = ""
-            if like.from_user_name:
-                from_name = f"{like.from_user_name} {like.from_user_lastname or ''}".strip()
-            else:
-                from_name = "Неизвестно"
-
-            to_name = ""
-            if to_user:
-                to_name = f"{to_user.name} {to_user.lastname or ''}".strip()
-            else:
-                to_name = "Неизвестно"
-
-            likes_list.append(
-                AllLikeTransactionResponse(
-                    id=like.id,
-                    date=local_time,
-                    from_user_bitrix_id=like.from_user_bitrix_id,
-                    to_user_bitrix_id=like.to_user_bitrix_id,
-                    from_user_name=from_name,
-                    to_user_name=to_name,
-                    from_user_photo_url=like.from_user_photo_url,
-                    to_user_photo_url=to_user.photo_url if to_user else None,
-                    msg=like.msg,
-                    sticker_id=like.sticker_id,
-                )
+        likes_list = [
+            AllLikeTransactionResponse(
+                id=like.id,
+                date=like.created_at + timedelta(hours=LOCAL_OFFSET),
+                from_user_bitrix_id=like.from_user_bitrix_id,
+                to_user_bitrix_id=like.to_user_bitrix_id,
+                from_user_name=like_user_name(like.from_user_name, like.from_user_lastname),
+                to_user_name=like_user_name(like.to_user_name, like.to_user_lastname),
+                from_user_photo_url=like.from_user_photo_url,
+                to_user_photo_url=like.to_user_photo_url,
+                msg=like.msg,
+                sticker_id=like.sticker_id,
             )
+            for like in likes_data
+        ]
 
         return AllLikesHistory(
             likes=likes_list,
-            total_pages=total_pages
+            total_pages=total_pages,
+            next_cursor=next_created_id_cursor(likes_data, limit),
         )
 
     except Exception as e:
@@ -131,107 +152,178 @@ def get_all_likes_feed(
         raise HTTPException(status_code=500, detail="Ошибка при загрузке истории Спасибок")
 
 
-@router.get("/api/activity/feed", response_model=ActivityFeedResponse)
-def get_activity_feed(
-        db: Session = Depends(get_db),
-        limit: int = 20,
-        offset: int = 0,
-):
-    try:
-        total_likes = db.query(LikeTransaction).count()
-        total_purchases = db.query(BuyTransaction).count()
-        total_count = total_likes + total_purchases
-        total_pages = (total_count + limit - 1) // limit if total_count > 0 else 1
-
-        likes_data = (
-            db.query(
-                LikeTransaction.id,
-                LikeTransaction.created_at,
-                Employee.name.label('from_user_name'),
-                Employee.lastname.label('from_user_lastname'),
-                Employee.photo_url.label('from_user_photo_url'),
-                LikeTransaction.to_user_bitrix_id,
-                LikeTransaction.from_user_bitrix_id,
-                LikeTransaction.message.label('msg'),
-                LikeTransaction.sticker_id,
-            )
-            .join(Employee, LikeTransaction.from_user_bitrix_id == Employee.bitrix_id, isouter=True)
-            .order_by(LikeTransaction.created_at.desc())
-            .all()
-        )
+ACTIVITY_THANKS = "thanks"
+ACTIVITY_PURCHASE = "purchase"
 
-        purchases_data = (
-            db.query(
-                BuyTransaction.id,
-                BuyTransaction.created_at,
-                BuyTransaction.buyer_id,
-                BuyTransaction.amount_spent,
-                Item.name.label('item_name'),
-                Item.photo_url.label('item_photo_url'),
-                Employee.name.label('buyer_name'),
-                Employee.lastname.label('buyer_lastname'),
-                Employee.photo_url.label('buyer_photo_url'),
-            )
-            .join(Item, BuyTransaction.item_id == Item.id, isouter=True)
-            .join(Employee, BuyTransaction.buyer_id == Employee.bitrix_id, isouter=True)
-            .order_by(BuyTransaction.created_at.desc())
-            .all()
+
+ACTIVITY_COLUMNS = (
+    "id", "event_type", "created_at",
+    "from_user_bitrix_id", "to_user_bitrix_id",
+    "from_user_name", "from_user_lastname", "from_user_photo_url",
+    "to_user_name", "to_user_lastname", "to_user_photo_url",
+    "msg", "sticker_id",
+    "buyer_id", "buyer_name", "buyer_lastname", "buyer_photo_url",
+    "item_name", "item_photo_url", "amount_spent",
+)
+
+
+def _activity_likes_branch(cursor: dict | None, branch_limit: int):
+    stmt = like_rows_select().add_columns(
+        literal(ACTIVITY_THANKS).label("event_type"),
+        cast(null(), Integer).label("buyer_id"),
+        cast(null(), String).label("buyer_name"),
+        cast(null(), String).label("buyer_lastname"),
+        cast(null(), String).label("buyer_photo_url"),
+        cast(null(), String).label("item_name"),
+        cast(null(), String).label("item_photo_url"),
+        cast(null(), Integer).label("amount_spent"),
+    )
+
+    if cursor is not None:
+        # «thanks» > «purchase» в порядке (created_at, id, event_type) desc,
+        # поэтому для лайков строка с тем же (created_at, id) всегда уже показана
+        stmt = stmt.where(created_id_after(LikeTransaction.created_at, LikeTransaction.id, cursor))
+
+    return (
+        stmt
+        .order_by(LikeTransaction.created_at.desc(), LikeTransaction.id.desc())
+        .limit(branch_limit)
+        .subquery()
+    )
+
+
+def _activity_purchases_branch(cursor: dict | None, branch_limit: int):
+    stmt = (
+        select(
+            BuyTransaction.id.label("id"),
+            literal(ACTIVITY_PURCHASE).label("event_type"),
+            BuyTransaction.created_at.label("created_at"),
+            cast(null(), Integer).label("from_user_bitrix_id"),
+            cast(null(), Integer).label("to_user_bitrix_id"),
+            cast(null(), String).label("from_user_name"),
+            cast(null(), String).label("from_user_lastname"),
+            cast(null(), String).label("from_user_photo_url"),
+            cast(null(), String).label("to_user_name"),
+            cast(null(), String).label("to_user_lastname"),
+            cast(null(), String).label("to_user_photo_url"),
+            cast(null(), Text).label("msg"),
+            cast(null(), Integer).label("sticker_id"),
+            BuyTransaction.buyer_id.label("buyer_id"),
+            Employee.name.label("buyer_name"),
+            Employee.lastname.label("buyer_lastname"),
+            Employee.photo_url.label("buyer_photo_url"),
+            Item.name.label("item_name"),
+            Item.photo_url.label("item_photo_url"),
+            BuyTransaction.amount_spent.label("amount_spent"),
+        )
+        .select_from(BuyTransaction)
+        .outerjoin(Item, BuyTransaction.item_id == Item.id)
+        .outerjoin(Employee, BuyTransaction.buyer_id == Employee.bitrix_id)
+    )
+
+    if cursor is not None:
+        key = tuple_(BuyTransaction.created_at, BuyTransaction.id)
+        if cursor["k"] == ACTIVITY_THANKS:
+            stmt = stmt.where(key <= (cursor["t"], cursor["id"]))
+        else:
+            stmt = stmt.where(key < (cursor["t"], cursor["id"]))
+
+    return (
+        stmt
+        .order_by(BuyTransaction.created_at.desc(), BuyTransaction.id.desc())
+        .limit(branch_limit)
+        .subquery()
+    )
+
+
+def _activity_feed_row(row) -> ActivityFeedRow:
+    local_time = row.created_at + timedelta(hours=LOCAL_OFFSET)
+
+    if row.event_type == ACTIVITY_THANKS:
+        return ActivityFeedRow(
+            id=row.id,
+            event_type=ACTIVITY_THANKS,
+            date=local_time,
+            from_user_bitrix_id=row.from_user_bitrix_id,
+            to_user_bitrix_id=row.to_user_bitrix_id,
+            from_user_name=like_user_name(row.from_user_name, row.from_user_lastname),
+            to_user_name=like_user_name(row.to_user_name, row.to_user_lastname),
+            from_user_photo_url=row.from_user_photo_url,
+            to_user_photo_url=row.to_user_photo_url,
+            msg=row.msg,
+            sticker_id=row.sticker_id,
         )
 
-        events: list[ActivityFeedRow] = []
+    buyer_fullname = (
+        f"{row.buyer_name or ''} {row.buyer_lastname or ''}".strip()
+        or "Неизвестно"
+    )
+    return ActivityFeedRow(
+        id=row.id,
+        event_type=ACTIVITY_PURCHASE,
+        date=local_time,
+        buyer_id=row.buyer_id,
+        buyer_name=buyer_fullname,
+        buyer_photo_url=row.buyer_photo_url,
+        item_name=row.item_name or "Товар",
+        item_photo_url=row.item_photo_url,
+        amount_spent=row.amount_spent,
+    )
 
-        for like in likes_data:
-            to_user = db.query(Employee).filter_by(bitrix_id=like.to_user_bitrix_id).first()
-            local_time = like.created_at + timedelta(hours=LOCAL_OFFSET)
 
-            from_name = (
-                f"{like.from_user_name} {like.from_user_lastname or ''}".strip()
-                if like.from_user_name else "Неизвестно"
-            )
-            to_name = (
-                f"{to_user.name} {to_user.lastname or ''}".strip()
-                if to_user else "Неизвестно"
-            )
+@router.get("/api/activity/feed", response_model=ActivityFeedResponse)
+def get_activity_feed(
+        db: Session = Depends(get_db),
+        limit: int = Query(20, ge=1, le=100),
+        offset: int = Query(0, ge=0),
+        after: str | None = None,
+        include_total: bool = True,
+):
+    """
+    Общая лента: Спасибки и покупки одним UNION ALL, порядок (created_at, id) desc.
+    - after=<курсор> → keyset-пагинация, читается O(limit) строк, без подсчёта total_pages
+    - без курсора → старый режим offset/limit с total_pages (include_total=false отключает COUNT)
+    """
+    cursor = decode_created_id_cursor(after)
+    if cursor is not None:
+        if cursor.get("k") not in (ACTIVITY_THANKS, ACTIVITY_PURCHASE):
+            raise HTTPException(status_code=400, detail="Некорректный курсор пагинации")
+        offset = 0
 
-            events.append(ActivityFeedRow(
-                id=like.id,
-                event_type="thanks",
-                date=local_time,
-                from_user_bitrix_id=like.from_user_bitrix_id,
-                to_user_bitrix_id=like.to_user_bitrix_id,
-                from_user_name=from_name,
-                to_user_name=to_name,
-                from_user_photo_url=like.from_user_photo_url,
-                to_user_photo_url=to_user.photo_url if to_user else None,
-                msg=like.msg,
-                sticker_id=like.sticker_id,
-            ))
+    try:
+        branch_limit = offset + limit
+        likes_branch = _activity_likes_branch(cursor, branch_limit)
+        purchases_branch = _activity_purchases_branch(cursor, branch_limit)
+        feed = union_all(
+            select(*[likes_branch.c[name] for name in ACTIVITY_COLUMNS]),
+            select(*[purchases_branch.c[name] for name in ACTIVITY_COLUMNS]),
+        ).subquery()
+
+        rows = db.execute(
+            select(feed)
+            .order_by(feed.c.created_at.desc(), feed.c.id.desc(), feed.c.event_type.desc())
+            .offset(offset)
+            .limit(limit)
+        ).all()
 
-        for purchase in purchases_data:
-            local_time = purchase.created_at + timedelta(hours=LOCAL_OFFSET)
-            buyer_fullname = (
-                f"{purchase.buyer_name or ''} {purchase.buyer_lastname or ''}".strip()
-                or "Неизвестно"
-            )
+        events = [_activity_feed_row(row) for row in rows]
+
+        next_cursor = None
+        if len(rows) == limit:
+            last = rows[-1]
+            next_cursor = encode_cursor({"t": last.created_at, "id": last.id, "k": last.event_type})
 
-            events.append(ActivityFeedRow(
-                id=purchase.id,
-                event_type="purchase",
-                date=local_time,
-                buyer_id=purchase.buyer_id,
-                buyer_name=buyer_fullname,
-                buyer_photo_url=purchase.buyer_photo_url,
-                item_name=purchase.item_name or "Товар",
-                item_photo_url=purchase.item_photo_url,
-                amount_spent=purchase.amount_spent,
-            ))
-
-        events.sort(key=lambda e: (e.date, e.id), reverse=True)
-        page_slice = events[offset:offset + limit]
+        total_pages = None
+        if cursor is None and include_total:
+            total_likes = db.scalar(select(func.count(LikeTransaction.id)))
+            total_purchases = db.scalar(select(func.count(BuyTransaction.id)))
+            total_count = total_likes + total_purchases
+            total_pages = count_total_pages(total_count, limit)
 
         return ActivityFeedResponse(
-            events=page_slice,
+            events=events,
             total_pages=total_pages,
+            next_cursor=next_cursor,
         )
 
     except Exception as e:
@@ -1,14 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.models import Game, GameParticipant
-from backend.scripts.database import get_db
+from backend.scripts.database import get_async_db
+from backend.services.game_cache import game_cache
 from backend.services.game_service import (
     get_active_game,
-    get_received_likes_count,
-    get_remaining_likes,
-    get_sent_likes_count,
+    received_likes_count_stmt,
+    sent_likes_count_stmt,
 )
 
 router = APIRouter()
@@ -27,12 +26,12 @@ class LikesInfoResponse(BaseModel):
 async def get_likes_info(
         bitrix_id: int,
         game_id: int | None = Query(default=None, ge=1),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
     active_game = None
 
     if game_id is not None:
-        selected_game = db.query(Game).filter(Game.id == game_id).first()
+        selected_game = await db.run_sync(game_cache.get_game, game_id)
         if not selected_game:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -43,23 +42,14 @@ async def get_likes_info(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Игра не активна",
             )
-        is_participant = (
-            db.query(GameParticipant.id)
-            .filter(
-                GameParticipant.game_id == selected_game.id,
-                GameParticipant.employee_bitrix_id == bitrix_id,
-            )
-            .first()
-            is not None
-        )
-        if not is_participant:
+        if bitrix_id not in selected_game.participant_ids:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Сотрудник не участвует в выбранной игре",
             )
         active_game = selected_game
     else:
-        active_game = get_active_game(db)
+        active_game = await db.run_sync(get_active_game)
 
     if not active_game:
         return LikesInfoResponse(
@@ -71,9 +61,9 @@ async def get_likes_info(
             has_active_game=False
         )
 
-    received_likes = get_received_likes_count(db, bitrix_id, active_game.id)
-    remaining_likes = get_remaining_likes(db, bitrix_id, active_game)
-    sent_likes = get_sent_likes_count(db, bitrix_id, active_game)
+    received_likes = await db.scalar(received_likes_count_stmt(bitrix_id, active_game.id)) or 0
+    sent_likes = await db.scalar(sent_likes_count_stmt(bitrix_id, active_game)) or 0
+    remaining_likes = max(0, active_game.setting_limitValue - sent_likes)
 
     return LikesInfoResponse(
         received_likes=received_likes,
@@ -1,12 +1,14 @@
 import math
 
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.models import BuyTransaction, Item, PurchaseHistoryPage, PurchaseHistoryResponse, AllPurchasesPage, \
     AllPurchasesRow, Employee
-from backend.scripts.database import get_db
+from backend.scripts.database import get_async_db
 from backend.scripts.time_utils import to_local_time
+from backend.services.pagination import created_id_after, decode_created_id_cursor, next_created_id_cursor
 
 router = APIRouter()
 
@@ -16,20 +18,34 @@ async def get_user_purchases(
         user_id: int,
         page: int = Query(1, ge=1),
         limit: int = Query(5, ge=1, le=50),
-        db: Session = Depends(get_db)
+        after: str | None = None,
+        include_total: bool = True,
+        db: AsyncSession = Depends(get_async_db)
 ):
+    """
+    Покупки пользователя, порядок (created_at, id) desc.
+    after=<курсор> включает keyset-пагинацию: page и total в ответе не заполняются.
+    """
+    cursor = decode_created_id_cursor(after)
     offset = (page - 1) * limit
 
-    query = db.query(BuyTransaction, Item) \
+    query = select(BuyTransaction, Item) \
         .join(Item, BuyTransaction.item_id == Item.id) \
-        .filter(BuyTransaction.buyer_id == user_id)
+        .where(BuyTransaction.buyer_id == user_id)
 
-    total_count = query.count()
+    total_count = None
+    if cursor is None and include_total:
+        total_count = await db.scalar(select(func.count()).select_from(query.subquery()))
 
-    results = query.order_by(BuyTransaction.created_at.desc()) \
-        .offset(offset) \
-        .limit(limit) \
-        .all()
+    if cursor is not None:
+        query = query.where(created_id_after(BuyTransaction.created_at, BuyTransaction.id, cursor))
+    else:
+        query = query.offset(offset)
+
+    results = (await db.execute(
+        query.order_by(BuyTransaction.created_at.desc(), BuyTransaction.id.desc())
+        .limit(limit)
+    )).all()
 
     purchases_list = []
     for buy_tx, item in results:
@@ -41,15 +57,17 @@ async def get_user_purchases(
             created_at=buy_tx.created_at
         ))
 
-    import math
-    total_pages = math.ceil(total_count / limit) if total_count > 0 else 1
+    total_pages = None
+    if total_count is not None:
+        total_pages = math.ceil(total_count / limit) if total_count > 0 else 1
 
     return PurchaseHistoryPage(
         purchases=purchases_list,
         total=total_count,
-        page=page,
+        page=page if cursor is None else None,
         size=limit,
-        total_pages=total_pages
+        total_pages=total_pages,
+        next_cursor=next_created_id_cursor([buy_tx for buy_tx, _ in results], limit),
     )
 
 
@@ -57,24 +75,32 @@ async def get_user_purchases(
 async def get_all_purchases(
         page: int = Query(1, ge=1),
         limit: int = Query(20, ge=1, le=100),
-        db: Session = Depends(get_db),
+        after: str | None = None,
+        include_total: bool = True,
+        db: AsyncSession = Depends(get_async_db),
 ):
+    cursor = decode_created_id_cursor(after)
     offset = (page - 1) * limit
 
     query = (
-        db.query(BuyTransaction, Item, Employee)
+        select(BuyTransaction, Item, Employee)
         .join(Item, BuyTransaction.item_id == Item.id)
         .join(Employee, BuyTransaction.buyer_id == Employee.bitrix_id)
     )
 
-    total_count = query.count()
+    total_count = None
+    if cursor is None and include_total:
+        total_count = await db.scalar(select(func.count()).select_from(query.subquery()))
 
-    results = (
-        query.order_by(BuyTransaction.created_at.desc())
-        .offset(offset)
+    if cursor is not None:
+        query = query.where(created_id_after(BuyTransaction.created_at, BuyTransaction.id, cursor))
+    else:
+        query = query.offset(offset)
+
+    results = (await db.execute(
+        query.order_by(BuyTransaction.created_at.desc(), BuyTransaction.id.desc())
         .limit(limit)
-        .all()
-    )
+    )).all()
 
     purchases_list: list[AllPurchasesRow] = []
 
@@ -90,12 +116,15 @@ async def get_all_purchases(
             )
         )
 
-    total_pages = math.ceil(total_count / limit) if total_count > 0 else 1
+    total_pages = None
+    if total_count is not None:
+        total_pages = math.ceil(total_count / limit) if total_count > 0 else 1
 
     return AllPurchasesPage(
         purchases=purchases_list,
         total=total_count,
-        page=page,
+        page=page if cursor is None else None,
         size=limit,
         total_pages=total_pages,
+        next_cursor=next_created_id_cursor([buy_tx for buy_tx, _, _ in results], limit),
     )
@@ -4,10 +4,11 @@ from pathlib import Path
 from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from backend.models import Sticker, StickerResponse, StickerCreate
-from backend.scripts.database import get_db
+from backend.scripts.database import get_db, get_async_db
 from backend.services.delete_file import delete_sticker_file_from_disk
 
 router = APIRouter()
@@ -37,8 +38,8 @@ def get_stickers_catalog(db: Session = Depends(get_db)):
 
 
 @router.get("/api/sticker/{sticker_id}", response_model=StickerResponse)
-async def get_sticker_url(sticker_id: int, db: Session = Depends(get_db)):
-    sticker = db.query(Sticker).filter(Sticker.id == sticker_id).first()
+async def get_sticker_url(sticker_id: int, db: AsyncSession = Depends(get_async_db)):
+    sticker = await db.get(Sticker, sticker_id)
     if not sticker:
         raise HTTPException(status_code=404, detail="Стикер не найден")
 
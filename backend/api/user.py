@@ -1,17 +1,18 @@
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.scripts.database import get_db
+from backend.scripts.database import get_async_db
 from ..models import Employee
 
 router = APIRouter()
 
 
 @router.get("/api/user")
-async def get_user(user_id: int, db: Session = Depends(get_db)):
+async def get_user(user_id: int, db: AsyncSession = Depends(get_async_db)):
 
-    user = db.query(Employee).filter_by(bitrix_id=user_id).first()
+    user = await db.scalar(select(Employee).where(Employee.bitrix_id == user_id))
 
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
@@ -1,16 +1,29 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, status, Depends, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from backend.models import Employee, EmployeeUpdate, EmployeeShortResponse, Game, GameParticipant
-from backend.scripts.database import get_db
-from backend.services.bitrix_users import get_all_users as get_all_users_from_bitrix
+from backend.models import (
+    Employee,
+    EmployeeUpdate,
+    EmployeeShortResponse,
+    EmployeeSyncJob,
+    EmployeeSyncJobResponse,
+    GameParticipant,
+)
+from backend.scripts.database import get_async_db
 from backend.services.db_get_tokens import get_tokens
-from backend.services.db_save_employee import save_or_update_employees
+from backend.services.employee_sync import employee_sync_runner, enqueue_employee_sync
 from backend.services.employee_audit import build_employee_changes, log_employee_audit
+from backend.services.game_cache import game_cache
+from backend.services.pagination import decode_id_cursor, encode_cursor
 from backend.services.event_log import (
     EVENT_EMPLOYEE_COINS_CHANGED,
     TARGET_EMPLOYEE,
     employee_full_name,
+    forget_actor_names,
     log_event,
 )
 
@@ -18,50 +31,62 @@ router = APIRouter()
 
 @router.get("/api/users")
 async def get_all_users(
+    response: Response,
     limit: int = 0,
     offset: int = 0,
     only_gamers: bool = False,
     active_game_only: bool = False,
     game_id: int | None = None,
-    db: Session = Depends(get_db),
+    after: str | None = None,
+    include_inactive: bool = False,
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Список сотрудников
     - если limit == 0 → вернуть всех (для модалки "Отправить Спасибку" и других мест)
-    - если limit > 0 → вернуть страницу с offset/limit (для настроек)
+    - если limit > 0 → вернуть страницу с offset/limit (для настроек), порядок по bitrix_id
+    - after=<курсор> → keyset-страница после курсора; курсор следующей страницы
+      приходит в заголовке X-Next-Cursor, тело ответа остаётся списком
     - only_gamers = true → вернуть только тех, у кого is_gamer = True
+    - include_inactive = true → вместе с деактивированными (пропавшими из Bitrix)
     """
+    after_id = decode_id_cursor(after)
 
-    query = db.query(Employee)
+    query = select(Employee)
+
+    if not include_inactive:
+        query = query.where(Employee.is_active.is_(True))
 
     if only_gamers:
-        query = query.filter(Employee.is_gamer.is_(True))
+        query = query.where(Employee.is_gamer.is_(True))
 
-    if game_id is not None:
-        participant_ids_subq = (
-            db.query(GameParticipant.employee_bitrix_id)
-            .filter(GameParticipant.game_id == game_id)
-        )
-        query = query.filter(Employee.bitrix_id.in_(participant_ids_subq))
-    elif active_game_only:
-        active_game = (
-            db.query(Game)
-            .filter(Game.game_is_active.is_(True))
-            .first()
-        )
+    participants_game_id = game_id
+    if participants_game_id is None and active_game_only:
+        active_game = await db.run_sync(game_cache.get_flagged_active_game)
         if not active_game:
             return []
+        participants_game_id = active_game.id
 
+    if participants_game_id is not None:
+        # Подзапрос, а не IN по множеству из кэша: один параметр вместо
+        # тысяч, и текст запроса не зависит от размера игры
         participant_ids_subq = (
-            db.query(GameParticipant.employee_bitrix_id)
-            .filter(GameParticipant.game_id == active_game.id)
+            select(GameParticipant.employee_bitrix_id)
+            .where(GameParticipant.game_id == participants_game_id)
         )
-        query = query.filter(Employee.bitrix_id.in_(participant_ids_subq))
+        query = query.where(Employee.bitrix_id.in_(participant_ids_subq))
 
     if limit > 0:
-        query = query.offset(offset).limit(limit)
+        query = query.order_by(Employee.bitrix_id).limit(limit)
+        if after_id is not None:
+            query = query.where(Employee.bitrix_id > after_id)
+        else:
+            query = query.offset(offset)
 
-    users = query.all()
+    users = (await db.scalars(query)).all()
+
+    if limit > 0 and len(users) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor({"id": users[-1].bitrix_id})
 
     return [
         {
@@ -73,42 +98,48 @@ async def get_all_users(
             "is_gamer": user.is_gamer,
             "is_admin": user.is_admin,
             "is_superadmin": getattr(user, "is_superadmin", False),
+            "is_active": user.is_active,
             "photo_url": user.photo_url
         }
         for user in users
     ]
 
 
-@router.post("/api/all_users")
-async def update_users(user_id: int, db: Session = Depends(get_db)):
+@router.post("/api/all_users", status_code=status.HTTP_202_ACCEPTED)
+async def update_users(
+    user_id: int,
+    mode: Literal["auto", "full", "delta"] = "auto",
+    db: AsyncSession = Depends(get_async_db),
+):
     """
-    Обновляет список сотрудников из Bitrix24.
+    Запускает фоновую синхронизацию сотрудников из Bitrix24.
+    - mode=full → все сотрудники, пропавшие из Bitrix деактивируются
+    - mode=delta → только изменённые в Bitrix с прошлой успешной синхронизации
+    - mode=auto → delta, если полная синхронизация была недавно, иначе full
+    Повторный запуск, пока синхронизация портала не завершилась,
+    возвращает уже идущую задачу. Прогресс — GET /api/all_users/jobs/{job_id}.
     """
-    try:
-        tokens = get_tokens(user_id, db)
-        if not tokens:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Нет сохранённых токенов для этого пользователя")
-
-        users = await get_all_users_from_bitrix(auth_id = tokens.access_token, refresh_id = tokens.refresh_token, domain = tokens.domain)
+    tokens = await db.run_sync(lambda session: get_tokens(user_id, session))
+    if not tokens:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Нет сохранённых токенов для этого пользователя")
 
-        if not users:
-            raise HTTPException(status_code=400, detail="Ошибка при запросе к API Битрикс24 или пустой ответ")
+    job, created = await db.run_sync(
+        lambda session: enqueue_employee_sync(session, tokens.domain, user_id, mode)
+    )
+    employee_sync_runner.wake()
 
-        updated_count = save_or_update_employees(users, db)
+    return {
+        "message": "Синхронизация сотрудников запущена" if created else "Синхронизация сотрудников уже выполняется",
+        "job": EmployeeSyncJobResponse.model_validate(job),
+    }
 
-        return {
-            "message": "Список сотрудников обновлён",
-            "count": updated_count,
-        }
 
-    except HTTPException:
-        raise
-
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Внутренняя ошибка при обновлении сотрудников",
-        )
+@router.get("/api/all_users/jobs/{job_id}", response_model=EmployeeSyncJobResponse)
+async def get_users_sync_job(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    job = await db.get(EmployeeSyncJob, job_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Задача синхронизации не найдена")
+    return job
 
 
 @router.patch("/api/users/{bitrix_id}", response_model=EmployeeShortResponse)
@@ -116,17 +147,16 @@ async def update_employee(
     bitrix_id: int,
     payload: EmployeeUpdate,
     admin_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Обновление сотрудника по bitrix_id.
     Разрешено менять только: name, lastname, coins, is_gamer, is_admin.
     Пишем аудит-лог в employee_audit.
     """
-    employee = (
-        db.query(Employee)
-        .filter(Employee.bitrix_id == bitrix_id)
-        .first()
+    employee = await db.scalar(
+        select(Employee)
+        .where(Employee.bitrix_id == bitrix_id)
     )
 
     if employee is None:
@@ -145,9 +175,9 @@ async def update_employee(
     if not changes:
         return employee
 
-    try:
+    def apply_changes(session: Session) -> None:
         log_employee_audit(
-            db=db,
+            db=session,
             employee=employee,
             admin_bitrix_id=admin_id,
             changes=changes,
@@ -161,7 +191,7 @@ async def update_employee(
             delta = new_num - old_num
             target_name = employee_full_name(employee)
             log_event(
-                db,
+                session,
                 event_type=EVENT_EMPLOYEE_COINS_CHANGED,
                 actor_bitrix_id=admin_id,
                 target_type=TARGET_EMPLOYEE,
@@ -181,12 +211,17 @@ async def update_employee(
             if field in ("name", "lastname", "coins", "is_gamer", "is_admin"):
                 setattr(employee, field, value)
 
-        db.commit()
-        db.refresh(employee)
+        if "name" in changes or "lastname" in changes:
+            forget_actor_names(session, [employee.bitrix_id])
+
+    try:
+        await db.run_sync(apply_changes)
+        await db.commit()
+        await db.refresh(employee)
         return employee
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print("Ошибка при обновлении сотрудника:", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1,32 +1,338 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from enum import IntEnum
+from urllib.parse import urlencode
 
 import httpx
 
+from backend.scripts.config import settings
+
+BATCH_MAX_COMMANDS = 50
+# Ключ пула соединений для OAuth-сервера в реестре клиентов
+OAUTH_HOST = "oauth.bitrix.info"
+# Ответы Bitrix24 о превышении лимита запросов к порталу
+THROTTLE_ERRORS = frozenset({"QUERY_LIMIT_EXCEEDED", "OPERATION_TIME_LIMIT"})
+
+logger = logging.getLogger(__name__)
+
+
+class BitrixClientRegistry:
+    """
+    Реестр httpx.AsyncClient на время жизни приложения: один клиент
+    с пулом keep-alive соединений на каждый домен портала Bitrix24.
+    """
+
+    def __init__(self, timeout: httpx.Timeout, limits: httpx.Limits):
+        self.timeout = timeout
+        self.limits = limits
+        self._clients: dict[str, httpx.AsyncClient] = {}
+
+    def get(self, domain: str) -> httpx.AsyncClient:
+        client = self._clients.get(domain)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+            self._clients[domain] = client
+        return client
+
+    async def aclose(self) -> None:
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await client.aclose()
+
+
+bitrix_clients = BitrixClientRegistry(
+    timeout=httpx.Timeout(
+        settings.BITRIX_HTTP_TIMEOUT,
+        connect=settings.BITRIX_HTTP_CONNECT_TIMEOUT,
+    ),
+    limits=httpx.Limits(
+        max_connections=settings.BITRIX_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.BITRIX_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.BITRIX_HTTP_KEEPALIVE_EXPIRY,
+    ),
+)
+
+
+class BitrixPriority(IntEnum):
+    """
+    Класс приоритета запроса: при исчерпании лимита портала запросы
+    с меньшим значением выполняются раньше.
+    """
+    INTERACTIVE = 0  # пользователь ждёт ответа: открытие приложения, уведомления
+    NORMAL = 1
+    BULK = 2  # фоновая синхронизация сотрудников
+
+
+class PortalRateLimiter:
+    """
+    Token bucket одного портала: rate запросов в секунду, запас до burst.
+    Когда запас исчерпан, запросы ждут в очереди по приоритету (внутри
+    приоритета — по порядку поступления); очередь разбирает одна задача.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._dispatcher: asyncio.Task | None = None
+
+        self.requests = 0
+        self.queued = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.throttled = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if now > self._paused_until:
+            elapsed = now - max(self._updated, self._paused_until)
+            self._tokens = min(float(self.burst), self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def _take(self) -> bool:
+        self._refill()
+        if self._tokens >= 1 and time.monotonic() >= self._paused_until:
+            self._tokens -= 1
+            return True
+        return False
+
+    async def acquire(self, priority: BitrixPriority) -> None:
+        self.requests += 1
+        if not self.queue_depth and self._take():
+            return
+
+        self.queued += 1
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._seq), future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        # Отменённое ожидание остаётся в куче как done() и пропускается диспетчером
+        await future
+        waited = time.monotonic() - started
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def pause(self, seconds: float) -> None:
+        """Портал ответил о превышении лимита: новых запросов нет seconds секунд."""
+        self.throttled += 1
+        self._refill()
+        self._tokens = 0.0
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def _dispatch(self) -> None:
+        while self._waiters:
+            if self._waiters[0][2].done():
+                heapq.heappop(self._waiters)
+                continue
+            if self._take():
+                _, _, future = heapq.heappop(self._waiters)
+                future.set_result(None)
+                continue
+            delay = max(self._paused_until - time.monotonic(), (1 - self._tokens) / self.rate, 0.001)
+            await asyncio.sleep(delay)
+
+    def metrics(self) -> dict:
+        return {
+            "requests": self.requests,
+            "queued": self.queued,
+            "queue_depth": self.queue_depth,
+            "wait_seconds_total": round(self.wait_seconds_total, 3),
+            "wait_seconds_avg": round(self.wait_seconds_total / self.queued, 3) if self.queued else 0.0,
+            "wait_seconds_max": round(self.wait_seconds_max, 3),
+            "throttled": self.throttled,
+        }
+
+
+class BitrixRateLimiterRegistry:
+    """Лимитеры запросов по доменам порталов на время жизни процесса."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._limiters: dict[str, PortalRateLimiter] = {}
+
+    def get(self, domain: str) -> PortalRateLimiter:
+        limiter = self._limiters.get(domain)
+        if limiter is None:
+            limiter = PortalRateLimiter(self.rate, self.burst)
+            self._limiters[domain] = limiter
+        return limiter
+
+    def metrics(self) -> dict[str, dict]:
+        return {domain: limiter.metrics() for domain, limiter in self._limiters.items()}
+
+
+bitrix_rate_limiters = BitrixRateLimiterRegistry(
+    rate=settings.BITRIX_RATE_LIMIT_PER_SECOND,
+    burst=settings.BITRIX_RATE_LIMIT_BURST,
+)
+
+
+async def refresh_oauth_tokens(refresh_token: str) -> dict:
+    """
+    Обменивает refresh_token на новую пару токенов через OAuth-сервер Bitrix24.
+    Возвращает ответ сервера: access_token, refresh_token, expires_in, ...
+    либо error / error_description.
+    """
+    client = bitrix_clients.get(OAUTH_HOST)
+    response = await client.get(
+        settings.BITRIX_OAUTH_URL,
+        params={
+            "grant_type": "refresh_token",
+            "client_id": settings.BITRIX_CLIENT_ID,
+            "client_secret": settings.BITRIX_CLIENT_SECRET,
+            "refresh_token": refresh_token,
+        },
+    )
+    return response.json()
+
+
+def _flatten_params(params: dict, prefix: str = "") -> list[tuple[str, str]]:
+    """
+    Разворачивает вложенные параметры в формат PHP http_build_query,
+    как их ожидает Bitrix24 в командах batch: FILTER[ID][0]=1.
+    """
+    pairs: list[tuple[str, str]] = []
+    for key, value in params.items():
+        name = f"{prefix}[{key}]" if prefix else str(key)
+        if isinstance(value, dict):
+            pairs.extend(_flatten_params(value, name))
+        elif isinstance(value, (list, tuple)):
+            pairs.extend(_flatten_params(dict(enumerate(value)), name))
+        elif isinstance(value, bool):
+            pairs.append((name, "true" if value else "false"))
+        elif value is None:
+            pairs.append((name, ""))
+        else:
+            pairs.append((name, str(value)))
+    return pairs
+
+
+class BitrixBatchResult:
+    """
+    Результат batch-вызова, разложенный по ключам команд.
+    """
+
+    def __init__(self):
+        self.results: dict[str, object] = {}
+        self.errors: dict[str, object] = {}
+        self.totals: dict[str, int] = {}
+
+
 class BitrixCurrent:
     """
     Класс-обёртка для вызовов Bitrix24 от имени конкретного пользователя.
     """
 
-    def __init__(self, auth_id: str, refresh_id: str, domain: str, app_sid: str = ""):
+    def __init__(
+            self,
+            auth_id: str,
+            refresh_id: str,
+            domain: str,
+            app_sid: str = "",
+            priority: BitrixPriority = BitrixPriority.NORMAL,
+    ):
         """
         auth_id — токен пользователя (ACCESS_TOKEN)
         refresh_id — токен обновления
         domain — домен портала Bitrix24 (например, b24-xxx.bitrix24.ru)
         app_sid — внутренний идентификатор приложения
+        priority — очередь запроса в лимитере портала
         """
         self.access_token = auth_id
         self.refresh_token = refresh_id
         self.domain = domain
         self.app_sid = app_sid
+        self.priority = priority
 
     async def call(self, method: str, params: dict = None):
         """
         Выполняет REST-запрос к Bitrix24 от имени текущего пользователя.
+        Запрос проходит через лимитер портала; на ответ о превышении лимита
+        лимитер приостанавливается, и запрос повторяется с растущей задержкой.
         """
         if params is None:
             params = {}
 
         url = f"https://{self.domain}/rest/{method}.json"
 
-        async with httpx.AsyncClient() as client:
+        client = bitrix_clients.get(self.domain)
+        limiter = bitrix_rate_limiters.get(self.domain)
+        attempt = 0
+        while True:
+            await limiter.acquire(self.priority)
             response = await client.post(url, data={**params, "auth": self.access_token})
-            return response.json()
\ No newline at end of file
+            result = response.json()
+
+            throttled = isinstance(result, dict) and result.get("error") in THROTTLE_ERRORS
+            if not throttled or attempt >= settings.BITRIX_THROTTLE_MAX_RETRIES:
+                return result
+
+            delay = settings.BITRIX_THROTTLE_RETRY_SECONDS * (2 ** attempt)
+            attempt += 1
+            logger.warning(
+                "Bitrix throttled %s on %s, retry %s in %.1fs",
+                method,
+                self.domain,
+                attempt,
+                delay,
+            )
+            limiter.pause(delay)
+
+    async def call_batch(self, commands: dict[str, tuple[str, dict | None]], halt: bool = False) -> BitrixBatchResult:
+        """
+        Выполняет команды через метод batch: до 50 команд за один REST-запрос.
+        commands — {ключ: (метод, параметры)}; больше 50 команд
+        автоматически разбиваются на несколько batch-запросов.
+        """
+        batch_result = BitrixBatchResult()
+        items = list(commands.items())
+
+        for chunk_start in range(0, len(items), BATCH_MAX_COMMANDS):
+            chunk = items[chunk_start:chunk_start + BATCH_MAX_COMMANDS]
+            params = {"halt": 1 if halt else 0}
+            for key, (method, method_params) in chunk:
+                query = urlencode(_flatten_params(method_params or {}))
+                params[f"cmd[{key}]"] = f"{method}?{query}" if query else method
+
+            response = await self.call("batch", params)
+
+            if "result" not in response:
+                error = {
+                    "error": response.get("error", "BATCH_FAILED"),
+                    "error_description": response.get("error_description", ""),
+                }
+                for key, _ in chunk:
+                    batch_result.errors[key] = error
+                continue
+
+            payload = response["result"] or {}
+            results = payload.get("result") or {}
+            errors = payload.get("result_error") or {}
+            totals = payload.get("result_total") or {}
+
+            for key, _ in chunk:
+                if key in errors:
+                    batch_result.errors[key] = errors[key]
+                elif key in results:
+                    batch_result.results[key] = results[key]
+                    if key in totals:
+                        batch_result.totals[key] = int(totals[key])
+                elif halt:
+                    batch_result.errors[key] = {"error": "BATCH_HALTED", "error_description": ""}
+
+        return batch_result
@@ -1,12 +1,16 @@
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI, Request, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
 
+from backend.api.bitrix import router as bitrix_router
 from backend.api.games import router as games_router
 from backend.api.events import router as events_router
+from backend.api.exports import router as exports_router
 from backend.api.install import router as install_router
 from backend.api.items import router as items_router
 from backend.api.like import router as like_router
@@ -16,13 +20,35 @@ from backend.api.purchase import router as purchase_router
 from backend.api.stickers import router as stickers_router
 from backend.api.user import router as user_router
 from backend.api.users import router as users_router
-from backend.scripts.database import Base, engine, SessionLocal, get_db
+from backend.bitrix_sdk.python_current_SDK import bitrix_clients
+from backend.scripts.database import Base, engine, SessionLocal, get_db, get_async_db
+from backend.services.bitrix_tokens import bitrix_token_manager
 from backend.services.bitrix_user import get_current_user
-from backend.services.bitrix_user_photo import get_user_photo
 from backend.services.db_save_employee import save_or_update_employees
 from backend.services.db_save_tokens import save_or_update_token
+from backend.services.employee_sync import employee_sync_runner
+from backend.services.event_sink import system_event_sink
+from backend.services.game_cache import game_cache_listener
+from backend.services.notification_outbox import notification_worker
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    notification_worker.start()
+    game_cache_listener.start()
+    employee_sync_runner.start()
+    system_event_sink.start()
+    try:
+        yield
+    finally:
+        await system_event_sink.stop()
+        await employee_sync_runner.stop()
+        await game_cache_listener.stop()
+        await notification_worker.stop()
+        await bitrix_clients.aclose()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(install_router)
 app.include_router(users_router)
@@ -30,6 +56,8 @@ app.include_router(like_router)
 app.include_router(user_router)
 app.include_router(games_router)
 app.include_router(events_router)
+app.include_router(bitrix_router)
+app.include_router(exports_router)
 app.include_router(likes_info_router)
 app.include_router(likes_history_router)
 app.include_router(items_router)
@@ -51,7 +79,7 @@ app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
 @app.post("/")
 async def root(
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     form = await request.form()
     data = dict(form)
@@ -63,23 +91,21 @@ async def root(
     status = data.get("status")
 
     try:
+        # user.current и фото одним batch-запросом; повторные открытия берутся из кэша
         current_user_data = await get_current_user(auth_id, refresh_id, domain)
         user_id = current_user_data["ID"]
 
-        try:
-            current_user_photo = await get_user_photo(auth_id, refresh_id, domain, user_id)
-        except Exception:
-            current_user_photo = None
-            
-        current_user_data["PERSONAL_PHOTO"] = current_user_photo
-
-        save_or_update_employees([current_user_data], db)
-        save_or_update_token(
-            domain, user_id, member_id, auth_id, refresh_id, expires_in, status, db
-        )
-        db.commit()
+        def save_user_and_token(session: Session) -> None:
+            save_or_update_employees([current_user_data], session, domain)
+            save_or_update_token(
+                domain, user_id, member_id, auth_id, refresh_id, expires_in, status, session
+            )
+
+        await db.run_sync(save_user_and_token)
+        await db.commit()
+        bitrix_token_manager.invalidate_user(int(user_id))
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise e
 
     html = f"""
@@ -3,7 +3,7 @@ from enum import Enum as PyEnum
 from typing import Optional, Literal, List
 
 from pydantic import BaseModel, Field, ConfigDict
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Enum, Index, Text, func, JSON, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, Boolean, Enum, Index, Text, func, JSON, UniqueConstraint, text, DDL, event, literal_column
 from sqlalchemy.orm import relationship
 
 from backend.scripts.database import Base
@@ -47,6 +47,12 @@ class Employee(Base):
     is_admin = Column(Boolean, default=False, nullable=False)
     is_superadmin = Column(Boolean, default=False, nullable=False)
     photo_url = Column(String, nullable=True)
+    # False — сотрудник пропал из Bitrix при полной синхронизации
+    is_active = Column(Boolean, default=True, nullable=False)
+    # sha256 синхронизируемых полей из Bitrix: строка перезаписывается, только если он изменился
+    bitrix_hash = Column(String(64), nullable=True)
+    # Портал Bitrix, из которого пришёл сотрудник: полная синхронизация портала деактивирует только своих
+    domain = Column(String, nullable=True)
 
     auth = relationship("BitrixAuth", uselist=False, back_populates="employee")
 
@@ -93,22 +99,64 @@ class EmployeeAudit(Base):
     employee = relationship("Employee", backref="audits")
 
 
+# Полнотекстовый поиск по журналу. Конфигурация и пустые строки — литералы,
+# а не параметры: иначе выражение в запросе не совпадёт с выражением индекса
+SYSTEM_EVENT_SEARCH_CONFIG = literal_column("'russian'::regconfig")
+
+
+def _event_search_vector(message, target_name_snapshot):
+    return func.to_tsvector(
+        SYSTEM_EVENT_SEARCH_CONFIG,
+        func.coalesce(message, literal_column("''"))
+        .op("||")(literal_column("' '"))
+        .op("||")(func.coalesce(target_name_snapshot, literal_column("''"))),
+    )
+
+
 class SystemEvent(Base):
+    """
+    Журнал системных событий. В PostgreSQL таблица секционирована по месяцам
+    created_at (system_events_YYYY_MM), поэтому первичный ключ включает created_at.
+    Секции создаёт и архивирует backend.scripts.maintain_system_events.
+    """
     __tablename__ = "system_events"
 
-    id = Column(Integer, primary_key=True, index=True)
-    event_type = Column(String(64), nullable=False, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    event_type = Column(String(64), nullable=False)
 
-    actor_bitrix_id = Column(Integer, nullable=True, index=True)
+    actor_bitrix_id = Column(Integer, nullable=True)
     actor_name_snapshot = Column(String(255), nullable=False, default="")
 
-    target_type = Column(String(32), nullable=False, index=True)
-    target_id = Column(Integer, nullable=True, index=True)
+    target_type = Column(String(32), nullable=False)
+    target_id = Column(Integer, nullable=True)
     target_name_snapshot = Column(String(255), nullable=True)
 
     message = Column(Text, nullable=False)
     payload = Column(JSON, nullable=True)
-    created_at = Column(DateTime, nullable=False, server_default=func.now(), index=True)
+    created_at = Column(DateTime, primary_key=True, nullable=False, server_default=func.now(), index=True)
+
+    __table_args__ = (
+        Index("ix_system_events_created_id", "created_at", "id"),
+        # Фильтры журнала: равенство по первым колонкам, порядок страницы — по (created_at, id)
+        Index("ix_system_events_type_created_id", "event_type", "created_at", "id"),
+        Index("ix_system_events_actor_created_id", "actor_bitrix_id", "created_at", "id"),
+        Index("ix_system_events_target_created_id", "target_type", "target_id", "created_at", "id"),
+        Index("ix_system_events_search", _event_search_vector(message, target_name_snapshot), postgresql_using="gin"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+
+system_event_search_vector = _event_search_vector(SystemEvent.message, SystemEvent.target_name_snapshot)
+
+
+# Секция по умолчанию: вставка не падает, даже если месячная секция ещё не создана
+event.listen(
+    SystemEvent.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS system_events_default PARTITION OF system_events DEFAULT").execute_if(
+        dialect="postgresql"
+    ),
+)
 
 
 class SystemEventRow(BaseModel):
@@ -128,10 +176,22 @@ class SystemEventRow(BaseModel):
 
 class SystemEventsPage(BaseModel):
     events: List[SystemEventRow]
-    total: int
-    page: int
+    total: Optional[int] = None
+    page: Optional[int] = None
     size: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+
+class BitrixPortalMetrics(BaseModel):
+    domain: str
+    requests: int
+    queued: int
+    queue_depth: int
+    wait_seconds_total: float
+    wait_seconds_avg: float
+    wait_seconds_max: float
+    throttled: int
 
 
 # --- 3. Таблица транзакций лайков ---
@@ -155,6 +215,7 @@ class LikeTransaction(Base):
         Index('ix_like_transactions_from_user_game', 'from_user_bitrix_id', 'game_id'),
         Index('ix_like_transactions_to_user_game', 'to_user_bitrix_id', 'game_id'),
         Index('ix_like_transactions_created_game', 'created_at', 'game_id'),
+        Index('ix_like_transactions_created_id', 'created_at', 'id'),
     )
 
 
@@ -182,7 +243,8 @@ class LikeHistoryResponse(BaseModel):
 
 class UserLikesHistory(BaseModel):
     likes: List[LikeHistoryResponse]
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 
 class AllLikeTransactionResponse(BaseModel):
@@ -202,7 +264,8 @@ class AllLikeTransactionResponse(BaseModel):
 
 class AllLikesHistory(BaseModel):
     likes: List[AllLikeTransactionResponse]
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 
 class ActivityFeedRow(BaseModel):
@@ -231,7 +294,8 @@ class ActivityFeedRow(BaseModel):
 
 class ActivityFeedResponse(BaseModel):
     events: List[ActivityFeedRow]
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 
 # --- 4. Таблица игры ---
@@ -288,6 +352,84 @@ class GameParticipant(Base):
     )
 
 
+class LikePeriodQuota(Base):
+    """Сколько Спасибок отправитель потратил в игре за период лимита (день/неделя/месяц/вся игра)."""
+    __tablename__ = "like_period_quotas"
+
+    id = Column(Integer, primary_key=True, index=True)
+    game_id = Column(Integer, ForeignKey("games.id"), nullable=False)
+    sender_bitrix_id = Column(Integer, ForeignKey("employees.bitrix_id"), nullable=False)
+    period_start = Column(DateTime, nullable=False)
+    sent = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "game_id", "sender_bitrix_id", "period_start",
+            name="uq_like_period_quotas_game_sender_period",
+        ),
+    )
+
+
+class LikePairQuota(Base):
+    """Сколько Спасибок отправитель отправил конкретному получателю в игре."""
+    __tablename__ = "like_pair_quotas"
+
+    id = Column(Integer, primary_key=True, index=True)
+    game_id = Column(Integer, ForeignKey("games.id"), nullable=False)
+    sender_bitrix_id = Column(Integer, ForeignKey("employees.bitrix_id"), nullable=False)
+    recipient_bitrix_id = Column(Integer, ForeignKey("employees.bitrix_id"), nullable=False)
+    sent = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint(
+            "game_id", "sender_bitrix_id", "recipient_bitrix_id",
+            name="uq_like_pair_quotas_game_sender_recipient",
+        ),
+    )
+
+
+class RatingCounter(Base):
+    """
+    Счётчики рейтинга: сколько Спасибок сотрудник получил и отправил.
+    game_id = 0 — общий рейтинг по всем Спасибкам, иначе рейтинг игры.
+    """
+    __tablename__ = "rating_counters"
+
+    id = Column(Integer, primary_key=True, index=True)
+    game_id = Column(Integer, nullable=False, default=0)
+    bitrix_id = Column(Integer, ForeignKey("employees.bitrix_id"), nullable=False)
+    received = Column(Integer, nullable=False, default=0)
+    sent = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("game_id", "bitrix_id", name="uq_rating_counters_game_employee"),
+    )
+
+
+Index(
+    "ix_rating_counters_game_rating",
+    RatingCounter.game_id,
+    RatingCounter.received.desc(),
+    RatingCounter.sent.desc(),
+    RatingCounter.bitrix_id.desc(),
+)
+
+
+class LikeDailyRollup(Base):
+    """Сколько Спасибок сотрудник получил и отправил за локальный день (LOCAL_TZ)."""
+    __tablename__ = "like_daily_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False)
+    bitrix_id = Column(Integer, ForeignKey("employees.bitrix_id"), nullable=False)
+    received = Column(Integer, nullable=False, default=0)
+    sent = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("day", "bitrix_id", name="uq_like_daily_rollups_day_employee"),
+    )
+
+
 class GameResponse(BaseModel):
     id: int
     name: str
@@ -370,6 +512,20 @@ class OverallRatingResponse(BaseModel):
     total_pages: int
 
 
+class RatingPlaceRow(GameRatingRow):
+    place: int
+
+
+class MyRankResponse(BaseModel):
+    game_id: int | None
+    bitrix_id: int
+    place: int | None
+    received: int
+    sent: int
+    above: List[RatingPlaceRow]
+    below: List[RatingPlaceRow]
+
+
 class MonthlyTopRow(BaseModel):
     bitrix_id: int
     photo_url: Optional[str] = None
@@ -440,6 +596,11 @@ class BuyTransaction(Base):
     amount_spent = Column(Integer, nullable=False)
     created_at = Column(DateTime, nullable=False, server_default=func.now())
 
+    __table_args__ = (
+        Index('ix_buy_transactions_created_id', 'created_at', 'id'),
+        Index('ix_buy_transactions_buyer_created_id', 'buyer_id', 'created_at', 'id'),
+    )
+
 class BuyTransactionCreate(BaseModel):
     buyer_id: int
     item_id: int
@@ -481,18 +642,20 @@ class AllPurchasesRow(BaseModel):
 
 class PurchaseHistoryPage(BaseModel):
     purchases: List[PurchaseHistoryResponse]
-    total: int
-    page: int
+    total: Optional[int] = None
+    page: Optional[int] = None
     size: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 
 class AllPurchasesPage(BaseModel):
     purchases: List[AllPurchasesRow]
-    total: int
-    page: int
+    total: Optional[int] = None
+    page: Optional[int] = None
     size: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 
 # --- 7. Таблица стикеров  ---
@@ -516,3 +679,119 @@ class StickerResponse(BaseModel):
 class StickerCreate(BaseModel):
     name: str
     url: str
+
+
+# --- 8. Очередь уведомлений Bitrix (outbox) ---
+class NotificationKind(PyEnum):
+    LIKE = "like"
+    PURCHASE = "purchase"
+
+
+class NotificationStatus(PyEnum):
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+
+
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(Enum(NotificationKind), nullable=False)
+    payload = Column(JSON, nullable=False)
+    status = Column(Enum(NotificationStatus), nullable=False, default=NotificationStatus.PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_notification_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+
+# --- 9. Фоновая синхронизация сотрудников из Bitrix ---
+class EmployeeSyncMode(PyEnum):
+    FULL = "full"
+    DELTA = "delta"
+
+
+class EmployeeSyncStatus(PyEnum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class EmployeeSyncJob(Base):
+    """
+    Задача синхронизации сотрудников портала. next_start — контрольная точка:
+    смещение start для user.get, с которого продолжится прерванная синхронизация.
+    """
+    __tablename__ = "employee_sync_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    domain = Column(String, nullable=False)
+    requested_by = Column(Integer, nullable=False)
+    mode = Column(Enum(EmployeeSyncMode), nullable=False, default=EmployeeSyncMode.FULL)
+    # Для DELTA: запрашиваются только пользователи, изменённые в Bitrix после этого момента
+    since = Column(DateTime, nullable=True)
+    status = Column(Enum(EmployeeSyncStatus), nullable=False, default=EmployeeSyncStatus.PENDING)
+    next_start = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=True)
+    pages_fetched = Column(Integer, nullable=False, default=0)
+    rows_written = Column(Integer, nullable=False, default=0)
+    inserted = Column(Integer, nullable=False, default=0)
+    updated = Column(Integer, nullable=False, default=0)
+    unchanged = Column(Integer, nullable=False, default=0)
+    deactivated = Column(Integer, nullable=False, default=0)
+    errors = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    heartbeat_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Одновременно по порталу может быть только одна незавершённая синхронизация
+        Index(
+            "uq_employee_sync_jobs_active_domain",
+            "domain",
+            unique=True,
+            postgresql_where=text("status IN ('PENDING', 'RUNNING')"),
+        ),
+        Index("ix_employee_sync_jobs_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+
+class EmployeeSyncJobResponse(BaseModel):
+    id: int
+    domain: str
+    mode: EmployeeSyncMode
+    since: Optional[datetime] = None
+    status: EmployeeSyncStatus
+    next_start: int
+    total: Optional[int] = None
+    pages_fetched: int
+    rows_written: int
+    inserted: int
+    updated: int
+    unchanged: int
+    deactivated: int
+    errors: int
+    last_error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class EmployeeSyncSeen(Base):
+    """Сотрудники, полученные из Bitrix полной синхронизацией; остальные после неё деактивируются."""
+    __tablename__ = "employee_sync_seen"
+
+    job_id = Column(Integer, ForeignKey("employee_sync_jobs.id", ondelete="CASCADE"), primary_key=True)
+    bitrix_id = Column(Integer, primary_key=True)
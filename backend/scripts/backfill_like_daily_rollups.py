@@ -0,0 +1,35 @@
+"""
+Пересчёт дневных итогов like_daily_rollups по истории лайков.
+
+Запуск из корня проекта (даты — локальные дни, границы включительно):
+    python -m backend.scripts.backfill_like_daily_rollups
+    python -m backend.scripts.backfill_like_daily_rollups --from 2025-01-01 --to 2025-01-31
+"""
+import argparse
+from datetime import date
+
+from backend.scripts.database import SessionLocal
+from backend.services.like_rollup_service import rebuild_like_daily_rollups
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Пересчёт дневных итогов Спасибок")
+    parser.add_argument("--from", dest="day_from", type=date.fromisoformat, default=None)
+    parser.add_argument("--to", dest="day_to", type=date.fromisoformat, default=None)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print("Пересчитываю дневные итоги...")
+        rebuild_like_daily_rollups(db, args.day_from, args.day_to)
+        db.commit()
+        print("✅ Готово! Дневные итоги пересчитаны.")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
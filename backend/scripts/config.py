@@ -28,6 +28,10 @@ class Settings:
     BITRIX_APP_URL = os.getenv("BITRIX_APP_URL", "")
     BITRIX_CLIENT_ID = os.getenv("BITRIX_CLIENT_ID", "")
     BITRIX_CLIENT_SECRET = os.getenv("BITRIX_CLIENT_SECRET", "")
+    BITRIX_OAUTH_URL = os.getenv("BITRIX_OAUTH_URL", "https://oauth.bitrix.info/oauth/token/")
+    # За сколько секунд до expires_at токен обновляется заранее
+    BITRIX_TOKEN_REFRESH_MARGIN = int(os.getenv("BITRIX_TOKEN_REFRESH_MARGIN", "300"))
+    BITRIX_TOKEN_CACHE_TTL = float(os.getenv("BITRIX_TOKEN_CACHE_TTL", "600"))
 
     DB_USER = os.getenv("DB_USER", "spasibki_user")
     DB_PASSWORD = os.getenv("DB_PASSWORD", "Spasibki123987")
@@ -35,6 +39,55 @@ class Settings:
     DB_PORT = int(os.getenv("DB_PORT", "5432"))
     DB_NAME = os.getenv("DB_NAME", "spasibki_db")
 
+    BITRIX_HTTP_TIMEOUT = float(os.getenv("BITRIX_HTTP_TIMEOUT", "15"))
+    BITRIX_HTTP_CONNECT_TIMEOUT = float(os.getenv("BITRIX_HTTP_CONNECT_TIMEOUT", "5"))
+    BITRIX_HTTP_MAX_CONNECTIONS = int(os.getenv("BITRIX_HTTP_MAX_CONNECTIONS", "20"))
+    BITRIX_HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("BITRIX_HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    BITRIX_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("BITRIX_HTTP_KEEPALIVE_EXPIRY", "30"))
+    # Сколько batch-вызовов user.get одновременно выполняет синхронизация сотрудников
+    BITRIX_FETCH_CONCURRENCY = int(os.getenv("BITRIX_FETCH_CONCURRENCY", "2"))
+    # Лимит REST-запросов к одному порталу (token bucket) и повторы при QUERY_LIMIT_EXCEEDED
+    BITRIX_RATE_LIMIT_PER_SECOND = float(os.getenv("BITRIX_RATE_LIMIT_PER_SECOND", "2"))
+    BITRIX_RATE_LIMIT_BURST = int(os.getenv("BITRIX_RATE_LIMIT_BURST", "50"))
+    BITRIX_THROTTLE_MAX_RETRIES = int(os.getenv("BITRIX_THROTTLE_MAX_RETRIES", "3"))
+    BITRIX_THROTTLE_RETRY_SECONDS = float(os.getenv("BITRIX_THROTTLE_RETRY_SECONDS", "1"))
+    BITRIX_CURRENT_USER_CACHE_TTL = float(os.getenv("BITRIX_CURRENT_USER_CACHE_TTL", "300"))
+
+    ACTOR_NAME_CACHE_TTL = float(os.getenv("ACTOR_NAME_CACHE_TTL", "300"))
+    ACTOR_NAME_CACHE_SIZE = int(os.getenv("ACTOR_NAME_CACHE_SIZE", "1024"))
+
+    # Журнал system_events: месячные секции создаются на N месяцев вперёд,
+    # секции старше SYSTEM_EVENTS_RETENTION_MONTHS уходят в архив (0 — хранить всё)
+    SYSTEM_EVENTS_PARTITIONS_AHEAD = int(os.getenv("SYSTEM_EVENTS_PARTITIONS_AHEAD", "2"))
+    SYSTEM_EVENTS_RETENTION_MONTHS = int(os.getenv("SYSTEM_EVENTS_RETENTION_MONTHS", "24"))
+    SYSTEM_EVENTS_ARCHIVE_DIR = Path(os.getenv("SYSTEM_EVENTS_ARCHIVE_DIR", str(PROJECT_DIR / "archive" / "system_events")))
+
+    # sync — события журнала пишутся в транзакции вызывающего кода;
+    # async — события log_event(deferred=True) пишет фоновая задача пачками
+    SYSTEM_EVENTS_SINK = os.getenv("SYSTEM_EVENTS_SINK", "sync")
+    SYSTEM_EVENTS_SINK_MAX_QUEUE = int(os.getenv("SYSTEM_EVENTS_SINK_MAX_QUEUE", "10000"))
+    SYSTEM_EVENTS_SINK_BATCH_SIZE = int(os.getenv("SYSTEM_EVENTS_SINK_BATCH_SIZE", "500"))
+    SYSTEM_EVENTS_SINK_FLUSH_INTERVAL = float(os.getenv("SYSTEM_EVENTS_SINK_FLUSH_INTERVAL", "1"))
+    # Сколько секунд при остановке повторять запись очереди, если БД недоступна;
+    # то, что записать не удалось, сохраняется в файлы и дописывается при следующем запуске
+    SYSTEM_EVENTS_SINK_SHUTDOWN_TIMEOUT = float(os.getenv("SYSTEM_EVENTS_SINK_SHUTDOWN_TIMEOUT", "10"))
+    SYSTEM_EVENTS_SINK_SPILL_DIR = Path(os.getenv("SYSTEM_EVENTS_SINK_SPILL_DIR", str(SYSTEM_EVENTS_ARCHIVE_DIR / "unwritten")))
+
+    NOTIFY_WORKERS = int(os.getenv("NOTIFY_WORKERS", "2"))
+    NOTIFY_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", "20"))
+    NOTIFY_POLL_INTERVAL = float(os.getenv("NOTIFY_POLL_INTERVAL", "5"))
+    NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "8"))
+    NOTIFY_RETRY_BASE_SECONDS = float(os.getenv("NOTIFY_RETRY_BASE_SECONDS", "10"))
+    NOTIFY_LEASE_SECONDS = int(os.getenv("NOTIFY_LEASE_SECONDS", "120"))
+
+    EMPLOYEE_SYNC_POLL_INTERVAL = float(os.getenv("EMPLOYEE_SYNC_POLL_INTERVAL", "5"))
+    EMPLOYEE_SYNC_PAGES_PER_STEP = int(os.getenv("EMPLOYEE_SYNC_PAGES_PER_STEP", "10"))
+    EMPLOYEE_SYNC_MAX_ERRORS = int(os.getenv("EMPLOYEE_SYNC_MAX_ERRORS", "5"))
+    EMPLOYEE_SYNC_RETRY_SECONDS = float(os.getenv("EMPLOYEE_SYNC_RETRY_SECONDS", "30"))
+    EMPLOYEE_SYNC_LEASE_SECONDS = int(os.getenv("EMPLOYEE_SYNC_LEASE_SECONDS", "300"))
+    EMPLOYEE_FULL_SYNC_INTERVAL_HOURS = float(os.getenv("EMPLOYEE_FULL_SYNC_INTERVAL_HOURS", "24"))
+    EMPLOYEE_DELTA_SYNC_OVERLAP_SECONDS = int(os.getenv("EMPLOYEE_DELTA_SYNC_OVERLAP_SECONDS", "300"))
+
     @property
     def STICKERS_UPLOAD_DIR(self):
         return STICKERS_UPLOAD_DIR_DEFAULT
@@ -50,6 +103,10 @@ class Settings:
             database=self.DB_NAME,
         )
 
+    @property
+    def ASYNC_DATABASE_URL(self):
+        return self.DATABASE_URL.set(drivername="postgresql+asyncpg")
+
 
 settings = Settings()
 
@@ -0,0 +1,42 @@
+"""
+Обслуживание секций журнала system_events: создаёт месячные секции
+на SYSTEM_EVENTS_PARTITIONS_AHEAD месяцев вперёд и выгружает секции старше
+SYSTEM_EVENTS_RETENTION_MONTHS в SYSTEM_EVENTS_ARCHIVE_DIR (.ndjson.gz).
+
+Запускать раз в сутки (cron) из корня проекта:
+    python -m backend.scripts.maintain_system_events
+"""
+from datetime import datetime
+
+from backend.scripts.config import settings
+from backend.scripts.database import SessionLocal
+from backend.services.event_partitions import archive_expired_event_partitions, ensure_event_partitions
+
+
+def main() -> None:
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        created = ensure_event_partitions(db, now, settings.SYSTEM_EVENTS_PARTITIONS_AHEAD)
+        db.commit()
+        print(f"Создано секций: {len(created)} {', '.join(created)}")
+
+        archived = archive_expired_event_partitions(
+            db,
+            now,
+            settings.SYSTEM_EVENTS_RETENTION_MONTHS,
+            settings.SYSTEM_EVENTS_ARCHIVE_DIR,
+        )
+        print(f"Архивировано секций: {len(archived)}")
+        for path in archived:
+            print(f"  {path}")
+        print("✅ Готово!")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
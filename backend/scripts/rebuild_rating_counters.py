@@ -0,0 +1,26 @@
+"""
+Пересчёт таблицы rating_counters по истории лайков.
+
+Запуск из корня проекта:
+    python -m backend.scripts.rebuild_rating_counters
+"""
+from backend.scripts.database import SessionLocal
+from backend.services.rating_service import rebuild_rating_counters
+
+
+def main() -> None:
+    db = SessionLocal()
+    try:
+        print("Пересчитываю рейтинг...")
+        rebuild_rating_counters(db)
+        db.commit()
+        print("✅ Готово! Рейтинг пересчитан.")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,51 +1,42 @@
-import asyncio
 import logging
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.bitrix_sdk.python_current_SDK import BitrixCurrent
-from backend.models import BitrixAuth
-from backend.services.db_get_tokens import get_tokens
+from backend.bitrix_sdk.python_current_SDK import BitrixPriority
+from backend.services.bitrix_tokens import CachedTokens, bitrix_token_manager, is_expired_token_error
 from backend.services.db_get_employee import get_admins, get_employee_by_bitrix_id
 
 logger = logging.getLogger(__name__)
 
 
-def _get_latest_portal_token(db: Session) -> BitrixAuth | None:
-    return (
-        db.query(BitrixAuth)
-        .order_by(BitrixAuth.created_at.desc())
-        .first()
-    )
+async def _send_system_notify_with_token(token: CachedTokens, to_user_id: int, message: str):
+    params = {'USER_ID': to_user_id, 'MESSAGE': message}
+    result = await token.client(BitrixPriority.INTERACTIVE).call('im.notify.system.add', params)
+    if is_expired_token_error(result):
+        # Токен отозван или истёк раньше expires_at: одно принудительное обновление и повтор
+        token = await bitrix_token_manager.refresh(token)
+        result = await token.client(BitrixPriority.INTERACTIVE).call('im.notify.system.add', params)
+    return result
 
 
-async def _send_system_notify_with_token(token: BitrixAuth, to_user_id: int, message: str):
-    bx = BitrixCurrent(
-        auth_id=token.access_token,
-        refresh_id=token.refresh_token,
-        domain=token.domain,
-    )
-    return await bx.call('im.notify.system.add', {'USER_ID': to_user_id, 'MESSAGE': message})
-
-
-async def send_bitrix_notification(from_user_id: int, to_user_id: int, db: Session):
+async def send_bitrix_notification(from_user_id: int, to_user_id: int, db: AsyncSession):
     message = "❤️ Вам отправили Спасибку!"
     tried_user_ids = []
-    candidates: list[BitrixAuth] = []
+    candidates: list[CachedTokens] = []
 
-    sender_tokens = await asyncio.to_thread(get_tokens, from_user_id, db)
+    sender_tokens = await bitrix_token_manager.get_user_tokens(db, from_user_id)
     if sender_tokens:
         candidates.append(sender_tokens)
         tried_user_ids.append(from_user_id)
 
     if to_user_id != from_user_id:
-        receiver_tokens = await asyncio.to_thread(get_tokens, to_user_id, db)
+        receiver_tokens = await bitrix_token_manager.get_user_tokens(db, to_user_id)
         if receiver_tokens:
             candidates.append(receiver_tokens)
             tried_user_ids.append(to_user_id)
 
     if not candidates:
-        latest_token = await asyncio.to_thread(_get_latest_portal_token, db)
+        latest_token = await bitrix_token_manager.get_portal_tokens(db)
         if latest_token:
             candidates.append(latest_token)
 
@@ -96,32 +87,70 @@ async def send_bitrix_notification(from_user_id: int, to_user_id: int, db: Sessi
     }
 
 
-async def send_bitrix_purchase_notification(from_user_id: int, item_name: str, db: Session):
-    tokens = await asyncio.to_thread(get_tokens, from_user_id, db)
+async def send_bitrix_purchase_notification(
+        from_user_id: int,
+        item_name: str,
+        db: AsyncSession,
+        admin_ids: list[int] | None = None,
+):
+    """
+    Уведомляет администраторов о покупке одним batch-вызовом.
+    admin_ids — кому ещё не доставлено (при повторе из outbox); None — всем администраторам.
+    Если часть команд отклонена, возвращает ошибку и pending_admin_ids — тех,
+    кому уведомление нужно отправить повторно.
+    """
+    tokens = await bitrix_token_manager.get_user_tokens(db, from_user_id)
     if not tokens:
         return None
 
-    from_user = await asyncio.to_thread(get_employee_by_bitrix_id, from_user_id, db)
+    from_user = await db.run_sync(lambda session: get_employee_by_bitrix_id(from_user_id, session))
     if not from_user:
         return None
     
     from_user_name = f"{(from_user.name or '').strip()} {(from_user.lastname or '').strip()}".strip() or str(from_user_id)
 
-    to_user_list = await asyncio.to_thread(get_admins, db)
-    to_user_ids = [user.bitrix_id for user in to_user_list]
+    if admin_ids is None:
+        to_user_list = await db.run_sync(get_admins)
+        to_user_ids = [user.bitrix_id for user in to_user_list]
+    else:
+        to_user_ids = list(admin_ids)
 
     safe_item_name = (item_name or "").strip() or "товар"
     message = f"🛒 {from_user_name} купил(а) {safe_item_name} в приложении Спасибки."
 
-    for to_user_id in to_user_ids:
-        result = await _send_system_notify_with_token(tokens, to_user_id, message)
-        if isinstance(result, dict) and result.get("error"):
-            logger.warning(
-                "Bitrix purchase notification rejected (token_user_id=%s, to_user_id=%s): %s",
-                from_user_id,
-                to_user_id,
-                result,
-            )
+    if not to_user_ids:
+        return dict(status=200, message="Нет администраторов для уведомления")
+
+    commands = {
+        f"notify_{to_user_id}": ("im.notify.system.add", {"USER_ID": to_user_id, "MESSAGE": message})
+        for to_user_id in to_user_ids
+    }
+    batch = await tokens.client(BitrixPriority.INTERACTIVE).call_batch(commands)
+    if any(is_expired_token_error(error) for error in batch.errors.values()):
+        # Весь batch отклонён из-за токена: обновляем и повторяем один раз
+        tokens = await bitrix_token_manager.refresh(tokens)
+        batch = await tokens.client(BitrixPriority.INTERACTIVE).call_batch(commands)
+
+    for key, error in batch.errors.items():
+        logger.warning(
+            "Bitrix purchase notification rejected (token_user_id=%s, command=%s): %s",
+            from_user_id,
+            key,
+            error,
+        )
+
+    if batch.errors:
+        failed_user_ids = [
+            to_user_id for to_user_id in to_user_ids if f"notify_{to_user_id}" in batch.errors
+        ]
+        error = next(iter(batch.errors.values()))
+        detail = error.get("error") if isinstance(error, dict) else error
+        return dict(
+            status=502,
+            message="Bitrix не принял уведомление",
+            detail=f"{len(failed_user_ids)} из {len(to_user_ids)} уведомлений отклонены: {detail}",
+            pending_admin_ids=failed_user_ids,
+        )
 
     return dict(status=200, message="Уведомление отправлено!")
 
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from backend.bitrix_sdk.python_current_SDK import BitrixCurrent, BitrixPriority, refresh_oauth_tokens
+from backend.models import BitrixAuth
+from backend.scripts.config import settings
+from backend.scripts.database import AsyncSessionLocal
+from backend.services.db_get_tokens import get_tokens
+from backend.services.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+EXPIRED_TOKEN_ERRORS = frozenset({"expired_token", "invalid_token"})
+
+
+def is_expired_token_error(result) -> bool:
+    """Ответ Bitrix означает, что access_token просрочен или отозван."""
+    return isinstance(result, dict) and result.get("error") in EXPIRED_TOKEN_ERRORS
+
+
+class CachedTokens:
+    """
+    Снимок строки bitrix_auth для чтения из кэша: те же атрибуты, что у BitrixAuth.
+    """
+
+    def __init__(self, auth: BitrixAuth):
+        self.id = int(auth.id)
+        self.user_id = auth.user_id
+        self.member_id = auth.member_id
+        self.domain = auth.domain
+        self.access_token = auth.access_token
+        self.refresh_token = auth.refresh_token
+        self.expires_at = auth.expires_at
+
+    def needs_refresh(self, now: datetime) -> bool:
+        if self.expires_at is None:
+            return True
+        return self.expires_at - timedelta(seconds=settings.BITRIX_TOKEN_REFRESH_MARGIN) <= now
+
+    def client(self, priority: BitrixPriority = BitrixPriority.NORMAL) -> BitrixCurrent:
+        return BitrixCurrent(
+            auth_id=self.access_token,
+            refresh_id=self.refresh_token,
+            domain=self.domain,
+            priority=priority,
+        )
+
+
+def _get_latest_portal_token(db: Session, domain: str | None = None) -> BitrixAuth | None:
+    query = db.query(BitrixAuth)
+    if domain is not None:
+        query = query.filter(BitrixAuth.domain == domain)
+    return query.order_by(BitrixAuth.created_at.desc()).first()
+
+
+class BitrixTokenManager:
+    """
+    Кэш токенов Bitrix24 в памяти процесса с обновлением через OAuth.
+    - ключи ("user", user_id) и ("portal", domain) указывают на id строки bitrix_auth,
+      сами токены хранятся по id, поэтому обновление видно по всем ключам сразу
+    - токен обновляется заранее, за BITRIX_TOKEN_REFRESH_MARGIN секунд до expires_at,
+      или принудительно, когда Bitrix ответил expired_token
+    - одновременные запросы одного токена в процессе ждут одно обновление,
+      между процессами обновление сериализуется блокировкой строки (FOR UPDATE)
+    """
+
+    def __init__(self, key_ttl_seconds: float):
+        self._keys = TTLCache(ttl_seconds=key_ttl_seconds)
+        self._tokens: dict[int, CachedTokens] = {}
+        self._refreshing: dict[int, asyncio.Task] = {}
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Сбрасывает токены пользователя, например после сохранения новых из приложения."""
+        self._keys.pop(("user", user_id))
+        for auth_id, tokens in list(self._tokens.items()):
+            if tokens.user_id == user_id:
+                self._tokens.pop(auth_id, None)
+
+    def clear(self) -> None:
+        self._keys.clear()
+        self._tokens.clear()
+
+    async def get_user_tokens(self, db: AsyncSession, user_id: int) -> CachedTokens | None:
+        return await self._get(db, ("user", user_id), lambda session: get_tokens(user_id, session))
+
+    async def get_portal_tokens(self, db: AsyncSession, domain: str | None = None) -> CachedTokens | None:
+        """Самые свежие сохранённые токены портала (любого пользователя)."""
+        return await self._get(db, ("portal", domain), lambda session: _get_latest_portal_token(session, domain))
+
+    async def _get(self, db: AsyncSession, key, loader) -> CachedTokens | None:
+        auth_id = self._keys.get(key)
+        tokens = self._tokens.get(auth_id) if auth_id is not None else None
+        if tokens is None:
+            auth = await db.run_sync(loader)
+            if auth is None:
+                return None
+            tokens = self._remember(CachedTokens(auth))
+            self._keys.set(key, tokens.id)
+
+        if tokens.needs_refresh(datetime.utcnow()):
+            tokens = await self.refresh(tokens)
+        return tokens
+
+    def _remember(self, tokens: CachedTokens) -> CachedTokens:
+        self._tokens[tokens.id] = tokens
+        return tokens
+
+    async def refresh(self, tokens: CachedTokens) -> CachedTokens:
+        """
+        Обновляет токены строки bitrix_auth. Если обновить не удалось
+        (нет client_id/secret, OAuth-сервер отказал), возвращает исходные токены.
+        """
+        if not settings.BITRIX_CLIENT_ID or not settings.BITRIX_CLIENT_SECRET:
+            return tokens
+
+        task = self._refreshing.get(tokens.id)
+        if task is None:
+            task = asyncio.create_task(self._refresh(tokens))
+            self._refreshing[tokens.id] = task
+            task.add_done_callback(lambda _: self._refreshing.pop(tokens.id, None))
+
+        # shield: отмена одного ожидающего не должна прерывать общее обновление
+        return await asyncio.shield(task)
+
+    async def _refresh(self, tokens: CachedTokens) -> CachedTokens:
+        async with AsyncSessionLocal() as db:
+            try:
+                auth = await db.scalar(
+                    select(BitrixAuth).where(BitrixAuth.id == tokens.id).with_for_update()
+                )
+                if auth is None:
+                    self._tokens.pop(tokens.id, None)
+                    return tokens
+
+                # Другой процесс уже обновил токен, пока мы ждали блокировку строки
+                if auth.access_token != tokens.access_token:
+                    fresh = CachedTokens(auth)
+                    await db.commit()
+                    return self._remember(fresh)
+
+                result = await refresh_oauth_tokens(auth.refresh_token)
+                if not result.get("access_token"):
+                    logger.warning(
+                        "Bitrix token refresh rejected (auth_id=%s, user_id=%s): %s %s",
+                        auth.id,
+                        auth.user_id,
+                        result.get("error"),
+                        result.get("error_description", ""),
+                    )
+                    await db.rollback()
+                    return tokens
+
+                auth.access_token = result["access_token"]
+                auth.refresh_token = result.get("refresh_token") or auth.refresh_token
+                auth.expires_at = datetime.utcnow() + timedelta(seconds=int(result.get("expires_in", 3600)))
+                fresh = CachedTokens(auth)
+                await db.commit()
+            except Exception:
+                logger.exception("Bitrix token refresh failed (auth_id=%s)", tokens.id)
+                await db.rollback()
+                return tokens
+
+        logger.info("Bitrix token refreshed (auth_id=%s, user_id=%s)", fresh.id, fresh.user_id)
+        return self._remember(fresh)
+
+
+bitrix_token_manager = BitrixTokenManager(key_ttl_seconds=settings.BITRIX_TOKEN_CACHE_TTL)
@@ -1,16 +1,43 @@
-from backend.bitrix_sdk.python_current_SDK import BitrixCurrent
+from backend.bitrix_sdk.python_current_SDK import BitrixCurrent, BitrixPriority
+from backend.scripts.config import settings
+from backend.services.ttl_cache import TTLCache
+
+# Данные пользователя по (домен, токен): повторные открытия приложения в течение TTL
+# не ходят в Bitrix
+current_user_cache = TTLCache(ttl_seconds=settings.BITRIX_CURRENT_USER_CACHE_TTL)
+
 
 async def get_current_user(auth_id: str, refresh_id: str, domain: str):
-    """Получает информацию о текущем пользователе из Bitrix24"""
+    """
+    Получает информацию о текущем пользователе из Bitrix24 вместе с фото:
+    user.current и user.get по его ID выполняются одним batch-запросом.
+    """
+    cache_key = (domain, auth_id)
+    cached = current_user_cache.get(cache_key)
+    if cached is not None:
+        return dict(cached)
+
     bx = BitrixCurrent(
         auth_id=auth_id,
         refresh_id=refresh_id,
         domain=domain,
+        priority=BitrixPriority.INTERACTIVE,
     )
 
-    current_user = await bx.call("user.current")
+    batch = await bx.call_batch({
+        "current": ("user.current", None),
+        "photo": ("user.get", {"ID": "$result[current][ID]"}),
+    })
+
+    current_user = batch.results.get("current")
+    if not current_user:
+        error = batch.errors.get("current") or {}
+        raise ValueError(error.get("error_description") or "Ошибка получения пользователя")
 
-    if "result" not in current_user:
-        raise ValueError(current_user.get("error_description", "Ошибка получения пользователя"))
+    current_user = dict(current_user)
+    photo_users = batch.results.get("photo") or []
+    photo = (photo_users[0] or {}).get("PERSONAL_PHOTO") if photo_users else None
+    current_user["PERSONAL_PHOTO"] = photo or current_user.get("PERSONAL_PHOTO") or None
 
-    return current_user["result"]
+    current_user_cache.set(cache_key, current_user)
+    return dict(current_user)
@@ -1,37 +1,98 @@
-from backend.bitrix_sdk.python_current_SDK import BitrixCurrent
+import asyncio
+from datetime import datetime
+from typing import AsyncIterator
 
-async def get_all_users(auth_id: str, refresh_id: str, domain: str) -> list[dict]:
-    try:
-        bx = BitrixCurrent(
-            auth_id=auth_id,
-            refresh_id=refresh_id,
-            domain=domain,
-        )
+from backend.bitrix_sdk.python_current_SDK import BATCH_MAX_COMMANDS, BitrixCurrent
+from backend.scripts.time_utils import ensure_utc
+
+BITRIX_PAGE_SIZE = 50
 
-        all_users = []
-        start = 0
+USER_FILTER = {
+    "ACTIVE": True,
+    "USER_TYPE": "employee",
+}
 
-        while True:
-            users_batch = await bx.call("user.get", {
-                "start": start,
-                "ACTIVE": True,
-                "USER_TYPE": "employee",
-            })
 
-            batch_result = users_batch.get("result", [])
+def changed_users_filter(since: datetime) -> dict:
+    """Фильтр user.get: только пользователи, изменённые в Bitrix после since (naive UTC)."""
+    return {**USER_FILTER, ">TIMESTAMP_X": ensure_utc(since).isoformat()}
 
-            if not batch_result:
-                break
 
-            all_users.extend(batch_result)
-            start += len(batch_result)
+async def fetch_users_page(
+        bx: BitrixCurrent,
+        start: int,
+        user_filter: dict = USER_FILTER,
+) -> tuple[list[dict], int]:
+    """Одна страница user.get. Возвращает (пользователи, total)."""
+    response = await bx.call("user.get", {"start": start, **user_filter})
+    if "result" not in response:
+        raise ValueError(f"Ошибка user.get: {response.get('error')} {response.get('error_description', '')}")
 
-            if len(batch_result) < 50:
-                break
+    users = list(response.get("result") or [])
+    return users, int(response.get("total") or len(users))
 
-        return all_users
 
-    except Exception as e:
-        print("Ошибка Bitrix user.get:", e)
+async def fetch_users_pages(
+        bx: BitrixCurrent,
+        starts: list[int],
+        user_filter: dict = USER_FILTER,
+) -> list[dict]:
+    """Несколько страниц user.get пачками по 50 команд за один batch-вызов."""
+    commands = {
+        f"page_{start}": ("user.get", {"start": start, **user_filter})
+        for start in starts
+    }
+    if not commands:
         return []
 
+    batch = await bx.call_batch(commands)
+    if batch.errors:
+        raise ValueError(f"Ошибки batch user.get: {batch.errors}")
+
+    users = []
+    for key in commands:
+        users.extend(batch.results.get(key) or [])
+    return users
+
+
+async def stream_users_pages(
+        bx: BitrixCurrent,
+        starts: list[int],
+        user_filter: dict = USER_FILTER,
+        pages_per_call: int = BATCH_MAX_COMMANDS,
+        concurrency: int = 2,
+) -> AsyncIterator[tuple[list[int], list[dict]]]:
+    """
+    Отдаёт страницы user.get по мере получения, а не одним списком.
+    starts разбиваются на группы по pages_per_call страниц (один batch-вызов
+    на группу); одновременно выполняется не больше concurrency вызовов.
+    Группы приходят в порядке завершения: (starts группы, пользователи).
+    """
+    groups = iter([
+        starts[index:index + pages_per_call]
+        for index in range(0, len(starts), max(pages_per_call, 1))
+    ])
+    pending: set[asyncio.Task] = set()
+
+    async def fetch_group(group: list[int]) -> tuple[list[int], list[dict]]:
+        return group, await fetch_users_pages(bx, group, user_filter)
+
+    def schedule() -> None:
+        while len(pending) < max(concurrency, 1):
+            group = next(groups, None)
+            if group is None:
+                return
+            pending.add(asyncio.create_task(fetch_group(group)))
+
+    schedule()
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                pending.discard(task)
+                yield task.result()
+                schedule()
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
@@ -1,52 +1,131 @@
-from sqlalchemy import func
+import hashlib
+import json
+from collections import defaultdict
+
+from sqlalchemy import literal_column, or_, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
 from backend.models import Employee
+from backend.services.event_log import forget_actor_names
+from backend.services.game_cache import mark_games_changed
+
+EMPLOYEE_UPSERT_CHUNK_SIZE = 500
+
+# Поля, которые синхронизируются из Bitrix (колонка → ключ ответа Bitrix);
+# остальные (coins, is_admin, ...) ведутся в приложении
+BITRIX_EMPLOYEE_KEYS = {
+    "name": "NAME",
+    "lastname": "LAST_NAME",
+    "email": "EMAIL",
+    "position": "WORK_POSITION",
+    "photo_url": "PERSONAL_PHOTO",
+}
+SYNCED_EMPLOYEE_FIELDS = tuple(BITRIX_EMPLOYEE_KEYS)
+
+# В RETURNING для PostgreSQL: xmax = 0 только у только что вставленной строки
+INSERTED_FLAG = literal_column("xmax = 0")
+
 
+def employee_content_hash(row: dict) -> str:
+    """sha256 от синхронизируемых полей сотрудника."""
+    raw = json.dumps([row[field] for field in SYNCED_EMPLOYEE_FIELDS], ensure_ascii=False)
+    return hashlib.sha256(raw.encode()).hexdigest()
 
-def save_or_update_employees(users: list[dict], db: Session) -> int:
+
+def _employee_row(data: dict) -> tuple[dict, tuple[str, ...]] | None:
     """
-    Создаёт или обновляет сотрудников списком.
-    Возвращает количество обработанных записей.
+    Строка для INSERT и поля, которые Bitrix прислал. Отсутствующий ключ
+    не значит «пусто»: у существующего сотрудника такое поле не перезаписывается,
+    а новому подставляется пустая строка.
     """
-    count = 0
+    bitrix_id = data.get("ID")
+    if not bitrix_id:
+        return None
+
+    row = {"bitrix_id": int(bitrix_id)}
+    for field, key in BITRIX_EMPLOYEE_KEYS.items():
+        row[field] = data.get(key, "")
+    row["name"] = row["name"] or ""
+    row["lastname"] = row["lastname"] or ""
+    row["bitrix_hash"] = employee_content_hash(row)
+    present = tuple(field for field, key in BITRIX_EMPLOYEE_KEYS.items() if key in data)
+    return row, present
 
-    employee_count = db.query(func.count(Employee.id)).scalar()
 
+def upsert_employees(users: list[dict], db: Session, domain: str | None = None) -> dict:
+    """
+    Создаёт или обновляет сотрудников списком: INSERT ... ON CONFLICT (bitrix_id)
+    DO UPDATE пачками по EMPLOYEE_UPSERT_CHUNK_SIZE, без commit.
+    Строка обновляется, только если изменился bitrix_hash (или сотрудник
+    был деактивирован) — неизменённые сотрудники не перезаписываются.
+    Первый сотрудник в пустой таблице становится администратором.
+    Поля, которых нет в ответе Bitrix, у существующих сотрудников не меняются:
+    строки группируются по набору присланных полей, и ON CONFLICT обновляет
+    только их (обычно группа одна — Bitrix присылает все поля).
+    domain — портал, из которого получены сотрудники; без него портал
+    у существующих строк не меняется.
+    Возвращает {"inserted": ..., "updated": ..., "unchanged": ...}.
+    """
+    rows_by_id: dict[int, tuple[dict, tuple[str, ...]]] = {}
     for data in users:
-        bitrix_id = data.get("ID")
-        if not bitrix_id:
-            continue
-
-        user = db.query(Employee).filter(Employee.bitrix_id == bitrix_id).first()
-
-        email = data.get("EMAIL", "")
-        position = data.get("WORK_POSITION", "")
-        photo_url = data.get("PERSONAL_PHOTO", "")
-
-        if user:
-            user.name = data.get("NAME", user.name)
-            user.lastname = data.get("LAST_NAME", user.lastname)
-            user.email = email
-            user.position = position
-            user.photo_url = photo_url
-        else:
-            is_admin = employee_count == 0
-
-            user = Employee(
-                bitrix_id=bitrix_id,
-                name=data.get("NAME", ""),
-                lastname=data.get("LAST_NAME", ""),
-                email=email,
-                position=position,
-                is_gamer=True,
-                is_admin=is_admin,
-                photo_url=photo_url,
-            )
-            db.add(user)
-            employee_count += 1
-        print(f"Добавил {data.get('NAME')}")
-        count += 1
+        parsed = _employee_row(data)
+        if parsed is not None:
+            rows_by_id[parsed[0]["bitrix_id"]] = parsed
+
+    result = {"inserted": 0, "updated": 0, "unchanged": 0}
+    if not rows_by_id:
+        return result
+
+    # Проверка «таблица пуста» по одной строке индекса вместо COUNT(*)
+    table_is_empty = db.scalar(select(Employee.id).limit(1)) is None
+    groups: dict[tuple[str, ...], list[dict]] = defaultdict(list)
+    for index, (row, present) in enumerate(rows_by_id.values()):
+        row["is_gamer"] = True
+        row["is_admin"] = table_is_empty and index == 0
+        row["domain"] = domain
+        groups[present].append(row)
+
+    for present, rows in groups.items():
+        _upsert_group(db, rows, present + ("domain",) if domain is not None else present, result)
+
+    return result
+
+
+def _upsert_group(db: Session, rows: list[dict], updated_fields: tuple[str, ...], result: dict) -> None:
+    for start in range(0, len(rows), EMPLOYEE_UPSERT_CHUNK_SIZE):
+        chunk = rows[start:start + EMPLOYEE_UPSERT_CHUNK_SIZE]
+        stmt = insert(Employee).values(chunk)
+        changed = [
+            Employee.bitrix_hash.is_distinct_from(stmt.excluded.bitrix_hash),
+            Employee.is_active.is_(False),
+        ]
+        if "domain" in updated_fields:
+            # Сотрудник, сохранённый до учёта порталов, получает портал при первой синхронизации
+            changed.append(Employee.domain.is_distinct_from(stmt.excluded.domain))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Employee.bitrix_id],
+            set_={
+                **{field: stmt.excluded[field] for field in updated_fields},
+                "bitrix_hash": stmt.excluded.bitrix_hash,
+                "is_active": True,
+            },
+            where=or_(*changed),
+        ).returning(Employee.bitrix_id, INSERTED_FLAG)
+
+        touched = db.execute(stmt).all()
+        forget_actor_names(db, [bitrix_id for bitrix_id, is_inserted in touched if not is_inserted])
+        inserted = sum(1 for _, is_inserted in touched if is_inserted)
+        if inserted < len(touched):
+            # Среди обновлённых могут быть повторно активированные участники игр
+            mark_games_changed(db)
+        result["inserted"] += inserted
+        result["updated"] += len(touched) - inserted
+        result["unchanged"] += len(chunk) - len(touched)
+
 
+def save_or_update_employees(users: list[dict], db: Session, domain: str | None = None) -> dict:
+    """То же, что upsert_employees, с commit в конце."""
+    result = upsert_employees(users, db, domain)
     db.commit()
-    return count
+    return result
@@ -1,11 +1,11 @@
 from sqlalchemy.orm import Session
 
-from backend.models import Game
+from backend.services.game_cache import game_cache
 
 
 def search_active_game(db: Session):
 
-    return db.query(Game).filter(Game.game_is_active == True).first()
+    return game_cache.get_flagged_active_game(db)
 
 
 
@@ -0,0 +1,331 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend.bitrix_sdk.python_current_SDK import BitrixPriority
+from backend.models import Employee, EmployeeSyncJob, EmployeeSyncMode, EmployeeSyncSeen, EmployeeSyncStatus
+from backend.scripts.config import settings
+from backend.scripts.database import AsyncSessionLocal
+from backend.services.bitrix_users import (
+    BITRIX_PAGE_SIZE,
+    USER_FILTER,
+    changed_users_filter,
+    fetch_users_page,
+    stream_users_pages,
+)
+from backend.services.bitrix_tokens import bitrix_token_manager
+from backend.services.db_save_employee import upsert_employees
+from backend.services.game_cache import mark_games_changed
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_SYNC_STATUSES = (EmployeeSyncStatus.PENDING, EmployeeSyncStatus.RUNNING)
+
+
+def _active_job_stmt(domain: str):
+    return select(EmployeeSyncJob).where(
+        EmployeeSyncJob.domain == domain,
+        EmployeeSyncJob.status.in_(ACTIVE_SYNC_STATUSES),
+    )
+
+
+def _last_done_job(db: Session, domain: str, mode: EmployeeSyncMode | None = None) -> EmployeeSyncJob | None:
+    stmt = select(EmployeeSyncJob).where(
+        EmployeeSyncJob.domain == domain,
+        EmployeeSyncJob.status == EmployeeSyncStatus.DONE,
+    )
+    if mode is not None:
+        stmt = stmt.where(EmployeeSyncJob.mode == mode)
+    return db.scalar(stmt.order_by(EmployeeSyncJob.id.desc()).limit(1))
+
+
+def choose_sync_mode(db: Session, domain: str, mode: str) -> tuple[EmployeeSyncMode, datetime | None]:
+    """
+    Режим новой синхронизации и нижняя граница изменений для DELTA.
+    - full → всегда полная (с деактивацией пропавших сотрудников)
+    - delta → только изменённые после начала последней успешной синхронизации
+    - auto → полная, если полной не было дольше EMPLOYEE_FULL_SYNC_INTERVAL_HOURS, иначе delta
+    Без успешной синхронизации в прошлом всегда выбирается полная.
+    """
+    last_done = _last_done_job(db, domain)
+    if mode == "full" or last_done is None:
+        return EmployeeSyncMode.FULL, None
+
+    if mode == "auto":
+        last_full = _last_done_job(db, domain, EmployeeSyncMode.FULL)
+        full_due = datetime.utcnow() - timedelta(hours=settings.EMPLOYEE_FULL_SYNC_INTERVAL_HOURS)
+        if last_full is None or last_full.started_at < full_due:
+            return EmployeeSyncMode.FULL, None
+
+    # Перекрытие на случай расхождения часов с Bitrix и изменений во время прошлой синхронизации
+    since = last_done.started_at - timedelta(seconds=settings.EMPLOYEE_DELTA_SYNC_OVERLAP_SECONDS)
+    return EmployeeSyncMode.DELTA, since
+
+
+def enqueue_employee_sync(
+        db: Session,
+        domain: str,
+        requested_by: int,
+        mode: str = "auto",
+) -> tuple[EmployeeSyncJob, bool]:
+    """
+    Ставит синхронизацию портала в очередь. Если по порталу уже есть
+    незавершённая задача, возвращает её. Возвращает (задача, создана ли новая).
+    """
+    active = db.scalar(_active_job_stmt(domain))
+    if active is not None:
+        return active, False
+
+    sync_mode, since = choose_sync_mode(db, domain, mode)
+    job = EmployeeSyncJob(
+        domain=domain,
+        requested_by=requested_by,
+        mode=sync_mode,
+        since=since,
+        status=EmployeeSyncStatus.PENDING,
+        next_attempt_at=datetime.utcnow(),
+    )
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Параллельный запрос успел создать задачу (уникальный индекс по активным задачам портала)
+        db.rollback()
+        return db.scalar(_active_job_stmt(domain)), False
+
+    db.refresh(job)
+    return job, True
+
+
+async def _claim_job() -> int | None:
+    """
+    Забирает одну готовую задачу: ожидающую или выполняющуюся, но без
+    heartbeat дольше EMPLOYEE_SYNC_LEASE_SECONDS (процесс упал или был остановлен).
+    """
+    async with AsyncSessionLocal() as db:
+        now = datetime.utcnow()
+        lease_expired = now - timedelta(seconds=settings.EMPLOYEE_SYNC_LEASE_SECONDS)
+        job = (
+            await db.scalars(
+                select(EmployeeSyncJob)
+                .where(
+                    or_(
+                        and_(
+                            EmployeeSyncJob.status == EmployeeSyncStatus.PENDING,
+                            EmployeeSyncJob.next_attempt_at <= now,
+                        ),
+                        and_(
+                            EmployeeSyncJob.status == EmployeeSyncStatus.RUNNING,
+                            EmployeeSyncJob.heartbeat_at < lease_expired,
+                        ),
+                    )
+                )
+                .order_by(EmployeeSyncJob.id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+        ).first()
+        if job is None:
+            return None
+
+        job.status = EmployeeSyncStatus.RUNNING
+        job.started_at = job.started_at or now
+        job.heartbeat_at = now
+        await db.commit()
+        return job.id
+
+
+def mark_employees_seen(db: Session, job_id: int, users: list[dict]) -> None:
+    bitrix_ids = {int(data["ID"]) for data in users if data.get("ID")}
+    if not bitrix_ids:
+        return
+    db.execute(
+        insert(EmployeeSyncSeen)
+        .values([{"job_id": job_id, "bitrix_id": bitrix_id} for bitrix_id in bitrix_ids])
+        .on_conflict_do_nothing()
+    )
+
+
+def deactivate_unseen_employees(db: Session, job: EmployeeSyncJob) -> int:
+    """
+    Одним UPDATE деактивирует активных сотрудников портала задачи, которых полная
+    синхронизация не получила из Bitrix. Возвращает их количество.
+    Деактивированные пропадают из участников игр в кэше, из рейтингов
+    и не могут получать Спасибки; история и счётчики сохраняются.
+
+    Страницы user.get запрашиваются по смещению: если в Bitrix добавили или
+    удалили пользователя во время синхронизации, страницы сдвигаются и кто-то
+    может быть пропущен. Поэтому деактивация выполняется, только если получено
+    ровно total разных сотрудников из первой страницы; иначе она ждёт
+    следующей полной синхронизации.
+    """
+    seen = select(EmployeeSyncSeen.bitrix_id).where(EmployeeSyncSeen.job_id == job.id)
+    seen_count = db.scalar(select(func.count()).select_from(seen.subquery()))
+    deactivated = 0
+    # Пустой ответ Bitrix (seen_count == 0) не должен деактивировать всех сотрудников
+    if seen_count and seen_count == job.total:
+        deactivated = db.execute(
+            update(Employee)
+            .where(
+                Employee.domain == job.domain,
+                Employee.is_active.is_(True),
+                Employee.bitrix_id.not_in(seen),
+            )
+            .values(is_active=False)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if deactivated:
+            mark_games_changed(db)
+    elif seen_count:
+        logger.warning(
+            "Employee sync job %s got %s of %s users, the list changed during the sync; deactivation skipped",
+            job.id, seen_count, job.total,
+        )
+
+    db.execute(delete(EmployeeSyncSeen).where(EmployeeSyncSeen.job_id == job.id))
+    return deactivated
+
+
+async def run_employee_sync_job(job_id: int) -> None:
+    """
+    Выполняет задачу: после первой страницы (из неё берётся total) остальные
+    группы по EMPLOYEE_SYNC_PAGES_PER_STEP страниц запрашиваются параллельно
+    и записываются по мере поступления. Запись сотрудников и сдвиг контрольной
+    точки next_start фиксируются одним commit, поэтому прерванная задача
+    продолжается с первой незаписанной страницы.
+    Полная синхронизация в конце деактивирует пропавших из Bitrix сотрудников,
+    DELTA запрашивает только изменённых после job.since.
+    """
+    async with AsyncSessionLocal() as db:
+        job = await db.get(EmployeeSyncJob, job_id)
+        if job is None or job.status != EmployeeSyncStatus.RUNNING:
+            return
+
+        try:
+            tokens = await bitrix_token_manager.get_user_tokens(db, job.requested_by)
+            if not tokens:
+                raise ValueError("Нет сохранённых токенов для пользователя, запустившего синхронизацию")
+
+            bx = tokens.client(BitrixPriority.BULK)
+
+            is_full = job.mode == EmployeeSyncMode.FULL
+            user_filter = USER_FILTER if is_full else changed_users_filter(job.since)
+
+            async def write_pages(starts: list[int], users: list[dict]) -> None:
+                counts = await db.run_sync(lambda session: upsert_employees(users, session, job.domain))
+                if is_full:
+                    await db.run_sync(lambda session: mark_employees_seen(session, job.id, users))
+
+                # Страницы приходят не по порядку: контрольная точка сдвигается
+                # только по непрерывному префиксу уже записанных страниц
+                completed.update(starts)
+                while job.next_start in completed:
+                    job.next_start += BITRIX_PAGE_SIZE
+
+                job.pages_fetched += len(starts)
+                job.inserted += counts["inserted"]
+                job.updated += counts["updated"]
+                job.unchanged += counts["unchanged"]
+                job.rows_written += counts["inserted"] + counts["updated"]
+                job.heartbeat_at = datetime.utcnow()
+                await db.commit()
+
+            completed: set[int] = set()
+            if job.total is None:
+                users, job.total = await fetch_users_page(bx, job.next_start, user_filter)
+                await write_pages([job.next_start], users)
+
+            async for starts, users in stream_users_pages(
+                bx,
+                list(range(job.next_start, job.total, BITRIX_PAGE_SIZE)),
+                user_filter,
+                pages_per_call=settings.EMPLOYEE_SYNC_PAGES_PER_STEP,
+                concurrency=settings.BITRIX_FETCH_CONCURRENCY,
+            ):
+                await write_pages(starts, users)
+
+            if is_full:
+                job.deactivated = await db.run_sync(lambda session: deactivate_unseen_employees(session, job))
+
+            job.status = EmployeeSyncStatus.DONE
+            job.finished_at = datetime.utcnow()
+            job.last_error = None
+            await db.commit()
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.exception("Employee sync failed (job_id=%s)", job_id)
+            await db.rollback()
+
+            job = await db.get(EmployeeSyncJob, job_id)
+            now = datetime.utcnow()
+            job.errors += 1
+            job.last_error = repr(exc)
+            if job.errors >= settings.EMPLOYEE_SYNC_MAX_ERRORS:
+                job.status = EmployeeSyncStatus.FAILED
+                job.finished_at = now
+            else:
+                job.status = EmployeeSyncStatus.PENDING
+                job.next_attempt_at = now + timedelta(seconds=settings.EMPLOYEE_SYNC_RETRY_SECONDS * job.errors)
+            await db.commit()
+
+
+class EmployeeSyncRunner:
+    """
+    Фоновая задача, которая выполняет синхронизации сотрудников по очереди.
+    Несколько процессов uvicorn забирают задачи через SELECT ... FOR UPDATE SKIP LOCKED.
+    """
+
+    def __init__(self, poll_interval: float):
+        self.poll_interval = poll_interval
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="employee-sync-runner")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def wake(self) -> None:
+        """Будит раннер сразу после постановки задачи в очередь."""
+        self._wake.set()
+
+    async def run_once(self) -> bool:
+        job_id = await _claim_job()
+        if job_id is None:
+            return False
+        await run_employee_sync_job(job_id)
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                processed = await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Employee sync runner iteration failed")
+                processed = False
+
+            if processed:
+                continue
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+employee_sync_runner = EmployeeSyncRunner(poll_interval=settings.EMPLOYEE_SYNC_POLL_INTERVAL)
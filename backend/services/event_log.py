@@ -1,12 +1,16 @@
 from __future__ import annotations
 
-from datetime import date, datetime
-from enum import Enum
+from datetime import datetime
 from typing import Any
 
+from sqlalchemy import event, select
 from sqlalchemy.orm import Session
 
 from backend.models import Employee, SystemEvent
+from backend.scripts.config import settings
+from backend.services.event_rows import make_json_safe
+from backend.services.event_sink import system_event_sink
+from backend.services.ttl_cache import TTLCache
 
 EVENT_GAME_CREATED = "game_created"
 EVENT_GAME_UPDATED = "game_updated"
@@ -22,6 +26,13 @@ TARGET_ITEM = "item"
 TARGET_EMPLOYEE = "employee"
 TARGET_PURCHASE = "purchase"
 
+# Имена авторов событий по bitrix_id: общий для процесса LRU поверх кэша
+# в session.info, который живёт столько же, сколько сессия запроса
+actor_name_cache = TTLCache(ttl_seconds=settings.ACTOR_NAME_CACHE_TTL, maxsize=settings.ACTOR_NAME_CACHE_SIZE)
+SESSION_ACTOR_NAMES_KEY = "actor_names"
+SESSION_STALE_ACTOR_NAMES_KEY = "stale_actor_names"
+SESSION_DEFERRED_EVENTS_KEY = "deferred_system_events"
+
 
 def employee_full_name(employee: Employee | None) -> str:
     if not employee:
@@ -30,31 +41,75 @@ def employee_full_name(employee: Employee | None) -> str:
     return full_name or f"Пользователь {employee.bitrix_id}"
 
 
+def remember_actor_name(db: Session, employee: Employee) -> str:
+    """
+    Кладёт имя уже загруженного сотрудника в кэш запроса, чтобы log_event
+    с его bitrix_id не делал запрос. Возвращает это имя.
+    """
+    name = employee_full_name(employee)
+    db.info.setdefault(SESSION_ACTOR_NAMES_KEY, {})[employee.bitrix_id] = name
+    return name
+
+
+def forget_actor_names(db: Session, bitrix_ids) -> None:
+    """
+    Помечает имена сотрудников как изменённые в транзакции: из кэша запроса
+    они убираются сразу, из кэша процесса — после commit.
+    """
+    session_names = db.info.get(SESSION_ACTOR_NAMES_KEY, {})
+    stale = db.info.setdefault(SESSION_STALE_ACTOR_NAMES_KEY, set())
+    for bitrix_id in bitrix_ids:
+        session_names.pop(bitrix_id, None)
+        stale.add(bitrix_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_actor_names_after_commit(session: Session) -> None:
+    for bitrix_id in session.info.pop(SESSION_STALE_ACTOR_NAMES_KEY, ()):
+        actor_name_cache.pop(bitrix_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_stale_actor_names_after_rollback(session: Session) -> None:
+    session.info.pop(SESSION_STALE_ACTOR_NAMES_KEY, None)
+
+
+@event.listens_for(Session, "after_commit")
+def _submit_deferred_events_after_commit(session: Session) -> None:
+    rows = session.info.pop(SESSION_DEFERRED_EVENTS_KEY, None)
+    if rows:
+        system_event_sink.submit(rows)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_deferred_events_after_rollback(session: Session) -> None:
+    session.info.pop(SESSION_DEFERRED_EVENTS_KEY, None)
+
+
 def resolve_actor_name_snapshot(db: Session, actor_bitrix_id: int | None) -> str:
+    """
+    Имя автора события: кэш запроса → кэш процесса → запрос в employees.
+    """
     if actor_bitrix_id is None:
         return "Система"
-    employee = db.query(Employee).filter(Employee.bitrix_id == actor_bitrix_id).first()
-    if not employee:
-        return f"Пользователь {actor_bitrix_id}"
-    return employee_full_name(employee)
-
-
-def make_json_safe(value: Any) -> Any:
-    if value is None:
-        return None
-    if isinstance(value, (str, int, float, bool)):
-        return value
-    if isinstance(value, datetime):
-        return value.isoformat()
-    if isinstance(value, date):
-        return value.isoformat()
-    if isinstance(value, Enum):
-        return value.value
-    if isinstance(value, dict):
-        return {str(k): make_json_safe(v) for k, v in value.items()}
-    if isinstance(value, (list, tuple, set)):
-        return [make_json_safe(v) for v in value]
-    return str(value)
+
+    session_names = db.info.setdefault(SESSION_ACTOR_NAMES_KEY, {})
+    name = session_names.get(actor_bitrix_id)
+    if name is not None:
+        return name
+
+    name = actor_name_cache.get(actor_bitrix_id)
+    if name is None:
+        employee = db.scalar(select(Employee).where(Employee.bitrix_id == actor_bitrix_id))
+        if not employee:
+            # Неизвестного сотрудника не кэшируем: он может появиться после синхронизации
+            return f"Пользователь {actor_bitrix_id}"
+        name = employee_full_name(employee)
+        if actor_bitrix_id not in db.info.get(SESSION_STALE_ACTOR_NAMES_KEY, ()):
+            actor_name_cache.set(actor_bitrix_id, name)
+
+    session_names[actor_bitrix_id] = name
+    return name
 
 
 def log_event(
@@ -68,8 +123,17 @@ def log_event(
     target_name_snapshot: str | None = None,
     payload: dict[str, Any] | None = None,
     actor_name_snapshot: str | None = None,
+    deferred: bool = False,
 ) -> SystemEvent:
-    entry = SystemEvent(
+    """
+    Записывает событие журнала.
+    По умолчанию строка добавляется в транзакцию вызывающего кода и фиксируется
+    вместе с бизнес-изменением. deferred=True при SYSTEM_EVENTS_SINK=async
+    убирает из транзакции INSERT и сериализацию payload: событие уходит в фоновую
+    запись после commit и отбрасывается при rollback. payload после такого
+    вызова менять нельзя. Без запущенной фоновой записи deferred игнорируется.
+    """
+    values = dict(
         event_type=event_type,
         actor_bitrix_id=actor_bitrix_id,
         actor_name_snapshot=actor_name_snapshot or resolve_actor_name_snapshot(db, actor_bitrix_id),
@@ -77,8 +141,17 @@ def log_event(
         target_id=target_id,
         target_name_snapshot=target_name_snapshot,
         message=message,
-        payload=make_json_safe(payload) if payload is not None else None,
+        payload=payload,
     )
+
+    if deferred and system_event_sink.running:
+        # Время события — момент вызова, а не момент фоновой записи
+        values["created_at"] = datetime.utcnow()
+        db.info.setdefault(SESSION_DEFERRED_EVENTS_KEY, []).append(values)
+        return SystemEvent(**values)
+
+    values["payload"] = make_json_safe(payload) if payload is not None else None
+    entry = SystemEvent(**values)
     db.add(entry)
     return entry
 
@@ -0,0 +1,191 @@
+import gzip
+import json
+import logging
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from backend.services.event_rows import make_json_safe
+from backend.services.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+EVENTS_TABLE = "system_events"
+DEFAULT_PARTITION = "system_events_default"
+PARTITION_NAME_RE = re.compile(r"^system_events_(\d{4})_(\d{2})$")
+ARCHIVE_BATCH_SIZE = 1000
+
+# Число строк закрытых месячных секций: в прошлый месяц события не пишутся,
+# поэтому такие секции считаются один раз, а не на каждый запрос страницы
+closed_partition_counts = TTLCache(ttl_seconds=24 * 3600)
+
+
+def month_start(value: datetime) -> datetime:
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{EVENTS_TABLE}_{month.year:04d}_{month.month:02d}"
+
+
+def list_event_partitions(db: Session) -> list[tuple[str, datetime]]:
+    """Месячные секции system_events: [(имя, начало месяца)] по возрастанию месяца."""
+    names = db.scalars(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :parent"
+        ),
+        {"parent": EVENTS_TABLE},
+    ).all()
+
+    partitions = []
+    for name in names:
+        match = PARTITION_NAME_RE.match(name)
+        if match:
+            partitions.append((name, datetime(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda item: item[1])
+
+
+def create_event_partition(db: Session, month: datetime) -> str:
+    """
+    Создаёт секцию месяца. Если строки этого месяца уже попали в секцию
+    по умолчанию, они переносятся в новую секцию в той же транзакции.
+    """
+    name = partition_name(month)
+    bounds = {"start": month, "end": add_months(month, 1)}
+    range_sql = f"FOR VALUES FROM ('{bounds['start']:%Y-%m-%d}') TO ('{bounds['end']:%Y-%m-%d}')"
+
+    has_default_rows = db.scalar(
+        text(
+            f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} "
+            "WHERE created_at >= :start AND created_at < :end)"
+        ),
+        bounds,
+    )
+    if not has_default_rows:
+        db.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {EVENTS_TABLE} {range_sql}"))
+        return name
+
+    db.execute(text(f"CREATE TABLE {name} (LIKE {EVENTS_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    db.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+            "WHERE created_at >= :start AND created_at < :end RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ),
+        bounds,
+    )
+    db.execute(text(f"ALTER TABLE {EVENTS_TABLE} ATTACH PARTITION {name} {range_sql}"))
+    return name
+
+
+def ensure_event_partitions(db: Session, now: datetime, months_ahead: int) -> list[str]:
+    """Создаёт недостающие секции с текущего месяца на months_ahead вперёд."""
+    existing = {name for name, _ in list_event_partitions(db)}
+    current = month_start(now)
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if partition_name(month) not in existing:
+            created.append(create_event_partition(db, month))
+    return created
+
+
+def count_system_events(db: Session, now: datetime) -> int:
+    """
+    Число событий: закрытые месяцы берутся из кэша, заново считаются
+    только секция текущего месяца, будущие секции и секция по умолчанию.
+    """
+    current = month_start(now)
+    total = 0
+    live_tables = [DEFAULT_PARTITION]
+    for name, month in list_event_partitions(db):
+        if month >= current:
+            live_tables.append(name)
+            continue
+        count = closed_partition_counts.get(name)
+        if count is None:
+            count = db.scalar(text(f"SELECT count(*) FROM {name}"))
+            closed_partition_counts.set(name, count)
+        total += count
+
+    live_sql = " + ".join(f"(SELECT count(*) FROM {name})" for name in live_tables)
+    return total + db.scalar(text(f"SELECT {live_sql}"))
+
+
+def fsync_dir(path: Path) -> None:
+    """fsync каталога: иначе переименование файла может не пережить сбой питания."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def archive_event_partition(db: Session, name: str, archive_dir: Path) -> Path:
+    """
+    Выгружает секцию в {archive_dir}/{name}.ndjson.gz (по строке JSON на событие,
+    по возрастанию created_at, id), затем отсоединяет и удаляет её.
+    Архив пишется во временный файл; после закрытия gzip-потока (он дописывает
+    последний блок и трейлер) файл синхронизируется на диск, переименовывается,
+    и синхронизируется каталог. Секция удаляется только после этого, поэтому
+    прерванный запуск не оставляет обрезанный архив и может быть повторён.
+    """
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    path = archive_dir / f"{name}.ndjson.gz"
+    tmp_path = archive_dir / f"{name}.ndjson.gz.tmp"
+
+    rows = db.execute(
+        text(f"SELECT * FROM {name} ORDER BY created_at, id").execution_options(yield_per=ARCHIVE_BATCH_SIZE)
+    ).mappings()
+    written = 0
+    with open(tmp_path, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as archive:
+            for row in rows:
+                line = json.dumps(make_json_safe(dict(row)), ensure_ascii=False) + "\n"
+                archive.write(line.encode("utf-8"))
+                written += 1
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp_path, path)
+    fsync_dir(archive_dir)
+
+    db.execute(text(f"ALTER TABLE {EVENTS_TABLE} DETACH PARTITION {name}"))
+    db.execute(text(f"DROP TABLE {name}"))
+    closed_partition_counts.pop(name)
+    logger.info("System events partition %s archived to %s (%s rows)", name, path, written)
+    return path
+
+
+def archive_expired_event_partitions(
+        db: Session,
+        now: datetime,
+        retention_months: int,
+        archive_dir: Path,
+) -> list[Path]:
+    """
+    Архивирует месячные секции, целиком старше retention_months месяцев.
+    Каждая секция фиксируется отдельным commit.
+    """
+    if retention_months <= 0:
+        return []
+
+    cutoff = add_months(month_start(now), -retention_months)
+    archived = []
+    for name, month in list_event_partitions(db):
+        if add_months(month, 1) > cutoff:
+            break
+        archived.append(archive_event_partition(db, name, archive_dir))
+        db.commit()
+    return archived
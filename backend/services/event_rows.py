@@ -0,0 +1,32 @@
+from datetime import date, datetime
+from enum import Enum
+from typing import Any
+
+
+def make_json_safe(value: Any) -> Any:
+    if value is None:
+        return None
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, dict):
+        return {str(k): make_json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [make_json_safe(v) for v in value]
+    return str(value)
+
+
+def event_rows_for_insert(rows: list[dict]) -> list[dict]:
+    """
+    Строки отложенных событий для INSERT в system_events: payload приводится
+    к JSON-совместимому виду здесь, а не в пользовательском запросе.
+    """
+    return [
+        {**row, "payload": make_json_safe(row["payload"]) if row["payload"] is not None else None}
+        for row in rows
+    ]
@@ -0,0 +1,296 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from uuid import uuid4
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+
+from backend.models import SystemEvent
+from backend.scripts.config import settings
+from backend.scripts.database import AsyncSessionLocal, SessionLocal
+from backend.services.event_partitions import fsync_dir
+from backend.services.event_rows import event_rows_for_insert, make_json_safe
+
+logger = logging.getLogger(__name__)
+
+
+class SystemEventSink:
+    """
+    Отложенная запись system_events. События, закоммиченные вместе с
+    бизнес-транзакцией (log_event(..., deferred=True)), попадают в ограниченный
+    буфер в памяти процесса; фоновая задача пишет их многострочными INSERT
+    пачками до batch_size — сразу при наполнении пачки или раз в flush_interval.
+    Буфер потокобезопасен: commit происходит и в потоках синхронных роутов.
+
+    Если буфер переполнен или задача уже остановлена, события пишутся напрямую
+    синхронной сессией, а не теряются. В потоке цикла событий (commit AsyncSession)
+    такая запись уходит в отдельный поток, чтобы не блокировать цикл.
+    События, которые не удалось записать и при остановке, сохраняются в spill_dir
+    и дописываются при следующем запуске.
+    """
+
+    def __init__(
+            self,
+            enabled: bool,
+            max_queue: int,
+            batch_size: int,
+            flush_interval: float,
+            shutdown_timeout: float,
+            spill_dir: Path,
+    ):
+        self.enabled = enabled
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.shutdown_timeout = shutdown_timeout
+        self.spill_dir = spill_dir
+        self._lock = threading.Lock()
+        self._buffer: deque[dict] = deque()
+        self._wake = asyncio.Event()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+        # Пока задача не запущена (или уже остановлена), буфер никто не пишет
+        self._closed = True
+        # Один поток: прямые записи из цикла событий выполняются по порядку,
+        # и stop() может дождаться всех, отправленных раньше
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="system-event-sink")
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    @property
+    def queue_depth(self) -> int:
+        with self._lock:
+            return len(self._buffer)
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._stopping = False
+            with self._lock:
+                self._closed = False
+            self._task = asyncio.create_task(self._run(), name="system-event-sink")
+
+    async def stop(self) -> None:
+        """
+        Останавливает задачу без cancel: она дописывает очередь и выходит,
+        поэтому пачка, которая пишется в момент остановки, не теряется.
+        Буфер закрывается: события транзакций, закоммиченных позже, пишутся напрямую.
+        """
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+        with self._lock:
+            self._closed = True
+            rows = list(self._buffer)
+            self._buffer.clear()
+        if rows:
+            self._executor.submit(self._write_now, rows)
+        # Дожидаемся прямых записей, отправленных в поток до этого момента
+        await asyncio.get_running_loop().run_in_executor(self._executor, lambda: None)
+
+    def submit(self, rows: list[dict]) -> None:
+        """Ставит события в очередь; вызывается после commit транзакции, которая их создала."""
+        with self._lock:
+            closed = self._closed
+            accepted = not closed and len(self._buffer) + len(rows) <= self.max_queue
+            if accepted:
+                self._buffer.extend(rows)
+                batch_ready = len(self._buffer) >= self.batch_size
+
+        if not accepted:
+            reason = "stopped" if closed else "full"
+            logger.warning("System event sink is %s, writing %s events directly", reason, len(rows))
+            self._write_direct(rows)
+            return
+
+        if batch_ready and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def _write_direct(self, rows: list[dict]) -> None:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Поток синхронного роута или скрипта: ждать записи здесь можно
+            self._write_now(rows)
+            return
+        # commit AsyncSession выполняется в потоке цикла событий:
+        # синхронный INSERT остановил бы все запросы процесса
+        self._executor.submit(self._write_now, rows)
+
+    def _write_now(self, rows: list[dict]) -> None:
+        db = SessionLocal()
+        try:
+            db.execute(insert(SystemEvent).values(event_rows_for_insert(rows)))
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception("System events write failed")
+            self._spill(rows)
+        finally:
+            db.close()
+
+    def _spill(self, rows: list[dict]) -> None:
+        """
+        Сохраняет незаписанные события в {spill_dir}/*.ndjson (по строке JSON
+        на событие). Файл пишется во временный и переименовывается после fsync,
+        поэтому при следующем запуске не прочитается обрезанным.
+        """
+        name = f"system_events_{datetime.utcnow():%Y%m%d_%H%M%S_%f}_{uuid4().hex[:8]}.ndjson"
+        path = self.spill_dir / name
+        tmp_path = self.spill_dir / f"{name}.tmp"
+        try:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as spill:
+                for row in rows:
+                    spill.write(json.dumps(make_json_safe(row), ensure_ascii=False) + "\n")
+                spill.flush()
+                os.fsync(spill.fileno())
+            os.replace(tmp_path, path)
+            fsync_dir(self.spill_dir)
+        except Exception:
+            logger.exception("System events lost: %s", rows)
+            return
+        logger.error("%s system events saved to %s, they will be written on the next start", len(rows), path)
+
+    async def _restore_spilled(self) -> None:
+        """
+        Дописывает события, сохранённые в spill_dir при прошлых сбоях записи.
+        Каталог общий для всех воркеров uvicorn: файл сначала забирается
+        переименованием (os.replace атомарен), и его читает только тот воркер,
+        которому это удалось, иначе события записались бы по разу на воркер.
+        """
+        if not self.spill_dir.is_dir():
+            return
+        for path in sorted(self.spill_dir.glob("*.ndjson")):
+            claimed = path.with_name(f"{path.name}.restoring.{os.getpid()}")
+            try:
+                os.replace(path, claimed)
+            except FileNotFoundError:
+                continue  # файл уже забрал другой воркер
+            with open(claimed, encoding="utf-8") as spill:
+                rows = [json.loads(line) for line in spill if line.strip()]
+            for row in rows:
+                row["created_at"] = datetime.fromisoformat(row["created_at"])
+            try:
+                await self._insert(rows)
+            except OperationalError:
+                os.replace(claimed, path)
+                logger.exception("System events from %s not restored, will retry on the next start", path)
+                return
+            claimed.unlink()
+            logger.info("%s system events restored from %s", len(rows), path)
+
+    def _take_batch(self) -> list[dict]:
+        with self._lock:
+            count = min(self.batch_size, len(self._buffer))
+            return [self._buffer.popleft() for _ in range(count)]
+
+    def _requeue(self, rows: list[dict]) -> None:
+        with self._lock:
+            self._buffer.extendleft(reversed(rows))
+
+    async def flush(self) -> int:
+        """Пишет всю очередь пачками. Возвращает число записанных событий."""
+        written = 0
+        while True:
+            rows = self._take_batch()
+            if not rows:
+                return written
+            try:
+                await self._insert(rows)
+            except OperationalError:
+                # БД недоступна: события возвращаются в начало очереди до следующей попытки
+                self._requeue(rows)
+                raise
+            written += len(rows)
+
+    async def _insert(self, rows: list[dict]) -> None:
+        values = event_rows_for_insert(rows)
+        async with AsyncSessionLocal() as db:
+            try:
+                await db.execute(insert(SystemEvent).values(values))
+                await db.commit()
+                return
+            except OperationalError:
+                await db.rollback()
+                raise
+            except Exception:
+                await db.rollback()
+                logger.exception("System events batch insert failed, retrying %s events one by one", len(values))
+
+            # Одна некорректная строка не должна останавливать запись остальных
+            for value in values:
+                try:
+                    await db.execute(insert(SystemEvent).values(value))
+                    await db.commit()
+                except Exception:
+                    await db.rollback()
+                    logger.exception("System event dropped: %s", value)
+
+    async def _run(self) -> None:
+        try:
+            await self._restore_spilled()
+        except Exception:
+            logger.exception("System events restore failed")
+
+        while not self._stopping:
+            self._wake.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("System event sink flush failed")
+
+            if self._stopping:
+                break
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+
+        await self._drain()
+
+    async def _drain(self) -> None:
+        """
+        Дописывает очередь при остановке. Если БД недоступна, повторяет попытки
+        shutdown_timeout секунд; остаток stop() отдаёт на прямую запись,
+        которая при неудаче сохраняет события в spill_dir.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.shutdown_timeout
+        while True:
+            try:
+                await self.flush()
+                return
+            except Exception:
+                if loop.time() >= deadline:
+                    logger.exception("System event sink flush failed during shutdown")
+                    return
+                logger.warning("System event sink flush failed during shutdown, retrying", exc_info=True)
+            await asyncio.sleep(self.flush_interval)
+
+
+system_event_sink = SystemEventSink(
+    enabled=settings.SYSTEM_EVENTS_SINK == "async",
+    max_queue=settings.SYSTEM_EVENTS_SINK_MAX_QUEUE,
+    batch_size=settings.SYSTEM_EVENTS_SINK_BATCH_SIZE,
+    flush_interval=settings.SYSTEM_EVENTS_SINK_FLUSH_INTERVAL,
+    shutdown_timeout=settings.SYSTEM_EVENTS_SINK_SHUTDOWN_TIMEOUT,
+    spill_dir=settings.SYSTEM_EVENTS_SINK_SPILL_DIR,
+)
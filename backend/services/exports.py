@@ -0,0 +1,187 @@
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from typing import Callable, Iterator
+
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+from backend.models import BuyTransaction, Employee, Item, LikeTransaction, SystemEvent
+from backend.scripts.database import SessionLocal
+from backend.scripts.time_utils import to_local_time
+from backend.services.event_rows import make_json_safe
+from backend.services.like_rows import like_rows_select, like_user_name
+from backend.services.pagination import created_between
+
+# Строк за одно чтение из серверного курсора и за один кусок ответа
+EXPORT_BATCH_SIZE = 2000
+
+# Начало ячейки, с которого Excel и другие табличные редакторы читают формулу
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _local_iso(value: datetime | None) -> str | None:
+    return to_local_time(value).isoformat() if value else None
+
+
+def likes_export(game_id: int | None, date_from: date | None, date_to: date | None):
+    stmt = like_rows_select().add_columns(LikeTransaction.game_id.label("game_id"))
+    if game_id is not None:
+        stmt = stmt.where(LikeTransaction.game_id == game_id)
+    stmt = stmt.where(*created_between(LikeTransaction.created_at, date_from, date_to))
+    stmt = stmt.order_by(LikeTransaction.created_at, LikeTransaction.id)
+
+    columns = (
+        "id", "created_at", "game_id",
+        "from_user_bitrix_id", "from_user_name",
+        "to_user_bitrix_id", "to_user_name",
+        "message", "sticker_id",
+    )
+
+    def to_values(row) -> tuple:
+        return (
+            row.id,
+            _local_iso(row.created_at),
+            row.game_id,
+            row.from_user_bitrix_id,
+            like_user_name(row.from_user_name, row.from_user_lastname),
+            row.to_user_bitrix_id,
+            like_user_name(row.to_user_name, row.to_user_lastname),
+            row.msg,
+            row.sticker_id,
+        )
+
+    return stmt, columns, to_values
+
+
+def purchases_export(date_from: date | None, date_to: date | None):
+    buyer = aliased(Employee, name="buyer")
+    stmt = (
+        select(
+            BuyTransaction.id,
+            BuyTransaction.created_at,
+            BuyTransaction.buyer_id,
+            buyer.name.label("buyer_name"),
+            buyer.lastname.label("buyer_lastname"),
+            BuyTransaction.item_id,
+            Item.name.label("item_name"),
+            BuyTransaction.amount_spent,
+        )
+        .select_from(BuyTransaction)
+        .join(Item, BuyTransaction.item_id == Item.id)
+        .outerjoin(buyer, BuyTransaction.buyer_id == buyer.bitrix_id)
+        .where(*created_between(BuyTransaction.created_at, date_from, date_to))
+        .order_by(BuyTransaction.created_at, BuyTransaction.id)
+    )
+
+    columns = ("id", "created_at", "buyer_bitrix_id", "buyer_name", "item_id", "item_name", "amount_spent")
+
+    def to_values(row) -> tuple:
+        return (
+            row.id,
+            _local_iso(row.created_at),
+            row.buyer_id,
+            like_user_name(row.buyer_name, row.buyer_lastname),
+            row.item_id,
+            row.item_name,
+            row.amount_spent,
+        )
+
+    return stmt, columns, to_values
+
+
+def events_export(filters: list):
+    columns = (
+        "id", "created_at", "event_type",
+        "actor_bitrix_id", "actor_name_snapshot",
+        "target_type", "target_id", "target_name_snapshot",
+        "message", "payload",
+    )
+    # Колонки, а не ORM-объекты: строки не проходят через identity map сессии
+    stmt = (
+        select(*(getattr(SystemEvent, column) for column in columns))
+        .where(*filters)
+        .order_by(SystemEvent.created_at, SystemEvent.id)
+    )
+
+    def to_values(row) -> tuple:
+        return (row.id, _local_iso(row.created_at), *row[2:])
+
+    return stmt, columns, to_values
+
+
+def _csv_cell(value):
+    """
+    Значение ячейки CSV. Текст из сообщений и payload пишут пользователи:
+    строка, похожая на формулу, экранируется апострофом, иначе Excel её выполнит.
+    """
+    if isinstance(value, (dict, list)):
+        value = json.dumps(make_json_safe(value), ensure_ascii=False)
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _csv_chunks(rows, columns: tuple, to_values: Callable) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM: Excel иначе открывает UTF-8 CSV с кириллицей в неверной кодировке
+    buffer.write("\ufeff")
+    writer.writerow(columns)
+
+    for index, row in enumerate(rows, start=1):
+        writer.writerow(_csv_cell(value) for value in to_values(row))
+        if index % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def _ndjson_chunks(rows, columns: tuple, to_values: Callable) -> Iterator[str]:
+    lines = []
+    for row in rows:
+        record = make_json_safe(dict(zip(columns, to_values(row))))
+        lines.append(json.dumps(record, ensure_ascii=False))
+        if len(lines) == EXPORT_BATCH_SIZE:
+            yield "\n".join(lines) + "\n"
+            lines = []
+
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def stream_export(export, fmt: str, compress: bool) -> Iterator[bytes]:
+    """
+    Генератор тела ответа: строки читаются серверным курсором по
+    EXPORT_BATCH_SIZE (yield_per) и отдаются кусками, так что память
+    не растёт с размером выгрузки. Сессия своя: зависимость get_db
+    закрывается раньше, чем StreamingResponse дочитает генератор.
+    """
+    stmt, columns, to_values = export
+    chunks = _csv_chunks if fmt == "csv" else _ndjson_chunks
+    # wbits=31 — формат gzip, а не голый zlib
+    compressor = zlib.compressobj(wbits=31) if compress else None
+
+    db = SessionLocal()
+    try:
+        rows = db.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for chunk in chunks(rows, columns, to_values):
+            data = chunk.encode("utf-8")
+            if compressor is not None:
+                data = compressor.compress(data)
+            if data:
+                yield data
+
+        if compressor is not None:
+            yield compressor.flush()
+    finally:
+        db.close()
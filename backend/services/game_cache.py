@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import asyncpg
+from sqlalchemy import event, select, text
+from sqlalchemy.orm import Session
+
+from backend.models import Employee, Game, GameParticipant
+from backend.scripts.config import settings
+
+logger = logging.getLogger(__name__)
+
+GAME_CACHE_CHANNEL = "game_cache_invalidate"
+
+
+class CachedGame:
+    """
+    Снимок игры для чтения из кэша: те же атрибуты, что у Game,
+    плюс готовое множество участников. В него входят только активные
+    сотрудники: деактивированные остаются в game_participants и вернутся
+    в игру при повторной активации, но Спасибки не отправляют и не получают.
+    """
+
+    def __init__(self, game, participant_ids):
+        self.id = int(game.id)
+        self.name = game.name
+        self.description = game.description
+        self.game_start = game.game_start
+        self.game_end = game.game_end
+        self.game_is_active = bool(game.game_is_active)
+        self.setting_limitParameter = game.setting_limitParameter
+        self.setting_limitValue = game.setting_limitValue
+        self.setting_limitToOneUser = game.setting_limitToOneUser
+        self.participant_ids = frozenset(int(x) for x in participant_ids)
+
+    def is_running(self, now: datetime) -> bool:
+        return (
+            self.game_is_active
+            and self.game_start is not None
+            and self.game_start <= now
+            and self.game_end + timedelta(days=1) > now
+        )
+
+
+def _load_games(db: Session, *criteria) -> list[CachedGame]:
+    """
+    Игры (по возрастанию id) и их активные участники: два запроса на любое
+    число игр. Колонки, а не ORM-объекты: не трогаем identity map сессии.
+    """
+    games = db.execute(select(*Game.__table__.c).where(*criteria).order_by(Game.id)).all()
+    if not games:
+        return []
+
+    participants = defaultdict(list)
+    rows = db.execute(
+        select(GameParticipant.game_id, GameParticipant.employee_bitrix_id)
+        .join(Employee, Employee.bitrix_id == GameParticipant.employee_bitrix_id)
+        .where(GameParticipant.game_id.in_([game.id for game in games]), Employee.is_active.is_(True))
+    )
+    for game_id, bitrix_id in rows:
+        participants[game_id].append(bitrix_id)
+
+    return [CachedGame(game, participants[game.id]) for game in games]
+
+
+class GameCache:
+    """
+    Кэш игр и их участников в памяти процесса.
+    Каждая инвалидация увеличивает версию; загрузка, начатая до инвалидации,
+    не попадает в кэш, поэтому устаревшие данные не переживают изменение игры.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = 0
+        self._games: dict[int, CachedGame] = {}
+        self._active_game_ids: list[int] | None = None
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version += 1
+            self._games.clear()
+            self._active_game_ids = None
+
+    def get_game(self, db: Session, game_id: int) -> CachedGame | None:
+        with self._lock:
+            cached = self._games.get(game_id)
+            version = self._version
+        if cached is not None:
+            return cached
+
+        games = _load_games(db, Game.id == game_id)
+        if not games:
+            return None
+
+        cached = games[0]
+        with self._lock:
+            if self._version == version:
+                self._games[cached.id] = cached
+        return cached
+
+    def get_active_games(self, db: Session) -> list[CachedGame]:
+        """Все игры с флагом game_is_active, по возрастанию id."""
+        with self._lock:
+            active_ids = self._active_game_ids
+            version = self._version
+            if active_ids is not None and all(game_id in self._games for game_id in active_ids):
+                return [self._games[game_id] for game_id in active_ids]
+
+        games = _load_games(db, Game.game_is_active.is_(True))
+        with self._lock:
+            if self._version == version:
+                for cached in games:
+                    self._games[cached.id] = cached
+                self._active_game_ids = [cached.id for cached in games]
+        return games
+
+    def get_flagged_active_game(self, db: Session) -> CachedGame | None:
+        """Первая игра с флагом game_is_active, без проверки дат."""
+        games = self.get_active_games(db)
+        return games[0] if games else None
+
+    def get_active_game(self, db: Session) -> CachedGame | None:
+        """Активная игра, которая идёт прямо сейчас (с учётом дат начала и окончания)."""
+        now = datetime.utcnow()
+        for cached in self.get_active_games(db):
+            if cached.is_running(now):
+                return cached
+        return None
+
+
+game_cache = GameCache()
+
+
+def mark_games_changed(db: Session) -> None:
+    """
+    Помечает транзакцию как изменившую игры или участников.
+    После commit кэш этого процесса сбрасывается, а остальные воркеры
+    uvicorn получают pg_notify (NOTIFY доставляется только при commit).
+    """
+    if db.info.get("game_cache_dirty"):
+        return
+    db.info["game_cache_dirty"] = True
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_notify(:channel, '')"), {"channel": GAME_CACHE_CHANNEL})
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    if session.info.pop("game_cache_dirty", False):
+        game_cache.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session: Session) -> None:
+    session.info.pop("game_cache_dirty", None)
+
+
+class GameCacheListener:
+    """
+    Слушает канал Postgres LISTEN/NOTIFY и сбрасывает кэш, когда игры
+    меняет другой процесс. При потере соединения переподключается
+    и сбрасывает кэш, так как уведомления могли быть пропущены.
+    """
+
+    def __init__(self, reconnect_delay: float = 5):
+        self.reconnect_delay = reconnect_delay
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="game-cache-listener")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        dsn = settings.DATABASE_URL.set(drivername="postgresql").render_as_string(hide_password=False)
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(dsn)
+                await connection.add_listener(GAME_CACHE_CHANNEL, self._on_notify)
+                game_cache.invalidate()
+                while not connection.is_closed():
+                    await asyncio.sleep(self.reconnect_delay)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Game cache listener connection failed")
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(self.reconnect_delay)
+
+    @staticmethod
+    def _on_notify(connection, pid, channel, payload) -> None:
+        game_cache.invalidate()
+
+
+game_cache_listener = GameCacheListener()
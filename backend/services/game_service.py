@@ -1,58 +1,60 @@
 from datetime import datetime, timedelta
 
-from sqlalchemy import and_
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
-from backend.models import Game, LikeTransaction, LimitParameter
+from backend.models import Game, LikeTransaction, LikePeriodQuota, LimitParameter
+from backend.services.game_cache import game_cache
 
+# Период лимита для игр с LimitParameter.GAME: одна «корзина» на всю игру
+GAME_QUOTA_PERIOD_START = datetime(1970, 1, 1)
 
-def get_active_game(db: Session):
-
-    now = datetime.utcnow()
-    active_game = db.query(Game).filter(
-        and_(
-            Game.game_is_active == True,
-            Game.game_start <= now,
-            Game.game_end + timedelta(days=1) > now,
-        )
-    ).first()
-
-    return active_game
 
-
-def get_received_likes_count(db: Session, bitrix_id: int, game_id: int) -> int:
-    return db.query(LikeTransaction).filter(
+def received_likes_count_stmt(bitrix_id: int, game_id: int):
+    return select(func.count(LikeTransaction.id)).where(
         LikeTransaction.to_user_bitrix_id == bitrix_id,
-        LikeTransaction.game_id == game_id
-    ).count()
-
-
-def get_sent_likes_count(db: Session, bitrix_id: int, game: Game) -> int:
-    base_query = db.query(LikeTransaction).filter(
-        LikeTransaction.from_user_bitrix_id == bitrix_id,
-        LikeTransaction.game_id == game.id,
+        LikeTransaction.game_id == game_id,
     )
 
-    now = datetime.utcnow()
+
+def get_sent_likes_period_start(game: Game, now: datetime) -> datetime | None:
     param = game.setting_limitParameter  # Enum: LimitParameter.DAY/WEEK/MONTH/GAME
 
     if param == LimitParameter.DAY:
-        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        return base_query.filter(LikeTransaction.created_at >= start).count()
+        return now.replace(hour=0, minute=0, second=0, microsecond=0)
 
     if param == LimitParameter.WEEK:
         monday = now - timedelta(days=now.weekday())
-        start = monday.replace(hour=0, minute=0, second=0, microsecond=0)
-        return base_query.filter(LikeTransaction.created_at >= start).count()
+        return monday.replace(hour=0, minute=0, second=0, microsecond=0)
 
     if param == LimitParameter.MONTH:
-        start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        return base_query.filter(LikeTransaction.created_at >= start).count()
+        return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    return None
+
 
-    if param == LimitParameter.GAME:
-        return base_query.count()
+def get_quota_period_start(game: Game, now: datetime) -> datetime:
+    return get_sent_likes_period_start(game, now) or GAME_QUOTA_PERIOD_START
 
-    return base_query.count()
+
+def sent_likes_count_stmt(bitrix_id: int, game: Game):
+    return select(LikePeriodQuota.sent).where(
+        LikePeriodQuota.game_id == game.id,
+        LikePeriodQuota.sender_bitrix_id == bitrix_id,
+        LikePeriodQuota.period_start == get_quota_period_start(game, datetime.utcnow()),
+    )
+
+
+def get_active_game(db: Session):
+    return game_cache.get_active_game(db)
+
+
+def get_received_likes_count(db: Session, bitrix_id: int, game_id: int) -> int:
+    return db.scalar(received_likes_count_stmt(bitrix_id, game_id)) or 0
+
+
+def get_sent_likes_count(db: Session, bitrix_id: int, game: Game) -> int:
+    return db.scalar(sent_likes_count_stmt(bitrix_id, game)) or 0
 
 
 def get_remaining_likes(db: Session, bitrix_id: int, game: Game) -> int:
@@ -5,13 +5,15 @@ from fastapi import HTTPException, status
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
-from backend.models import Item, Employee, BuyTransaction
+from backend.models import Item, Employee, BuyTransaction, NotificationKind
 from backend.services.event_log import (
     EVENT_ITEM_CREATED,
     EVENT_ITEM_PURCHASED,
     TARGET_ITEM,
     log_event,
+    remember_actor_name,
 )
+from backend.services.notification_outbox import enqueue_notification
 
 logger = logging.getLogger(__name__)
 
@@ -61,10 +63,13 @@ def execute_buy_transaction(db: Session, item_id: int, buyer_id: int, amount_spe
         )
         db.add(new_buy_transaction)
 
-        buyer_name = f"{(buyer_query.name or '').strip()} {(buyer_query.lastname or '').strip()}".strip() or f"Пользователь {buyer_id}"
+        buyer_name = remember_actor_name(db, buyer_query)
         item_name = item_query.name or f"товар #{item_id}"
+        # Событие покупки не обязано фиксироваться вместе с покупкой:
+        # при SYSTEM_EVENTS_SINK=async его пишет фоновая задача
         log_event(
             db,
+            deferred=True,
             event_type=EVENT_ITEM_PURCHASED,
             actor_bitrix_id=buyer_id,
             target_type=TARGET_ITEM,
@@ -82,6 +87,12 @@ def execute_buy_transaction(db: Session, item_id: int, buyer_id: int, amount_spe
             },
         )
 
+        enqueue_notification(
+            db,
+            NotificationKind.PURCHASE,
+            {"buyer_id": buyer_id, "item_name": item_name},
+        )
+
         db.commit()
         db.refresh(new_buy_transaction)
 
@@ -0,0 +1,99 @@
+from datetime import datetime
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, func, insert as sa_insert, literal, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from backend.models import Game, LikePairQuota, LikePeriodQuota, LikeTransaction, LimitParameter
+from backend.services.game_service import GAME_QUOTA_PERIOD_START, get_quota_period_start
+
+
+def _increment_within_limit(db: Session, model, key_values: dict, key_columns: list[str], limit: int) -> bool:
+    """
+    INSERT ... ON CONFLICT DO UPDATE SET sent = sent + 1 WHERE sent < limit.
+    Строка блокируется на время транзакции, поэтому параллельные лайки
+    не могут превысить лимит. Возвращает False, если лимит исчерпан.
+    """
+    if limit <= 0:
+        return False
+
+    stmt = (
+        insert(model)
+        .values(**key_values, sent=1)
+        .on_conflict_do_update(
+            index_elements=key_columns,
+            set_={"sent": model.sent + 1},
+            where=model.sent < limit,
+        )
+        .returning(model.sent)
+    )
+    return db.execute(stmt).scalar_one_or_none() is not None
+
+
+def consume_like_quotas(db: Session, game: Game, from_id: int, to_id: int) -> None:
+    """
+    Списывает одну Спасибку из лимита на получателя и из лимита за период.
+    Вызывается внутри транзакции лайка; при исключении транзакцию нужно откатить.
+    """
+    pair_ok = _increment_within_limit(
+        db,
+        LikePairQuota,
+        {"game_id": game.id, "sender_bitrix_id": from_id, "recipient_bitrix_id": to_id},
+        ["game_id", "sender_bitrix_id", "recipient_bitrix_id"],
+        int(game.setting_limitToOneUser or 0),
+    )
+    if not pair_ok:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Вы превысили лимит на Спасибки для одного сотрудника")
+
+    period_ok = _increment_within_limit(
+        db,
+        LikePeriodQuota,
+        {
+            "game_id": game.id,
+            "sender_bitrix_id": from_id,
+            "period_start": get_quota_period_start(game, datetime.utcnow()),
+        },
+        ["game_id", "sender_bitrix_id", "period_start"],
+        int(game.setting_limitValue or 0),
+    )
+    if not period_ok:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Вы израсходовали лимит Спасибок",
+        )
+
+
+def rebuild_like_period_quotas(db: Session, game: Game) -> None:
+    """
+    Пересчитывает счётчики за период по истории лайков игры.
+    Нужен, когда у игры меняется период лимита (setting_limitParameter).
+    """
+    param = game.setting_limitParameter
+    if param == LimitParameter.DAY:
+        period_start = func.date_trunc("day", LikeTransaction.created_at)
+    elif param == LimitParameter.WEEK:
+        period_start = func.date_trunc("week", LikeTransaction.created_at)
+    elif param == LimitParameter.MONTH:
+        period_start = func.date_trunc("month", LikeTransaction.created_at)
+    else:
+        period_start = literal(GAME_QUOTA_PERIOD_START)
+
+    db.execute(delete(LikePeriodQuota).where(LikePeriodQuota.game_id == game.id))
+    db.execute(
+        sa_insert(LikePeriodQuota).from_select(
+            ["game_id", "sender_bitrix_id", "period_start", "sent"],
+            select(
+                LikeTransaction.game_id,
+                LikeTransaction.from_user_bitrix_id,
+                period_start,
+                func.count(LikeTransaction.id),
+            )
+            .where(
+                LikeTransaction.game_id == game.id,
+                LikeTransaction.from_user_bitrix_id.isnot(None),
+            )
+            .group_by(LikeTransaction.game_id, LikeTransaction.from_user_bitrix_id, period_start)
+        )
+    )
@@ -0,0 +1,117 @@
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import Date, cast, delete, func, insert as sa_insert, literal, select, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from backend.models import Employee, LikeDailyRollup, LikeTransaction
+from backend.scripts.time_utils import LOCAL_OFFSET_HOURS, to_local_time
+
+
+def local_day(dt: datetime) -> date:
+    """Локальный (LOCAL_TZ) день для naive UTC времени из БД."""
+    return to_local_time(dt).date()
+
+
+def local_day_start_utc(day: date) -> datetime:
+    """Начало локального дня в naive UTC — в таком виде время хранится в БД."""
+    return datetime.combine(day, time()) - timedelta(hours=LOCAL_OFFSET_HOURS)
+
+
+def increment_like_daily_rollups(db: Session, created_at: datetime, from_id: int, to_id: int) -> None:
+    """Учитывает одну Спасибку в дневных итогах отправителя и получателя."""
+    day = local_day(created_at)
+    stmt = insert(LikeDailyRollup).values([
+        {"day": day, "bitrix_id": to_id, "received": 1, "sent": 0},
+        {"day": day, "bitrix_id": from_id, "received": 0, "sent": 1},
+    ])
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["day", "bitrix_id"],
+            set_={
+                "received": LikeDailyRollup.received + stmt.excluded.received,
+                "sent": LikeDailyRollup.sent + stmt.excluded.sent,
+            },
+        )
+    )
+
+
+def rebuild_like_daily_rollups(db: Session, day_from: date | None = None, day_to: date | None = None) -> None:
+    """
+    Пересчитывает дневные итоги по истории лайков за [day_from, day_to]
+    (локальные дни, границы включительно; None — без ограничения).
+    """
+    day_expr = cast(LikeTransaction.created_at + timedelta(hours=LOCAL_OFFSET_HOURS), Date)
+
+    criteria = []
+    rollup_criteria = []
+    if day_from is not None:
+        criteria.append(LikeTransaction.created_at >= local_day_start_utc(day_from))
+        rollup_criteria.append(LikeDailyRollup.day >= day_from)
+    if day_to is not None:
+        criteria.append(LikeTransaction.created_at < local_day_start_utc(day_to + timedelta(days=1)))
+        rollup_criteria.append(LikeDailyRollup.day <= day_to)
+
+    received = select(
+        day_expr.label("day"),
+        LikeTransaction.to_user_bitrix_id.label("bitrix_id"),
+        literal(1).label("received"),
+        literal(0).label("sent"),
+    ).where(LikeTransaction.to_user_bitrix_id.isnot(None), *criteria)
+    sent = select(
+        day_expr.label("day"),
+        LikeTransaction.from_user_bitrix_id.label("bitrix_id"),
+        literal(0).label("received"),
+        literal(1).label("sent"),
+    ).where(LikeTransaction.from_user_bitrix_id.isnot(None), *criteria)
+    events = union_all(received, sent).subquery()
+
+    db.execute(delete(LikeDailyRollup).where(*rollup_criteria))
+    db.execute(
+        sa_insert(LikeDailyRollup).from_select(
+            ["day", "bitrix_id", "received", "sent"],
+            select(
+                events.c.day,
+                events.c.bitrix_id,
+                func.sum(events.c.received),
+                func.sum(events.c.sent),
+            )
+            .join(Employee, Employee.bitrix_id == events.c.bitrix_id)
+            .group_by(events.c.day, events.c.bitrix_id),
+        )
+    )
+
+
+def top_received_rows(db: Session, day_from: date, day_to: date, limit: int):
+    """Top-N по полученным Спасибкам за локальные дни [day_from, day_to] из дневных итогов."""
+    received = func.sum(LikeDailyRollup.received)
+    return (
+        db.query(
+            Employee.bitrix_id,
+            Employee.photo_url,
+            Employee.name,
+            Employee.lastname,
+            received.label("received"),
+        )
+        .select_from(LikeDailyRollup)
+        .join(Employee, Employee.bitrix_id == LikeDailyRollup.bitrix_id)
+        .filter(
+            LikeDailyRollup.day >= day_from,
+            LikeDailyRollup.day <= day_to,
+            LikeDailyRollup.received > 0,
+            Employee.is_active.is_(True),
+        )
+        .group_by(
+            Employee.bitrix_id,
+            Employee.photo_url,
+            Employee.name,
+            Employee.lastname,
+        )
+        .order_by(
+            received.desc(),
+            Employee.lastname.asc(),
+            Employee.name.asc(),
+        )
+        .limit(limit)
+        .all()
+    )
@@ -0,0 +1,39 @@
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+from backend.models import Employee, LikeTransaction
+
+
+def like_rows_select():
+    """
+    Общая проекция строки Спасибки для лент и истории: отправитель и получатель
+    подтягиваются одним запросом через два алиаса employees, только нужные колонки.
+    """
+    from_user = aliased(Employee, name="from_user")
+    to_user = aliased(Employee, name="to_user")
+
+    return (
+        select(
+            LikeTransaction.id.label("id"),
+            LikeTransaction.created_at.label("created_at"),
+            LikeTransaction.from_user_bitrix_id.label("from_user_bitrix_id"),
+            LikeTransaction.to_user_bitrix_id.label("to_user_bitrix_id"),
+            from_user.name.label("from_user_name"),
+            from_user.lastname.label("from_user_lastname"),
+            from_user.photo_url.label("from_user_photo_url"),
+            to_user.name.label("to_user_name"),
+            to_user.lastname.label("to_user_lastname"),
+            to_user.photo_url.label("to_user_photo_url"),
+            LikeTransaction.message.label("msg"),
+            LikeTransaction.sticker_id.label("sticker_id"),
+        )
+        .select_from(LikeTransaction)
+        .outerjoin(from_user, LikeTransaction.from_user_bitrix_id == from_user.bitrix_id)
+        .outerjoin(to_user, LikeTransaction.to_user_bitrix_id == to_user.bitrix_id)
+    )
+
+
+def like_user_name(name: str | None, lastname: str | None) -> str:
+    if not name:
+        return "Неизвестно"
+    return f"{name} {lastname or ''}".strip()
@@ -2,16 +2,21 @@ import logging
 from datetime import datetime, UTC
 
 from fastapi import HTTPException, status
+from sqlalchemy import func, update
 from sqlalchemy.orm import Session
 
-from backend.models import LikeTransaction, Employee, LikeRequest, GameParticipant, Game
-from backend.services.game_service import get_sent_likes_count
+from backend.models import LikeTransaction, Employee, LikeRequest, NotificationKind
+from backend.services.game_cache import game_cache
+from backend.services.like_quota_service import consume_like_quotas
+from backend.services.like_rollup_service import increment_like_daily_rollups
+from backend.services.notification_outbox import enqueue_notification
+from backend.services.rating_service import increment_rating_counters
 
 logger = logging.getLogger(__name__)
 
 
 def process_like_transaction(db: Session, payload: LikeRequest) -> tuple[int, int]:
-    game = db.query(Game).filter(Game.id == payload.game_id).first()
+    game = game_cache.get_game(db, payload.game_id)
 
     if not game:
         raise HTTPException(
@@ -37,14 +42,7 @@ def process_like_transaction(db: Session, payload: LikeRequest) -> tuple[int, in
             detail=f"Нельзя отправить Спасибку: дата завершения игры {game.game_end.date()} прошла"
         )
 
-    participant_ids = {
-        row.employee_bitrix_id
-        for row in (
-            db.query(GameParticipant.employee_bitrix_id)
-            .filter(GameParticipant.game_id == game.id)
-            .all()
-        )
-    }
+    participant_ids = game.participant_ids
 
     if payload.from_id not in participant_ids:
         raise HTTPException(
@@ -58,57 +56,62 @@ def process_like_transaction(db: Session, payload: LikeRequest) -> tuple[int, in
             detail="Нельзя отправить Спасибку: получатель не участвует в выбранной игре",
         )
 
-    count_in_this_game = (
-        db.query(LikeTransaction)
-        .filter(
-            LikeTransaction.game_id == game.id,
-            LikeTransaction.from_user_bitrix_id == payload.from_id,
-            LikeTransaction.to_user_bitrix_id == payload.to_id,
-        )
-        .count()
-    )
-
-    if count_in_this_game >= game.setting_limitToOneUser:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                            detail="Вы превысили лимит на Спасибки для одного сотрудника")
-
-    sent_in_period = get_sent_likes_count(db, payload.from_id, game)
-
-    if sent_in_period >= game.setting_limitValue:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Вы израсходовали лимит Спасибок",
-        )
-
     if payload.from_id == payload.to_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Нельзя отправить Спасибку самому себе")
 
-    like_from = db.query(Employee).filter_by(bitrix_id=payload.from_id).first()
-    like_for = db.query(Employee).filter_by(bitrix_id=payload.to_id).first()
-
-    if not like_from:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Отправитель не найден")
-    if not like_for:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Получатель не найден")
-
     try:
-        like_for.likes += 1
-        like_for.coins += 100
+        # Лимиты проверяются и списываются атомарно по строкам-счётчикам
+        consume_like_quotas(db, game, payload.from_id, payload.to_id)
 
+        created_at = datetime.utcnow()
         new_like_transaction = LikeTransaction(
             from_user_bitrix_id=payload.from_id,
             to_user_bitrix_id=payload.to_id,
             message=payload.message,
-            created_at=datetime.utcnow(),
+            created_at=created_at,
             game_id=game.id,
             sticker_id=payload.sticker_id,
         )
         db.add(new_like_transaction)
 
+        # Атомарный инкремент на стороне БД: параллельные лайки одному
+        # сотруднику не теряют обновления, и не нужен отдельный SELECT.
+        # Отправитель гарантированно существует: он участник игры (FK на employees).
+        # Деактивированный получатель (пропал из Bitrix) Спасибки не получает.
+        updated_recipient_id = db.execute(
+            update(Employee)
+            .where(Employee.bitrix_id == payload.to_id, Employee.is_active.is_(True))
+            .values(
+                likes=func.coalesce(Employee.likes, 0) + 1,
+                coins=Employee.coins + 100,
+            )
+            .returning(Employee.bitrix_id)
+            .execution_options(synchronize_session=False)
+        ).scalar_one_or_none()
+
+        if updated_recipient_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Получатель не найден или деактивирован",
+            )
+
+        increment_rating_counters(db, game.id, payload.from_id, payload.to_id)
+        increment_like_daily_rollups(db, created_at, payload.from_id, payload.to_id)
+
+        enqueue_notification(
+            db,
+            NotificationKind.LIKE,
+            {"from_user_id": payload.from_id, "to_user_id": payload.to_id},
+        )
+
         db.commit()
 
         return payload.from_id, payload.to_id
 
+    except HTTPException:
+        db.rollback()
+        raise
+
     except Exception:
         logger.exception(f"Транзакция лайка не удалась. Откат изменений. From: {payload.from_id}")
         db.rollback()
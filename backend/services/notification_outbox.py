@@ -0,0 +1,205 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from backend.models import NotificationOutbox, NotificationKind, NotificationStatus
+from backend.scripts.config import settings
+from backend.scripts.database import AsyncSessionLocal
+from backend.services.bitrix_notify import send_bitrix_notification, send_bitrix_purchase_notification
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_DELAY_SECONDS = 3600
+
+
+def enqueue_notification(db: Session, kind: NotificationKind, payload: dict) -> NotificationOutbox:
+    """
+    Кладёт уведомление в outbox в транзакции вызывающего кода.
+    Уведомление уйдёт в Bitrix только после commit этой транзакции.
+    """
+    entry = NotificationOutbox(
+        kind=kind,
+        payload=payload,
+        status=NotificationStatus.PENDING,
+        attempts=0,
+        next_attempt_at=datetime.utcnow(),
+    )
+    db.add(entry)
+    return entry
+
+
+def get_retry_delay(attempts: int) -> timedelta:
+    seconds = settings.NOTIFY_RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0))
+    return timedelta(seconds=min(seconds, MAX_RETRY_DELAY_SECONDS))
+
+
+async def _deliver(db: AsyncSession, kind: NotificationKind, payload: dict) -> str | None:
+    """
+    Отправляет одно уведомление. Возвращает текст ошибки или None при успехе.
+    payload может измениться (например, список оставшихся получателей) —
+    при повторе используется обновлённый payload.
+    """
+    if kind == NotificationKind.LIKE:
+        result = await send_bitrix_notification(
+            from_user_id=payload["from_user_id"],
+            to_user_id=payload["to_user_id"],
+            db=db,
+        )
+    elif kind == NotificationKind.PURCHASE:
+        result = await send_bitrix_purchase_notification(
+            payload["buyer_id"],
+            payload["item_name"],
+            db,
+            admin_ids=payload.get("admin_ids"),
+        )
+        if isinstance(result, dict) and result.get("pending_admin_ids") is not None:
+            # Повтор уйдёт только тем администраторам, кому доставка не удалась
+            payload["admin_ids"] = result["pending_admin_ids"]
+    else:
+        return f"Неизвестный тип уведомления: {kind}"
+
+    if isinstance(result, dict) and result.get("status", 200) >= 400:
+        return str(result.get("detail") or result.get("message") or result)
+
+    return None
+
+
+async def _claim_batch(limit: int) -> list[int]:
+    """
+    Забирает пачку готовых к отправке записей.
+    next_attempt_at сдвигается на время аренды, поэтому если процесс упадёт
+    во время отправки, запись снова станет доступной после истечения аренды.
+    """
+    async with AsyncSessionLocal() as db:
+        now = datetime.utcnow()
+        entries = (
+            await db.scalars(
+                select(NotificationOutbox)
+                .where(
+                    NotificationOutbox.status == NotificationStatus.PENDING,
+                    NotificationOutbox.next_attempt_at <= now,
+                )
+                .order_by(NotificationOutbox.id)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )
+        ).all()
+
+        for entry in entries:
+            entry.attempts += 1
+            entry.next_attempt_at = now + timedelta(seconds=settings.NOTIFY_LEASE_SECONDS)
+
+        await db.commit()
+        return [entry.id for entry in entries]
+
+
+async def _process_entry(entry_id: int) -> None:
+    async with AsyncSessionLocal() as db:
+        entry = await db.get(NotificationOutbox, entry_id)
+        if entry is None or entry.status != NotificationStatus.PENDING:
+            return
+
+        payload = dict(entry.payload or {})
+        try:
+            error = await _deliver(db, entry.kind, payload)
+        except Exception as exc:
+            logger.exception("Bitrix notification delivery failed (outbox_id=%s)", entry_id)
+            error = repr(exc)
+
+        if error is not None and payload != entry.payload:
+            entry.payload = payload
+
+        now = datetime.utcnow()
+        if error is None:
+            entry.status = NotificationStatus.SENT
+            entry.sent_at = now
+            entry.last_error = None
+        elif entry.attempts >= settings.NOTIFY_MAX_ATTEMPTS:
+            entry.status = NotificationStatus.FAILED
+            entry.last_error = error
+            logger.error(
+                "Bitrix notification dropped after %s attempts (outbox_id=%s): %s",
+                entry.attempts,
+                entry_id,
+                error,
+            )
+        else:
+            entry.next_attempt_at = now + get_retry_delay(entry.attempts)
+            entry.last_error = error
+            logger.warning(
+                "Bitrix notification will be retried (outbox_id=%s, attempt=%s): %s",
+                entry_id,
+                entry.attempts,
+                error,
+            )
+
+        await db.commit()
+
+
+class NotificationWorkerPool:
+    """
+    Пул asyncio-воркеров, которые разбирают notification_outbox.
+    Несколько процессов uvicorn могут работать одновременно:
+    записи забираются через SELECT ... FOR UPDATE SKIP LOCKED.
+    """
+
+    def __init__(self, workers: int, batch_size: int, poll_interval: float):
+        self.workers = max(workers, 1)
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._wake = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._run(), name=f"notification-worker-{index}")
+            for index in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def wake(self) -> None:
+        """Будит воркеры сразу после commit, не дожидаясь очередного опроса."""
+        self._wake.set()
+
+    async def drain_once(self) -> int:
+        entry_ids = await _claim_batch(self.batch_size)
+        for entry_id in entry_ids:
+            await _process_entry(entry_id)
+        return len(entry_ids)
+
+    async def _run(self) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                processed = await self.drain_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Notification worker iteration failed")
+                processed = 0
+
+            if processed:
+                continue
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+notification_worker = NotificationWorkerPool(
+    workers=settings.NOTIFY_WORKERS,
+    batch_size=settings.NOTIFY_BATCH_SIZE,
+    poll_interval=settings.NOTIFY_POLL_INTERVAL,
+)
@@ -0,0 +1,97 @@
+import base64
+import json
+from datetime import date, datetime, timedelta
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, tuple_
+
+from backend.services.like_rollup_service import local_day_start_utc
+
+
+def encode_cursor(values: dict) -> str:
+    """
+    Непрозрачный курсор для keyset-пагинации: base64 от JSON с ключом
+    последней строки страницы. datetime сериализуется в ISO-формат.
+    """
+    prepared = {
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in values.items()
+    }
+    raw = json.dumps(prepared, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _invalid_cursor() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Некорректный курсор пагинации",
+    )
+
+
+def decode_cursor(cursor: str, datetime_fields: tuple[str, ...] = ()) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, dict):
+            raise ValueError("cursor payload is not an object")
+        for field in datetime_fields:
+            values[field] = datetime.fromisoformat(values[field])
+        return values
+    except (ValueError, KeyError, TypeError):
+        raise _invalid_cursor()
+
+
+def decode_created_id_cursor(after: str | None) -> dict | None:
+    """Курсор для порядка (created_at, id) desc: {"t": created_at, "id": id}."""
+    if not after:
+        return None
+    values = decode_cursor(after, datetime_fields=("t",))
+    if not isinstance(values.get("id"), int):
+        raise _invalid_cursor()
+    return values
+
+
+def decode_id_cursor(after: str | None) -> int | None:
+    """Курсор для порядка по возрастанию id: {"id": id}."""
+    if not after:
+        return None
+    values = decode_cursor(after)
+    if not isinstance(values.get("id"), int):
+        raise _invalid_cursor()
+    return values["id"]
+
+
+def created_id_after(created_at_column, id_column, cursor: dict):
+    """
+    Условие «строки после курсора» для порядка (created_at, id) desc.
+    Отдельное условие по created_at ограничивает диапазон индекса и позволяет
+    PostgreSQL отсечь секции секционированных таблиц (сравнение кортежей этого не даёт).
+    """
+    return and_(
+        created_at_column <= cursor["t"],
+        tuple_(created_at_column, id_column) < (cursor["t"], cursor["id"]),
+    )
+
+
+def created_between(created_at_column, date_from: date | None, date_to: date | None) -> list:
+    """Условия «создано в локальные дни [date_from, date_to]» для naive UTC колонки."""
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="date_from позже date_to")
+    filters = []
+    if date_from:
+        filters.append(created_at_column >= local_day_start_utc(date_from))
+    if date_to:
+        filters.append(created_at_column < local_day_start_utc(date_to + timedelta(days=1)))
+    return filters
+
+
+def next_created_id_cursor(rows, limit: int) -> str | None:
+    """Курсор следующей страницы, если текущая заполнена целиком."""
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor({"t": last.created_at, "id": last.id})
+
+
+def count_total_pages(total: int, limit: int) -> int:
+    return (total + limit - 1) // limit if total > 0 else 1
@@ -0,0 +1,179 @@
+from sqlalchemy import delete, func, insert as sa_insert, literal, select, tuple_, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from backend.models import Employee, LikeTransaction, RatingCounter
+
+# game_id строки общего рейтинга в rating_counters
+RATING_SCOPE_OVERALL = 0
+
+
+def increment_rating_counters(db: Session, game_id: int | None, from_id: int, to_id: int) -> None:
+    """
+    Учитывает одну Спасибку в рейтинге игры и в общем рейтинге.
+    Вызывается в транзакции лайка: один INSERT ... ON CONFLICT на все строки.
+    """
+    scopes = [RATING_SCOPE_OVERALL]
+    if game_id is not None:
+        scopes.append(game_id)
+
+    rows = []
+    for scope in scopes:
+        rows.append({"game_id": scope, "bitrix_id": to_id, "received": 1, "sent": 0})
+        rows.append({"game_id": scope, "bitrix_id": from_id, "received": 0, "sent": 1})
+
+    stmt = insert(RatingCounter).values(rows)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["game_id", "bitrix_id"],
+            set_={
+                "received": RatingCounter.received + stmt.excluded.received,
+                "sent": RatingCounter.sent + stmt.excluded.sent,
+            },
+        )
+    )
+
+
+def rebuild_rating_counters(db: Session) -> None:
+    """Пересчитывает rating_counters целиком по истории лайков."""
+    received = select(
+        LikeTransaction.game_id.label("game_id"),
+        LikeTransaction.to_user_bitrix_id.label("bitrix_id"),
+        literal(1).label("received"),
+        literal(0).label("sent"),
+    ).where(LikeTransaction.to_user_bitrix_id.isnot(None))
+    sent = select(
+        LikeTransaction.game_id.label("game_id"),
+        LikeTransaction.from_user_bitrix_id.label("bitrix_id"),
+        literal(0).label("received"),
+        literal(1).label("sent"),
+    ).where(LikeTransaction.from_user_bitrix_id.isnot(None))
+    events = union_all(received, sent).subquery()
+
+    def scope_select(scope_column, *criteria):
+        return (
+            select(
+                scope_column,
+                events.c.bitrix_id,
+                func.sum(events.c.received),
+                func.sum(events.c.sent),
+            )
+            .join(Employee, Employee.bitrix_id == events.c.bitrix_id)
+            .where(*criteria)
+            .group_by(events.c.bitrix_id)
+        )
+
+    columns = ["game_id", "bitrix_id", "received", "sent"]
+    db.execute(delete(RatingCounter))
+    # Константа общего рейтинга не входит в GROUP BY: параметр там
+    # PostgreSQL понял бы как номер колонки («GROUP BY 0»)
+    db.execute(
+        sa_insert(RatingCounter).from_select(
+            columns,
+            scope_select(literal(RATING_SCOPE_OVERALL).label("game_id")),
+        )
+    )
+    db.execute(
+        sa_insert(RatingCounter).from_select(
+            columns,
+            scope_select(events.c.game_id, events.c.game_id.isnot(None)).group_by(events.c.game_id),
+        )
+    )
+
+
+def rating_rows_query(db: Session, game_id: int):
+    """
+    Строки рейтинга в порядке (received desc, sent desc, bitrix_id desc) —
+    читаются по индексу ix_rating_counters_game_rating без агрегации лайков.
+    Деактивированные сотрудники в рейтинг не попадают, но их счётчики
+    сохраняются и вернутся в рейтинг при повторной активации.
+    """
+    return (
+        db.query(
+            Employee.bitrix_id,
+            Employee.photo_url,
+            Employee.name,
+            Employee.lastname,
+            RatingCounter.received,
+            RatingCounter.sent,
+        )
+        .select_from(RatingCounter)
+        .join(Employee, Employee.bitrix_id == RatingCounter.bitrix_id)
+        .filter(RatingCounter.game_id == game_id, Employee.is_active.is_(True))
+        .order_by(
+            RatingCounter.received.desc(),
+            RatingCounter.sent.desc(),
+            RatingCounter.bitrix_id.desc(),
+        )
+    )
+
+
+def _rating_key(counter: RatingCounter | None = None):
+    """
+    Ключ порядка рейтинга. Все колонки идут в одном направлении, поэтому
+    сравнение кортежей — граница диапазона по индексу ix_rating_counters_game_rating.
+    """
+    if counter is None:
+        return tuple_(RatingCounter.received, RatingCounter.sent, RatingCounter.bitrix_id)
+    return tuple_(counter.received, counter.sent, counter.bitrix_id)
+
+
+def get_rating_place(db: Session, game_id: int, bitrix_id: int, neighbours: int):
+    """
+    Место сотрудника в рейтинге и до neighbours соседей сверху и снизу.
+    Все запросы — диапазоны по индексу ix_rating_counters_game_rating:
+    место считается по строкам выше сотрудника, соседи читаются с LIMIT
+    от позиции сотрудника в обе стороны.
+    Возвращает (counter, place, above, below); counter = None, если сотрудник
+    ещё не отправлял и не получал Спасибок в этом рейтинге.
+    """
+    counter = (
+        db.query(RatingCounter)
+        .join(Employee, Employee.bitrix_id == RatingCounter.bitrix_id)
+        .filter(
+            RatingCounter.game_id == game_id,
+            RatingCounter.bitrix_id == bitrix_id,
+            Employee.is_active.is_(True),
+        )
+        .first()
+    )
+    if counter is None:
+        return None, None, [], []
+
+    ahead_count = (
+        db.query(func.count())
+        .select_from(RatingCounter)
+        .join(Employee, Employee.bitrix_id == RatingCounter.bitrix_id)
+        .filter(
+            RatingCounter.game_id == game_id,
+            Employee.is_active.is_(True),
+            _rating_key() > _rating_key(counter),
+        )
+        .scalar()
+    )
+    place = ahead_count + 1
+
+    above = []
+    below = []
+    if neighbours > 0:
+        above = (
+            rating_rows_query(db, game_id)
+            .filter(_rating_key() > _rating_key(counter))
+            .order_by(None)
+            .order_by(
+                RatingCounter.received.asc(),
+                RatingCounter.sent.asc(),
+                RatingCounter.bitrix_id.asc(),
+            )
+            .limit(neighbours)
+            .all()
+        )
+        above.reverse()
+        below = (
+            rating_rows_query(db, game_id)
+            .filter(_rating_key() < _rating_key(counter))
+            .limit(neighbours)
+            .all()
+        )
+
+    return counter, place, above, below
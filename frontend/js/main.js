@@ -3836,6 +3836,27 @@ async function submitShopItemEditForm(e) {
 }
 
 
+async function waitEmployeesSyncJob(jobId, btn) {
+    while (true) {
+        const res = await fetch(`/api/all_users/jobs/${encodeURIComponent(jobId)}`);
+        if (!res.ok) {
+            throw new Error(`Не удалось получить статус синхронизации (${res.status})`);
+        }
+
+        const job = await res.json();
+        if (job.status === 'done' || job.status === 'failed') {
+            return job;
+        }
+
+        if (btn && job.total) {
+            const fetched = Math.min(job.next_start, job.total);
+            btn.textContent = `Обновляем... ${fetched} из ${job.total}`;
+        }
+
+        await new Promise((resolve) => setTimeout(resolve, 1500));
+    }
+}
+
 async function updateEmployeesFromBitrix() {
     const btn = document.getElementById('update-employees-btn');
     const userId = getCurrentUserId();
@@ -3873,8 +3894,12 @@ async function updateEmployeesFromBitrix() {
             data = null;
         }
 
-        if (data?.count != null) {
-            toast(`Сотрудники обновлены (${data.count})`);
+        if (data?.job?.id != null) {
+            const job = await waitEmployeesSyncJob(data.job.id, btn);
+            if (job.status === 'failed') {
+                throw new Error(job.last_error || 'Синхронизация сотрудников завершилась с ошибкой');
+            }
+            toast(`Сотрудники обновлены (добавлено: ${job.inserted}, изменено: ${job.updated})`);
         } else if (data?.message) {
             toast(data.message);
         } else {
@@ -0,0 +1,105 @@
+"""
+Тесты работают с настоящим PostgreSQL: атомарные инкременты, ON CONFLICT,
+блокировки строк и секционирование на SQLite не проверить.
+
+Подключение берётся из тех же DB_* переменных, что и у приложения, но имя базы —
+TEST_DB_NAME (по умолчанию spasibki_test): таблицы в ней пересоздаются при запуске.
+    TEST_DB_NAME=spasibki_test python -m pytest
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+os.environ["DB_NAME"] = os.getenv("TEST_DB_NAME", "spasibki_test")
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from backend import models  # noqa: F401 — регистрирует таблицы в Base.metadata
+from backend.scripts.config import settings
+from backend.scripts.database import Base, SessionLocal, engine
+from backend.services.game_cache import game_cache
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    if not settings.DB_NAME.endswith("_test"):
+        pytest.exit(f"Тесты пересоздают таблицы, база {settings.DB_NAME!r} не похожа на тестовую")
+    try:
+        with engine.connect():
+            pass
+    except OperationalError as exc:
+        pytest.skip(f"PostgreSQL недоступен: {exc.orig}")
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def clean_tables(database):
+    tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+    with engine.begin() as connection:
+        connection.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+    game_cache.invalidate()
+    yield
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def async_session_factory():
+    """
+    Асинхронные сессии на отдельном движке без пула: каждый тест гоняет
+    свой asyncio.run, а соединения asyncpg привязаны к циклу событий.
+    """
+    async_engine = create_async_engine(settings.ASYNC_DATABASE_URL, poolclass=NullPool)
+    yield async_sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    asyncio.run(async_engine.dispose())
+
+
+@pytest.fixture
+def add_employees(db):
+    def add(*bitrix_ids: int, **fields) -> list[models.Employee]:
+        employees = [
+            models.Employee(bitrix_id=bitrix_id, name=f"Имя{bitrix_id}", lastname=f"Фамилия{bitrix_id}", **fields)
+            for bitrix_id in bitrix_ids
+        ]
+        db.add_all(employees)
+        db.commit()
+        return employees
+
+    return add
+
+
+@pytest.fixture
+def add_game(db):
+    def add(participant_ids, **fields) -> models.Game:
+        values = {
+            "name": "Игра",
+            "game_start": datetime.utcnow() - timedelta(days=1),
+            "game_end": datetime.utcnow() + timedelta(days=30),
+            "game_is_active": True,
+            "setting_limitParameter": models.LimitParameter.GAME,
+            "setting_limitValue": 100,
+            "setting_limitToOneUser": 100,
+        }
+        values.update(fields)
+        game = models.Game(**values)
+        game.participant_links = [models.GameParticipant(employee_bitrix_id=bitrix_id) for bitrix_id in participant_ids]
+        db.add(game)
+        db.commit()
+        return game
+
+    return add
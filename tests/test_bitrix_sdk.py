@@ -0,0 +1,113 @@
+import asyncio
+import time
+
+from backend.bitrix_sdk import python_current_SDK as sdk
+from backend.bitrix_sdk.python_current_SDK import (
+    BitrixCurrent,
+    BitrixPriority,
+    BitrixRateLimiterRegistry,
+    PortalRateLimiter,
+)
+from backend.scripts.config import settings
+
+DOMAIN = "portal.bitrix24.ru"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+def test_token_bucket_refills_at_configured_rate(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(sdk, "time", clock)
+    limiter = PortalRateLimiter(rate=20, burst=5)
+
+    assert [limiter._take() for _ in range(6)] == [True] * 5 + [False]
+
+    # 0.1 с при 20 запросах в секунду — ровно два новых запроса
+    clock.now += 0.1
+    assert [limiter._take() for _ in range(3)] == [True, True, False]
+
+    # Долгий простой не копит запас больше burst
+    clock.now += 60
+    assert [limiter._take() for _ in range(6)] == [True] * 5 + [False]
+
+
+def test_interactive_request_overtakes_queued_bulk_requests():
+    async def run() -> list[str]:
+        limiter = PortalRateLimiter(rate=50, burst=1)
+        await limiter.acquire(BitrixPriority.NORMAL)  # забирает единственный запрос из запаса
+        served = []
+
+        async def request(name: str, priority: BitrixPriority) -> None:
+            await limiter.acquire(priority)
+            served.append(name)
+
+        tasks = [asyncio.create_task(request(f"bulk{index}", BitrixPriority.BULK)) for index in range(3)]
+        await asyncio.sleep(0)  # фоновые запросы уже стоят в очереди
+        tasks.append(asyncio.create_task(request("interactive", BitrixPriority.INTERACTIVE)))
+        await asyncio.gather(*tasks)
+
+        assert limiter.metrics()["queued"] == 4
+        assert limiter.queue_depth == 0
+        return served
+
+    assert asyncio.run(run()) == ["interactive", "bulk0", "bulk1", "bulk2"]
+
+
+class FakeResponse:
+    def __init__(self, payload: dict):
+        self.payload = payload
+
+    def json(self) -> dict:
+        return self.payload
+
+
+class FakeClient:
+    """Отвечает заданными ответами по очереди и запоминает время каждого запроса."""
+
+    def __init__(self, responses: list[dict]):
+        self.responses = list(responses)
+        self.sent_at: list[float] = []
+
+    async def post(self, url: str, data: dict) -> FakeResponse:
+        self.sent_at.append(time.monotonic())
+        return FakeResponse(self.responses.pop(0))
+
+
+def _call_with_responses(monkeypatch, responses: list[dict]) -> tuple[dict, FakeClient, PortalRateLimiter]:
+    client = FakeClient(responses)
+    limiters = BitrixRateLimiterRegistry(rate=1000, burst=10)
+    monkeypatch.setattr(sdk.bitrix_clients, "get", lambda domain: client)
+    monkeypatch.setattr(sdk, "bitrix_rate_limiters", limiters)
+    monkeypatch.setattr(settings, "BITRIX_THROTTLE_RETRY_SECONDS", 0.05)
+    monkeypatch.setattr(settings, "BITRIX_THROTTLE_MAX_RETRIES", 3)
+
+    bx = BitrixCurrent("token", "refresh", DOMAIN)
+    result = asyncio.run(bx.call("user.get", {"start": 0}))
+    return result, client, limiters.get(DOMAIN)
+
+
+def test_throttled_call_is_retried_with_backoff(monkeypatch):
+    throttled = {"error": "QUERY_LIMIT_EXCEEDED", "error_description": "Too many requests"}
+    result, client, limiter = _call_with_responses(monkeypatch, [throttled, throttled, {"result": [{"ID": "1"}]}])
+
+    assert result == {"result": [{"ID": "1"}]}
+    assert len(client.sent_at) == 3
+    first_gap, second_gap = (b - a for a, b in zip(client.sent_at, client.sent_at[1:]))
+    # Задержка растёт вдвое: 0.05 с, затем 0.1 с
+    assert first_gap >= 0.045
+    assert second_gap >= 0.095
+    assert limiter.metrics()["throttled"] == 2
+
+
+def test_throttled_call_gives_up_after_max_retries(monkeypatch):
+    throttled = {"error": "QUERY_LIMIT_EXCEEDED", "error_description": "Too many requests"}
+    result, client, _ = _call_with_responses(monkeypatch, [throttled] * 4)
+
+    assert result == throttled
+    assert len(client.sent_at) == 4
@@ -0,0 +1,52 @@
+from sqlalchemy import select
+
+from backend.models import Employee
+from backend.services.db_save_employee import save_or_update_employees
+
+FULL_PAYLOAD = {
+    "ID": "7",
+    "NAME": "Анна",
+    "LAST_NAME": "Иванова",
+    "EMAIL": "anna@example.com",
+    "WORK_POSITION": "Бухгалтер",
+    "PERSONAL_PHOTO": "https://example.com/anna.png",
+}
+
+
+def _employee(db) -> Employee:
+    db.expire_all()
+    return db.scalars(select(Employee).where(Employee.bitrix_id == 7)).one()
+
+
+def test_partial_payload_keeps_stored_fields(db):
+    assert save_or_update_employees([FULL_PAYLOAD], db)["inserted"] == 1
+
+    result = save_or_update_employees([{"ID": "7", "WORK_POSITION": "Главный бухгалтер"}], db)
+
+    assert result["updated"] == 1
+    employee = _employee(db)
+    assert (employee.name, employee.lastname) == ("Анна", "Иванова")
+    assert employee.email == "anna@example.com"
+    assert employee.photo_url == "https://example.com/anna.png"
+    assert employee.position == "Главный бухгалтер"
+
+
+def test_partial_payload_for_new_employee_fills_missing_fields(db):
+    save_or_update_employees([{"ID": "7", "NAME": "Анна"}, {**FULL_PAYLOAD, "ID": "8"}], db)
+
+    employee = _employee(db)
+    assert (employee.name, employee.lastname, employee.email) == ("Анна", "", "")
+    assert db.scalar(select(Employee.lastname).where(Employee.bitrix_id == 8)) == "Иванова"
+
+
+def test_sync_assigns_portal_to_unchanged_employee(db):
+    save_or_update_employees([FULL_PAYLOAD], db)
+    assert _employee(db).domain is None
+
+    result = save_or_update_employees([FULL_PAYLOAD], db, domain="portal.bitrix24.ru")
+
+    assert result["updated"] == 1
+    assert _employee(db).domain == "portal.bitrix24.ru"
+    assert save_or_update_employees([FULL_PAYLOAD], db, domain="portal.bitrix24.ru")["unchanged"] == 1
+    assert save_or_update_employees([FULL_PAYLOAD], db)["unchanged"] == 1
+    assert _employee(db).domain == "portal.bitrix24.ru"
@@ -0,0 +1,87 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select, update
+
+from backend.models import Employee, EmployeeSyncJob, EmployeeSyncSeen, LikeRequest, LikeTransaction, RatingCounter
+from backend.services.employee_sync import deactivate_unseen_employees, mark_employees_seen
+from backend.services.game_cache import game_cache
+from backend.services.like_service import process_like_transaction
+from backend.services.rating_service import RATING_SCOPE_OVERALL, get_rating_place, rating_rows_query
+
+SENDER_ID = 1
+LEAVER_ID = 2
+COLLEAGUE_ID = 3
+OTHER_PORTAL_ID = 4
+DOMAIN = "portal.bitrix24.ru"
+
+
+def _run_full_sync(db, seen_ids: list[int], total: int | None = None) -> int:
+    """total — сколько пользователей Bitrix вернул в первой странице (по умолчанию все полученные)."""
+    job = EmployeeSyncJob(domain=DOMAIN, requested_by=SENDER_ID, total=len(seen_ids) if total is None else total)
+    db.add(job)
+    db.flush()
+    mark_employees_seen(db, job.id, [{"ID": str(bitrix_id)} for bitrix_id in seen_ids])
+    deactivated = deactivate_unseen_employees(db, job)
+    db.commit()
+    return deactivated
+
+
+def _active_ids(db) -> set[int]:
+    db.expire_all()
+    return set(db.scalars(select(Employee.bitrix_id).where(Employee.is_active.is_(True))))
+
+
+def test_deactivated_employee_leaves_games_and_ratings(db, add_employees, add_game):
+    add_employees(SENDER_ID, LEAVER_ID, COLLEAGUE_ID, domain=DOMAIN)
+    game_id = add_game([SENDER_ID, LEAVER_ID, COLLEAGUE_ID]).id
+    db.add_all([
+        RatingCounter(game_id=RATING_SCOPE_OVERALL, bitrix_id=LEAVER_ID, received=10, sent=0),
+        RatingCounter(game_id=RATING_SCOPE_OVERALL, bitrix_id=COLLEAGUE_ID, received=5, sent=0),
+    ])
+    db.commit()
+    assert LEAVER_ID in game_cache.get_game(db, game_id).participant_ids
+
+    assert _run_full_sync(db, [SENDER_ID, COLLEAGUE_ID]) == 1
+
+    # Кэш сброшен после commit синхронизации
+    assert game_cache.get_game(db, game_id).participant_ids == {SENDER_ID, COLLEAGUE_ID}
+    assert [row.bitrix_id for row in rating_rows_query(db, RATING_SCOPE_OVERALL)] == [COLLEAGUE_ID]
+    assert get_rating_place(db, RATING_SCOPE_OVERALL, COLLEAGUE_ID, neighbours=1)[1:] == (1, [], [])
+    assert get_rating_place(db, RATING_SCOPE_OVERALL, LEAVER_ID, neighbours=1)[0] is None
+
+    with pytest.raises(HTTPException) as error:
+        process_like_transaction(db, LikeRequest(game_id=game_id, from_id=SENDER_ID, to_id=LEAVER_ID))
+    assert error.value.status_code == 400
+
+
+def test_like_to_deactivated_recipient_is_rejected_even_with_stale_cache(db, add_employees, add_game):
+    add_employees(SENDER_ID, LEAVER_ID)
+    game_id = add_game([SENDER_ID, LEAVER_ID]).id
+    assert LEAVER_ID in game_cache.get_game(db, game_id).participant_ids
+
+    # Деактивация в другом процессе: локальный кэш ещё не получил NOTIFY
+    db.execute(update(Employee).where(Employee.bitrix_id == LEAVER_ID).values(is_active=False))
+    db.commit()
+
+    with pytest.raises(HTTPException) as error:
+        process_like_transaction(db, LikeRequest(game_id=game_id, from_id=SENDER_ID, to_id=LEAVER_ID))
+    assert error.value.status_code == 404
+    assert db.scalar(select(func.count(LikeTransaction.id))) == 0
+
+
+def test_full_sync_deactivates_only_employees_of_its_portal(db, add_employees):
+    add_employees(SENDER_ID, LEAVER_ID, domain=DOMAIN)
+    add_employees(OTHER_PORTAL_ID, domain="other.bitrix24.ru")
+
+    assert _run_full_sync(db, [SENDER_ID]) == 1
+    assert _active_ids(db) == {SENDER_ID, OTHER_PORTAL_ID}
+
+
+def test_full_sync_with_shifted_pages_deactivates_nobody(db, add_employees):
+    add_employees(SENDER_ID, LEAVER_ID, COLLEAGUE_ID, domain=DOMAIN)
+
+    # Первая страница сообщила о трёх пользователях, но из-за сдвига страниц
+    # (кого-то добавили или удалили в Bitrix) получено только двое
+    assert _run_full_sync(db, [SENDER_ID, COLLEAGUE_ID], total=3) == 0
+    assert _active_ids(db) == {SENDER_ID, LEAVER_ID, COLLEAGUE_ID}
+    assert db.scalar(select(func.count()).select_from(EmployeeSyncSeen)) == 0
@@ -0,0 +1,136 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select, update
+
+from backend.bitrix_sdk.python_current_SDK import BitrixBatchResult
+from backend.models import Employee, EmployeeSyncJob, EmployeeSyncMode, EmployeeSyncStatus
+from backend.scripts.config import settings
+from backend.services import employee_sync
+from backend.services.bitrix_users import BITRIX_PAGE_SIZE
+from backend.services.employee_sync import _claim_job, enqueue_employee_sync, run_employee_sync_job
+
+DOMAIN = "portal.bitrix24.ru"
+REQUESTED_BY = 1
+USERS = 230  # пять страниц user.get: start = 0, 50, 100, 150, 200
+
+
+class FakeBitrix:
+    """
+    Портал с USERS пользователями: user.get и batch из user.get по страницам.
+    fail_on_batch — номер batch-вызова (с 1), на котором «обрывается связь».
+    """
+
+    def __init__(self, fail_on_batch: int | None = None):
+        self.users = [
+            {"ID": str(bitrix_id), "NAME": f"Имя{bitrix_id}", "LAST_NAME": f"Фамилия{bitrix_id}"}
+            for bitrix_id in range(1, USERS + 1)
+        ]
+        self.fail_on_batch = fail_on_batch
+        self.batches = 0
+        self.requested_starts: list[int] = []
+
+    def _page(self, start: int) -> list[dict]:
+        self.requested_starts.append(start)
+        return self.users[start:start + BITRIX_PAGE_SIZE]
+
+    async def call(self, method: str, params: dict) -> dict:
+        return {"result": self._page(params["start"]), "total": len(self.users)}
+
+    async def call_batch(self, commands: dict) -> BitrixBatchResult:
+        self.batches += 1
+        if self.batches == self.fail_on_batch:
+            raise ConnectionError("Bitrix недоступен")
+        result = BitrixBatchResult()
+        for key, (method, params) in commands.items():
+            result.results[key] = self._page(params["start"])
+        return result
+
+
+class FakeTokens:
+    def __init__(self, bitrix: FakeBitrix):
+        self.bitrix = bitrix
+
+    def client(self, priority) -> FakeBitrix:
+        return self.bitrix
+
+
+@pytest.fixture
+def sync_env(async_session_factory, monkeypatch):
+    """Задачи синхронизации на тестовой базе, Bitrix — подменный; страницы по одной и по порядку."""
+    monkeypatch.setattr(employee_sync, "AsyncSessionLocal", async_session_factory)
+    monkeypatch.setattr(settings, "EMPLOYEE_SYNC_PAGES_PER_STEP", 1)
+    monkeypatch.setattr(settings, "BITRIX_FETCH_CONCURRENCY", 1)
+
+    def use_bitrix(bitrix: FakeBitrix) -> None:
+        async def get_user_tokens(db, user_id):
+            return FakeTokens(bitrix)
+
+        monkeypatch.setattr(employee_sync.bitrix_token_manager, "get_user_tokens", get_user_tokens)
+
+    return use_bitrix
+
+
+def _claim_and_run() -> int:
+    async def run() -> int:
+        job_id = await _claim_job()
+        assert job_id is not None
+        await run_employee_sync_job(job_id)
+        return job_id
+
+    return asyncio.run(run())
+
+
+def test_second_enqueue_returns_active_job(db):
+    job, created = enqueue_employee_sync(db, DOMAIN, REQUESTED_BY, "full")
+    assert created
+
+    same, created_again = enqueue_employee_sync(db, DOMAIN, REQUESTED_BY + 1, "delta")
+    assert not created_again
+    assert same.id == job.id
+    assert same.mode == EmployeeSyncMode.FULL
+
+    _, other_portal_created = enqueue_employee_sync(db, "other.bitrix24.ru", REQUESTED_BY, "full")
+    assert other_portal_created
+    assert db.scalar(select(func.count()).select_from(EmployeeSyncJob)) == 2
+
+
+def test_interrupted_sync_resumes_from_checkpoint(db, sync_env):
+    job, _ = enqueue_employee_sync(db, DOMAIN, REQUESTED_BY, "full")
+
+    # Первая страница — отдельным user.get, дальше по странице на batch:
+    # третий batch (start = 150) обрывается, записаны страницы 0, 50, 100
+    interrupted = FakeBitrix(fail_on_batch=3)
+    sync_env(interrupted)
+    _claim_and_run()
+
+    db.expire_all()
+    job = db.get(EmployeeSyncJob, job.id)
+    assert job.status == EmployeeSyncStatus.PENDING
+    assert (job.errors, job.total, job.next_start) == (1, USERS, 3 * BITRIX_PAGE_SIZE)
+    assert job.inserted == 3 * BITRIX_PAGE_SIZE
+    assert db.scalar(select(func.count()).select_from(Employee)) == 3 * BITRIX_PAGE_SIZE
+
+    # Повтор без ожидания задержки после ошибки
+    db.execute(
+        update(EmployeeSyncJob)
+        .where(EmployeeSyncJob.id == job.id)
+        .values(next_attempt_at=datetime.utcnow() - timedelta(seconds=1))
+    )
+    db.commit()
+
+    resumed = FakeBitrix()
+    sync_env(resumed)
+    _claim_and_run()
+
+    # Страницы до контрольной точки не запрашиваются и не пишутся повторно
+    assert resumed.requested_starts == [150, 200]
+    db.expire_all()
+    job = db.get(EmployeeSyncJob, job.id)
+    assert job.status == EmployeeSyncStatus.DONE
+    assert (job.inserted, job.updated, job.unchanged) == (USERS, 0, 0)
+    assert job.rows_written == USERS
+    assert job.pages_fetched == 5
+    assert job.deactivated == 0
+    assert db.scalar(select(func.count()).select_from(Employee).where(Employee.domain == DOMAIN)) == USERS
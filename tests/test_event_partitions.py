@@ -0,0 +1,55 @@
+import gzip
+import json
+import os
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from backend.models import SystemEvent
+from backend.services.event_partitions import (
+    archive_expired_event_partitions,
+    create_event_partition,
+    list_event_partitions,
+)
+
+OLD_MONTH = datetime(2020, 1, 1)
+
+
+def test_archive_is_complete_on_disk_before_partition_is_dropped(db, tmp_path, monkeypatch):
+    for day in (3, 17):
+        db.add(SystemEvent(
+            event_type="item_purchased",
+            actor_name_snapshot="Имя1 Фамилия1",
+            target_type="item",
+            message=f"Покупка {day}",
+            payload={"day": day},
+            created_at=OLD_MONTH.replace(day=day),
+        ))
+    db.commit()
+    create_event_partition(db, OLD_MONTH)
+    db.commit()
+
+    synced = []
+    real_fsync = os.fsync
+
+    def checking_fsync(fd):
+        tmp_files = list(tmp_path.glob("*.tmp"))
+        if tmp_files:
+            # Временный файл синхронизируется уже с трейлером gzip
+            with gzip.open(tmp_files[0], "rt", encoding="utf-8") as archive:
+                synced.append(len(archive.read().splitlines()))
+        else:
+            synced.append("dir")
+        real_fsync(fd)
+
+    monkeypatch.setattr(os, "fsync", checking_fsync)
+    archived = archive_expired_event_partitions(db, datetime(2026, 10, 18), 24, tmp_path)
+
+    assert synced == [2, "dir"]
+    assert [path.name for path in archived] == ["system_events_2020_01.ndjson.gz"]
+    with gzip.open(archived[0], "rt", encoding="utf-8") as archive:
+        rows = [json.loads(line) for line in archive]
+    assert [row["message"] for row in rows] == ["Покупка 3", "Покупка 17"]
+    assert list(tmp_path.glob("*.tmp")) == []
+    assert list_event_partitions(db) == []
+    assert db.scalar(select(func.count()).select_from(SystemEvent)) == 0
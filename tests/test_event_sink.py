@@ -0,0 +1,138 @@
+import asyncio
+import threading
+from datetime import datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+
+from backend.models import SystemEvent
+from backend.services import event_sink
+from backend.services.event_sink import SystemEventSink
+
+
+def make_sink(tmp_path, **fields) -> SystemEventSink:
+    values = dict(
+        enabled=True,
+        max_queue=100,
+        batch_size=10,
+        flush_interval=0.01,
+        shutdown_timeout=0,
+        spill_dir=tmp_path / "unwritten",
+    )
+    values.update(fields)
+    return SystemEventSink(**values)
+
+
+def make_rows(count: int) -> list[dict]:
+    return [
+        dict(
+            event_type="test_event",
+            actor_bitrix_id=None,
+            actor_name_snapshot="",
+            target_type="test",
+            target_id=index,
+            target_name_snapshot=None,
+            message=f"Событие {index}",
+            payload={"at": datetime(2026, 1, 1)},
+            created_at=datetime.utcnow(),
+        )
+        for index in range(count)
+    ]
+
+
+def count_events(db) -> int:
+    return db.scalar(select(func.count()).select_from(SystemEvent))
+
+
+def test_events_committed_after_stop_are_written(db, tmp_path, async_session_factory, monkeypatch):
+    monkeypatch.setattr(event_sink, "AsyncSessionLocal", async_session_factory)
+    sink = make_sink(tmp_path)
+
+    async def run():
+        sink.start()
+        sink.submit(make_rows(2))
+        await sink.stop()
+
+    asyncio.run(run())
+    assert count_events(db) == 2
+
+    # commit синхронной сессии после остановки: запись сразу, в этом же потоке
+    sink.submit(make_rows(3))
+    assert count_events(db) == 5
+
+
+def test_direct_write_does_not_block_event_loop(db, tmp_path, async_session_factory, monkeypatch):
+    monkeypatch.setattr(event_sink, "AsyncSessionLocal", async_session_factory)
+    sink = make_sink(tmp_path, max_queue=1)
+    write_threads = []
+    write_now = sink._write_now
+
+    def record_thread(rows):
+        write_threads.append(threading.current_thread())
+        write_now(rows)
+
+    monkeypatch.setattr(sink, "_write_now", record_thread)
+
+    async def run():
+        sink.start()
+        # переполнение, затем commit после остановки — оба в потоке цикла событий
+        sink.submit(make_rows(2))
+        await sink.stop()
+        sink.submit(make_rows(3))
+        await asyncio.get_running_loop().run_in_executor(sink._executor, lambda: None)
+
+    asyncio.run(run())
+    assert count_events(db) == 5
+    assert len(write_threads) == 2
+    assert threading.main_thread() not in write_threads
+
+
+def test_events_unwritten_at_shutdown_are_restored_on_next_start(db, tmp_path, async_session_factory, monkeypatch):
+    monkeypatch.setattr(event_sink, "AsyncSessionLocal", async_session_factory)
+    sink = make_sink(tmp_path)
+
+    async def database_down(rows):
+        raise OperationalError("INSERT INTO system_events", {}, Exception("connection refused"))
+
+    class BrokenSession:
+        def execute(self, *args, **kwargs):
+            raise OperationalError("INSERT INTO system_events", {}, Exception("connection refused"))
+
+        def rollback(self):
+            pass
+
+        def close(self):
+            pass
+
+    async def run():
+        sink.start()
+        sink.submit(make_rows(4))
+        await sink.stop()
+
+    with monkeypatch.context() as outage:
+        outage.setattr(sink, "_insert", database_down)
+        outage.setattr(event_sink, "SessionLocal", BrokenSession)
+        asyncio.run(run())
+
+    assert count_events(db) == 0
+    assert len(list((tmp_path / "unwritten").glob("*.ndjson"))) == 1
+
+    asyncio.run(run())
+    assert count_events(db) == 8
+    assert list((tmp_path / "unwritten").iterdir()) == []
+    assert db.scalars(select(SystemEvent.payload)).first() == {"at": "2026-01-01T00:00:00"}
+
+
+def test_spilled_events_are_restored_by_one_worker_only(db, tmp_path, async_session_factory, monkeypatch):
+    monkeypatch.setattr(event_sink, "AsyncSessionLocal", async_session_factory)
+    workers = [make_sink(tmp_path) for _ in range(3)]
+    workers[0]._spill(make_rows(4))
+
+    async def run():
+        for sink in workers:
+            sink.start()
+        await asyncio.gather(*(sink.stop() for sink in workers))
+
+    asyncio.run(run())
+    assert count_events(db) == 4
+    assert list((tmp_path / "unwritten").iterdir()) == []
@@ -0,0 +1,29 @@
+import csv
+import io
+
+from backend.models import LikeTransaction
+from backend.services.exports import likes_export, stream_export
+
+
+def _export_csv(export) -> list[list[str]]:
+    text = b"".join(stream_export(export, "csv", compress=False)).decode("utf-8-sig")
+    return list(csv.reader(io.StringIO(text)))
+
+
+def test_csv_export_escapes_formula_cells(db, add_employees):
+    add_employees(1, 2)
+    messages = ["=HYPERLINK(\"http://evil\")", "+1", "-1+2", "@SUM(A1)", "\tx", "\rx", "Спасибо!", "a=b"]
+    db.add_all([
+        LikeTransaction(from_user_bitrix_id=1, to_user_bitrix_id=2, message=message)
+        for message in messages
+    ])
+    db.commit()
+
+    header, *rows = _export_csv(likes_export(None, None, None))
+
+    exported = [row[header.index("message")] for row in rows]
+    assert exported == [
+        "'=HYPERLINK(\"http://evil\")", "'+1", "'-1+2", "'@SUM(A1)", "'\tx", "'\rx", "Спасибо!", "a=b",
+    ]
+    # Нестроковые значения не экранируются
+    assert [row[header.index("from_user_bitrix_id")] for row in rows] == ["1"] * len(messages)
@@ -0,0 +1,74 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from backend.models import (
+    Employee,
+    LikeDailyRollup,
+    LikePairQuota,
+    LikePeriodQuota,
+    LikeRequest,
+    LikeTransaction,
+    RatingCounter,
+)
+from backend.scripts.config import settings
+from backend.services.like_service import process_like_transaction
+from backend.services.rating_service import RATING_SCOPE_OVERALL
+
+# Сотни одновременных транзакций: у сервера PostgreSQL должно быть
+# max_connections больше SENDERS (в CI поднимается до 300)
+SENDERS = 200
+RECIPIENT_ID = 1000
+
+
+def test_parallel_likes_to_one_recipient_lose_no_updates(db, add_employees, add_game):
+    sender_ids = list(range(1, SENDERS + 1))
+    add_employees(RECIPIENT_ID, *sender_ids)
+    game_id = add_game([RECIPIENT_ID, *sender_ids]).id
+
+    # Отдельный пул на всех отправителей: с пулом приложения (5 + 10)
+    # одновременно шли бы не больше 15 транзакций
+    sender_engine = create_engine(settings.DATABASE_URL, pool_size=SENDERS, max_overflow=0)
+    SenderSession = sessionmaker(bind=sender_engine, autoflush=False)
+    barrier = Barrier(SENDERS)
+
+    def send_like(sender_id: int) -> None:
+        session = SenderSession()
+        try:
+            # Соединение берётся до барьера: все транзакции стартуют одновременно
+            session.connection()
+            barrier.wait()
+            process_like_transaction(session, LikeRequest(game_id=game_id, from_id=sender_id, to_id=RECIPIENT_ID))
+        finally:
+            session.close()
+
+    try:
+        with ThreadPoolExecutor(max_workers=SENDERS) as pool:
+            list(pool.map(send_like, sender_ids))
+    finally:
+        sender_engine.dispose()
+
+    balances = dict(db.execute(select(Employee.bitrix_id, Employee.coins)).all())
+    assert balances == {RECIPIENT_ID: SENDERS * 100, **{sender_id: 0 for sender_id in sender_ids}}
+    likes = dict(db.execute(select(Employee.bitrix_id, Employee.likes)).all())
+    assert likes == {RECIPIENT_ID: SENDERS, **{sender_id: 0 for sender_id in sender_ids}}
+    assert db.scalar(select(func.count(LikeTransaction.id))) == SENDERS
+
+    received = db.execute(
+        select(RatingCounter.game_id, RatingCounter.received).where(RatingCounter.bitrix_id == RECIPIENT_ID)
+    ).all()
+    assert dict(received) == {RATING_SCOPE_OVERALL: SENDERS, game_id: SENDERS}
+    sent = db.execute(
+        select(RatingCounter.game_id, func.count(), func.sum(RatingCounter.sent))
+        .where(RatingCounter.bitrix_id.in_(sender_ids))
+        .group_by(RatingCounter.game_id)
+    ).all()
+    assert sorted(sent) == sorted([(RATING_SCOPE_OVERALL, SENDERS, SENDERS), (game_id, SENDERS, SENDERS)])
+    assert db.scalar(
+        select(func.sum(LikeDailyRollup.received)).where(LikeDailyRollup.bitrix_id == RECIPIENT_ID)
+    ) == SENDERS
+
+    assert db.execute(select(func.count(), func.sum(LikePairQuota.sent))).one() == (SENDERS, SENDERS)
+    assert db.execute(select(func.count(), func.sum(LikePeriodQuota.sent))).one() == (SENDERS, SENDERS)
@@ -0,0 +1,86 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from backend.api.likes_history import get_all_likes_feed, get_likes_history
+from backend.models import LikeTransaction
+from backend.scripts.database import engine
+
+USER_ID = 1
+LIKES = 7
+PAGE = 3
+
+
+class StatementCounter:
+    def __init__(self, target):
+        self.target = target
+        self.statements = []
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.target, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.target, "before_cursor_execute", self._count)
+
+
+def _add_likes(db, add_employees):
+    add_employees(1, 2, 3)
+    start = datetime.utcnow() - timedelta(hours=1)
+    for index in range(LIKES):
+        from_id, to_id = (USER_ID, 2) if index % 2 else (3, USER_ID)
+        db.add(LikeTransaction(
+            from_user_bitrix_id=from_id,
+            to_user_bitrix_id=to_id,
+            message=f"Спасибо {index}",
+            created_at=start + timedelta(minutes=index),
+        ))
+    db.commit()
+
+
+def test_likes_history_page_is_one_query(db, add_employees, async_session_factory):
+    _add_likes(db, add_employees)
+    async_engine = async_session_factory.kw["bind"]
+
+    async def read_pages() -> tuple[list, list[int]]:
+        likes, queries, after = [], [], None
+        async with async_session_factory() as session:
+            while True:
+                with StatementCounter(async_engine.sync_engine) as counter:
+                    page = await get_likes_history(
+                        user_id=USER_ID, limit=PAGE, offset=0, after=after, include_total=False, db=session,
+                    )
+                queries.append(len(counter.statements))
+                likes.extend(page["likes"])
+                after = page["next_cursor"]
+                if after is None:
+                    return likes, queries
+
+    likes, queries = asyncio.run(read_pages())
+
+    assert queries == [1, 1, 1]
+    assert len(likes) == LIKES
+    assert {like.from_user_name for like in likes} >= {"Имя1 Фамилия1", "Имя3 Фамилия3"}
+    assert all(like.type == ("sent" if like.from_user_bitrix_id == USER_ID else "received") for like in likes)
+
+
+def test_likes_feed_page_is_one_query(db, add_employees):
+    _add_likes(db, add_employees)
+
+    pages, after = [], None
+    while True:
+        with StatementCounter(engine) as counter:
+            page = get_all_likes_feed(db=db, limit=PAGE, offset=0, after=after, include_total=False)
+        pages.append((len(counter.statements), page))
+        after = page.next_cursor
+        if after is None:
+            break
+
+    assert [queries for queries, _ in pages] == [1, 1, 1]
+    likes = [like for _, page in pages for like in page.likes]
+    assert len(likes) == LIKES
+    assert all(like.from_user_name != "Неизвестно" and like.to_user_name != "Неизвестно" for like in likes)
@@ -0,0 +1,67 @@
+import asyncio
+
+from sqlalchemy import select
+
+from backend.bitrix_sdk.python_current_SDK import BitrixBatchResult
+from backend.models import NotificationKind, NotificationOutbox, NotificationStatus
+from backend.services import bitrix_notify, notification_outbox
+from backend.services.notification_outbox import enqueue_notification
+
+BUYER_ID = 1
+ADMIN_IDS = [10, 11, 12]
+
+
+class FakeBitrixClient:
+    def __init__(self, rejected_user_ids: set[int]):
+        self.rejected_user_ids = rejected_user_ids
+        self.batches: list[dict] = []
+
+    def client(self, priority):
+        return self
+
+    async def call_batch(self, commands: dict) -> BitrixBatchResult:
+        self.batches.append(commands)
+        result = BitrixBatchResult()
+        for key, (method, params) in commands.items():
+            if params["USER_ID"] in self.rejected_user_ids:
+                result.errors[key] = {"error": "INTERNAL_SERVER_ERROR", "error_description": ""}
+            else:
+                result.results[key] = True
+        return result
+
+
+def test_purchase_notification_is_retried_for_rejected_admins(db, add_employees, async_session_factory, monkeypatch):
+    add_employees(BUYER_ID)
+    add_employees(*ADMIN_IDS, is_admin=True)
+    entry = enqueue_notification(db, NotificationKind.PURCHASE, {"buyer_id": BUYER_ID, "item_name": "Кружка"})
+    db.commit()
+    entry_id = entry.id
+
+    bitrix = FakeBitrixClient(rejected_user_ids={11})
+
+    async def get_user_tokens(session, user_id):
+        return bitrix
+
+    monkeypatch.setattr(bitrix_notify.bitrix_token_manager, "get_user_tokens", get_user_tokens)
+    monkeypatch.setattr(notification_outbox, "AsyncSessionLocal", async_session_factory)
+
+    def load_entry() -> NotificationOutbox:
+        db.expire_all()
+        return db.scalars(select(NotificationOutbox).where(NotificationOutbox.id == entry_id)).one()
+
+    asyncio.run(notification_outbox._process_entry(entry_id))
+
+    entry = load_entry()
+    assert entry.status == NotificationStatus.PENDING
+    assert entry.payload["admin_ids"] == [11]
+    assert "1 из 3" in entry.last_error
+
+    bitrix.rejected_user_ids.clear()
+    asyncio.run(notification_outbox._process_entry(entry_id))
+
+    entry = load_entry()
+    assert entry.status == NotificationStatus.SENT
+    assert [sorted(batch) for batch in bitrix.batches] == [
+        ["notify_10", "notify_11", "notify_12"],
+        ["notify_11"],
+    ]
@@ -0,0 +1,76 @@
+from datetime import date, datetime
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from backend.main import app
+from backend.models import SystemEvent
+from backend.services.like_rollup_service import local_day_start_utc
+from backend.services.pagination import (
+    created_between,
+    decode_created_id_cursor,
+    decode_id_cursor,
+    encode_cursor,
+    next_created_id_cursor,
+)
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        {"t": "2026-10-18T10:00:00"},
+        {"t": "2026-10-18T10:00:00", "id": "x"},
+        {"t": "2026-10-18T10:00:00", "id": None},
+        {"id": 5},
+        {"t": 5, "id": 5},
+    ],
+)
+def test_created_id_cursor_rejects_incomplete_payload(values):
+    with pytest.raises(HTTPException) as error:
+        decode_created_id_cursor(encode_cursor(values))
+    assert error.value.status_code == 400
+
+
+def test_created_id_cursor_round_trip():
+    created_at = datetime(2026, 10, 18, 10, 0, 0, 123456)
+    assert decode_created_id_cursor(encode_cursor({"t": created_at, "id": 7})) == {"t": created_at, "id": 7}
+    assert decode_created_id_cursor(None) is None
+
+
+@pytest.mark.parametrize("cursor", ["не base64", encode_cursor({"id": "x"}), encode_cursor({})])
+def test_id_cursor_rejects_invalid_payload(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_id_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_created_between_uses_local_day_bounds():
+    assert created_between(SystemEvent.created_at, None, None) == []
+
+    filters = created_between(SystemEvent.created_at, date(2026, 10, 1), date(2026, 10, 31))
+    bounds = [condition.right.value for condition in filters]
+    assert bounds == [local_day_start_utc(date(2026, 10, 1)), local_day_start_utc(date(2026, 11, 1))]
+
+    with pytest.raises(HTTPException) as error:
+        created_between(SystemEvent.created_at, date(2026, 10, 2), date(2026, 10, 1))
+    assert error.value.status_code == 400
+
+
+def test_empty_page_has_no_next_cursor():
+    assert next_created_id_cursor([], 0) is None
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "/api/user/1/likes?limit=0",
+        "/api/likes/feed?limit=0",
+        "/api/games?limit=0",
+        "/api/events?user_id=1&limit=0",
+        "/api/likes/feed?limit=1000",
+    ],
+)
+def test_page_size_out_of_range_is_rejected(url):
+    # Без with: lifespan (фоновые задачи) не запускается, проверяется только валидация запроса
+    assert TestClient(app).get(url).status_code == 422
@@ -0,0 +1,78 @@
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from backend.models import LikeTransaction, RatingCounter
+from backend.services.rating_service import (
+    RATING_SCOPE_OVERALL,
+    get_rating_place,
+    increment_rating_counters,
+    rating_rows_query,
+    rebuild_rating_counters,
+)
+
+
+def _counters(db) -> dict:
+    rows = db.execute(select(RatingCounter.game_id, RatingCounter.bitrix_id, RatingCounter.received, RatingCounter.sent))
+    return {(row.game_id, row.bitrix_id): (row.received, row.sent) for row in rows}
+
+
+def test_rebuild_statements_have_no_parameters_in_group_by(db, monkeypatch):
+    statements = []
+    monkeypatch.setattr(db, "execute", lambda stmt, *args, **kwargs: statements.append(stmt))
+
+    rebuild_rating_counters(db)
+
+    for stmt in statements:
+        sql = str(stmt.compile(dialect=postgresql.psycopg2.dialect()))
+        if "GROUP BY" in sql:
+            assert "%(" not in sql.split("GROUP BY", 1)[1]
+
+
+def test_rebuild_matches_incremental_counters(db, add_employees, add_game):
+    add_employees(1, 2, 3)
+    first = add_game([1, 2, 3])
+    second = add_game([1, 2])
+    likes = [(first.id, 1, 2), (first.id, 3, 2), (second.id, 2, 1), (None, 1, 3)]
+
+    for game_id, from_id, to_id in likes:
+        db.add(LikeTransaction(game_id=game_id, from_user_bitrix_id=from_id, to_user_bitrix_id=to_id))
+        increment_rating_counters(db, game_id, from_id, to_id)
+    db.commit()
+    incremental = _counters(db)
+
+    rebuild_rating_counters(db)
+    db.commit()
+
+    assert _counters(db) == incremental
+    assert incremental == {
+        (0, 1): (1, 2),
+        (0, 2): (2, 1),
+        (0, 3): (1, 1),
+        (first.id, 1): (0, 1),
+        (first.id, 2): (2, 0),
+        (first.id, 3): (0, 1),
+        (second.id, 1): (1, 0),
+        (second.id, 2): (0, 1),
+    }
+
+
+def test_rating_place_and_neighbours_follow_rating_order(db, add_employees):
+    # (received, sent) по bitrix_id; одинаковые счёты упорядочены по bitrix_id desc
+    scores = {1: (5, 1), 2: (3, 2), 3: (3, 2), 4: (3, 1), 5: (1, 0), 6: (3, 2), 7: (0, 4)}
+    add_employees(*scores)
+    db.add_all([
+        RatingCounter(game_id=RATING_SCOPE_OVERALL, bitrix_id=bitrix_id, received=received, sent=sent)
+        for bitrix_id, (received, sent) in scores.items()
+    ])
+    db.commit()
+
+    order = [row.bitrix_id for row in rating_rows_query(db, RATING_SCOPE_OVERALL)]
+    assert order == [1, 6, 3, 2, 4, 5, 7]
+
+    for place, bitrix_id in enumerate(order, start=1):
+        counter, found_place, above, below = get_rating_place(db, RATING_SCOPE_OVERALL, bitrix_id, neighbours=2)
+        assert (counter.bitrix_id, found_place) == (bitrix_id, place)
+        assert [row.bitrix_id for row in above] == order[max(place - 3, 0):place - 1]
+        assert [row.bitrix_id for row in below] == order[place:place + 2]
+
+    assert get_rating_place(db, 1, 1, neighbours=2) == (None, None, [], [])
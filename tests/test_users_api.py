@@ -0,0 +1,40 @@
+import asyncio
+
+from fastapi import Response
+from sqlalchemy import event
+
+from backend.api.users import get_all_users
+
+PARTICIPANTS = list(range(1, 41))
+
+
+def test_game_participants_filter_does_not_inline_participant_ids(db, add_employees, add_game, async_session_factory):
+    add_employees(*PARTICIPANTS, 100)
+    game_id = add_game(PARTICIPANTS).id
+    add_game([100], game_is_active=False)
+
+    parameters = []
+
+    def capture(conn, cursor, statement, params, context, executemany):
+        parameters.append(params)
+
+    async def list_users(**filters) -> list[int]:
+        async with async_session_factory() as session:
+            arguments = {
+                "limit": 0, "offset": 0, "only_gamers": False, "active_game_only": False,
+                "game_id": None, "after": None, "include_inactive": False,
+            }
+            users = await get_all_users(Response(), db=session, **{**arguments, **filters})
+        return sorted(user["bitrix_id"] for user in users)
+
+    sync_engine = async_session_factory.kw["bind"].sync_engine
+    event.listen(sync_engine, "before_cursor_execute", capture)
+    try:
+        by_game = asyncio.run(list_users(game_id=game_id))
+        by_active_game = asyncio.run(list_users(active_game_only=True))
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", capture)
+
+    assert by_game == PARTICIPANTS
+    assert by_active_game == PARTICIPANTS
+    assert max(len(params) for params in parameters) < 5